@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+'''
+A deterministic stand-in for the `lurk` binary, used by the benchmarks to
+measure `Zeek` without Lurk's own cost. It understands only the REPL input
+`Zeek` sends and answers with canned output in Lurk's format. Commits and
+proofs are written as small JSON files.
+- `FAKE_LURK_PROVE_DELAY` is how many seconds `!(prove)` takes.
+- `FAKE_LURK_PROVE_STEPS` is how many progress lines it prints meanwhile.
+'''
+try:
+    import sys
+    import os
+    import json
+    import hashlib
+    import time
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either sys, os, json, hashlib or time is missing.')
+    exit(1)
+
+_PROOF_PREFIX = 'Nova_Pallas_10_'
+
+def _digest(*parts):
+    return hashlib.sha256(' '.join(parts).encode('utf-8')).hexdigest()
+
+def _forms(text):
+    '''
+    Splits `text` in top level forms, returning the complete forms and the
+    unfinished rest.
+    '''
+    forms, depth, start, in_str, i = [], 0, None, False, 0
+    while i < len(text):
+        c = text[i]
+        if in_str:
+            if c == '\\':
+                i += 1
+            elif c == '"':
+                in_str = False
+                if depth == 0:
+                    forms.append(text[start:i+1])
+                    start = None
+        elif c == '"':
+            in_str = True
+            if start == None:
+                start = i
+        elif c == '(':
+            if start == None:
+                start = i - 1 if i > 0 and text[i-1] in "!'" else i
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth == 0:
+                forms.append(text[start:i+1])
+                start = None
+        elif c.isspace():
+            if depth == 0 and start != None:
+                forms.append(text[start:i])
+                start = None
+        elif start == None and c not in "!'":
+            start = i
+        i += 1
+    return forms, (text[start:] if start != None else '')
+
+class FakeLurk:
+    def __init__(self, cd, pd):
+        self._cd = cd
+        self._pd = pd
+        self._last = None
+        os.makedirs(cd, exist_ok=True)
+        os.makedirs(pd, exist_ok=True)
+
+    def _commit_path(self, h):
+        return f'{self._cd}/{h[2:] if h.startswith("0x") else h}.commit'
+
+    def eval(self, form):
+        args = form.strip('!()').split(None, 2)
+        match args:
+            case ['hide', salt, value] if form.startswith('!'):
+                h = _digest(salt, value)
+                with open(self._commit_path(h), 'w') as fh:
+                    json.dump({'salt': salt, 'value': value}, fh)
+                return f'Hash: 0x{h}'
+            case ['open', h] if form.startswith('!'):
+                if not os.path.exists(self._commit_path(h)):
+                    return f'Error: hash {h} not found'
+                with open(self._commit_path(h)) as fh:
+                    return json.load(fh)['value']
+            case ['fetch', h]:
+                if not os.path.exists(self._commit_path(h)):
+                    return f'Error: hash {h} not found'
+                return 'Data is now available'
+            case ['load', file]:
+                return f'Loading {file.strip(chr(34))}'
+            case ['def' | 'defrec', name, _]:
+                return name
+            case ['prove']:
+                delay = float(os.environ.get('FAKE_LURK_PROVE_DELAY', '0'))
+                steps = int(os.environ.get('FAKE_LURK_PROVE_STEPS', '0'))
+                for i in range(steps):
+                    print(f'Proving step {i + 1}/{steps}', flush=True)
+                    time.sleep(delay / steps)
+                if steps == 0:
+                    time.sleep(delay)
+                if self._last == None:
+                    return 'Error: no expression to prove'
+                key = _PROOF_PREFIX + _digest(*self._last)
+                for ext in ('proof', 'meta'):
+                    with open(f'{self._pd}/{key}.{ext}', 'w') as fh:
+                        json.dump({'input': f'((open 0x{self._last[0]}) (open 0x{self._last[1]}))',
+                                   'output': 't', 'iterations': 3}, fh)
+                return f'Claim hash: 0x{_digest(key)}\nProof key: "{key}"'
+            case ['verify', key]:
+                if not os.path.exists(f'{self._pd}/{key.strip(chr(34))}.proof'):
+                    return f'Error: proof {key} not found'
+                return f'✓ Proof {key} verified'
+            case ['inspect', key]:
+                path = f'{self._pd}/{key.strip(chr(34))}.meta'
+                if not os.path.exists(path):
+                    return f'Error: proof {key} not found'
+                with open(path) as fh:
+                    meta = json.load(fh)
+                return f'Input:\n  {meta["input"]}\nOutput:\n  {meta["output"]}\nIterations:\n  {meta["iterations"]}'
+        if form.startswith('((open'):
+            hs = [t.strip('()') for t in form.split() if t.strip('()').startswith('0x')]
+            for h in hs:
+                if not os.path.exists(self._commit_path(h)):
+                    return f'Error: hash {h} not found'
+            self._last = [h[2:] for h in hs]
+            return '[3 iterations] => t'
+        return f'[1 iteration] => {form}'
+
+def main(argv):
+    opts = dict(a[2:].split('=', 1) for a in argv[1:] if a.startswith('--') and '=' in a)
+    lurk = FakeLurk(opts.get('commits-dir', '.'), opts.get('proofs-dir', '.'))
+    print('Lurk REPL welcomes you.', flush=True)
+    pending = ''
+    for line in sys.stdin:
+        forms, pending = _forms(pending + line)
+        for form in forms:
+            print(lurk.eval(form), flush=True)
+    print('Exiting...', flush=True)
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+'''
+Measures `with <file> hide table` latency for tables from 1 KB to 100 MB.
+Tables are hidden as `Zeek` does, through a generated Lurk file, and, for
+comparison, as they used to be, with each token of the table passed as an
+argument to `echo | lurk`, which fails once the table no longer fits the
+command line.
+
+Usage: bench/hide_table.py [size in bytes ...]
+'''
+try:
+    import os
+    import sys
+    import time
+    import tempfile
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeek_prompt import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, time, tempfile or zeek_prompt is missing.')
+    exit(1)
+
+_SIZES = [1 << 10, 10 << 10, 100 << 10, 1 << 20, 10 << 20, 100 << 20]
+_ACCOUNT = '''    (("number"   . "02345-{n}")
+        ("type"     . "savings")
+        ("balance"  . {n})
+        ("birthday" . (2001 02 10)))
+'''
+
+def _mk_table(path, size):
+    '''
+    Writes a table of accounts, as in `data/credit-score-table.lurk`, of
+    about `size` bytes.
+    '''
+    written, n = 0, 0
+    with open(path, 'w') as fh:
+        fh.write("'(\n")
+        while written < size:
+            account = _ACCOUNT.format(n=n)
+            fh.write(account)
+            written += len(account)
+            n += 1
+        fh.write(')\n')
+
+def _time(fn):
+    start = time.perf_counter()
+    rc, out = fn()
+    return time.perf_counter() - start, rc, out
+
+def run(sizes, argv=True):
+    '''
+    Returns, for each size, the seconds taken to hide a table of that size
+    through a file and, if `argv`, through the command line, or `None` if
+    the latter failed.
+    '''
+    results = []
+    with tempfile.TemporaryDirectory() as dir:
+        zp = ZeekPrompt(f'{dir}/.zeek')
+        rc, party = zp.handle_new_party(['bench'])
+        zp.handle_party(party)
+        for size in sizes:
+            table = f'{dir}/table-{size}.lurk'
+            _mk_table(table, size)
+            file_secs, rc, out = _time(lambda: zp.handle_hide_table(table))
+            if rc != 0:
+                print(out)
+            argv_secs = None
+            if argv:
+                with open(table) as fh:
+                    tokens = fh.read().split()
+                lurkw = zp.new_lurk_wrapper()
+                try:
+                    argv_secs, rc, _ = _time(lambda: lurkw.hide(tokens))
+                except LurkWrapperCommException:
+                    rc = 1
+                if rc != 0:
+                    # Larger tables do not fit either.
+                    argv_secs, argv = None, False
+            results.append({'size': size, 'file_secs': file_secs, 'argv_secs': argv_secs})
+        zp.good_bye()
+    return results
+
+if __name__ == '__main__':
+    sizes = [int(s) for s in sys.argv[1:]] if len(sys.argv) > 1 else _SIZES
+    print(f'{"size (bytes)":>14} {"file (s)":>10} {"MB/s":>8} {"argv (s)":>10}')
+    for r in run(sizes):
+        argv = f'{r["argv_secs"]:10.3f}' if r['argv_secs'] != None else f'{"failed":>10}'
+        print(f'{r["size"]:>14} {r["file_secs"]:10.3f} {r["size"] / (1 << 20) / r["file_secs"]:8.1f} {argv}')
@@ -0,0 +1,288 @@
+#!/usr/bin/python3
+'''
+Benchmarks of `Zeek`'s own overhead: spawning Lurk, parsing its output,
+indexing `.zeek`, completing commands, keeping labels and starting
+one-shot commands. Lurk is replaced by `bench/fake_lurk.py`, put on
+`PATH` as `lurk`, so Lurk's own cost is left out. At scale 1, `.zeek` has 1,000 parties, 100,000 commits and
+50,000 labels.
+
+Results are seconds per operation, so lower is better, and are written as
+JSON. Given the results of another commit with `--compare`, the benchmarks
+that got slower than `--threshold` are reported and the exit code is 1.
+
+Usage: bench/run.py [--scale S] [--only NAME ...] [--out FILE] [--compare FILE] [--threshold T]
+'''
+try:
+    import os
+    import sys
+    import json
+    import time
+    import argparse
+    import tempfile
+    import platform
+    import contextlib
+    import subprocess as sp
+    _BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(_BENCH_DIR))
+    from lurk_wrapper import *
+    from lurk_session import *
+    from lurk_meta import *
+    from zeek_env import *
+    from zeek_labels import *
+    from zeek_prompt import *
+    from zeek_completer import *
+    from prompt_toolkit.document import Document
+    import hide_table
+    import startup
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, json, time, argparse, tempfile, platform, contextlib, subprocess, lurk_wrapper, lurk_session, lurk_meta, zeek_env, zeek_labels, zeek_prompt, zeek_completer, prompt_toolkit, hide_table or startup is missing.')
+    exit(1)
+
+_PARTIES = 1_000
+_COMMITS = 100_000
+_LABELS  = 50_000
+
+def _install_fake_lurk(dir):
+    bin_dir = f'{dir}/bin'
+    os.makedirs(bin_dir)
+    with open(f'{bin_dir}/lurk', 'w') as fh:
+        fh.write(f'#!/bin/sh\nexec "{sys.executable}" "{_BENCH_DIR}/fake_lurk.py" "$@"\n')
+    os.chmod(f'{bin_dir}/lurk', 0o755)
+    os.environ['PATH'] = f'{bin_dir}{os.pathsep}{os.environ["PATH"]}'
+
+def _per_op(fn, reps):
+    '''
+    Returns the mean seconds taken by `fn()` over `reps` runs.
+    '''
+    start = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - start) / reps
+
+def _once(fn):
+    return _per_op(fn, 1)
+
+def _hash(n):
+    return f'{n:064x}'
+
+def _lurk_ops(lurkw, reps):
+    '''
+    Times each Lurk operation through `lurkw`.
+    '''
+    rc, test = lurkw.hide(['(lambda', '(x)', '(>', 'x', '10))'])
+    rc, value = lurkw.hide(['17'])
+    rc, proof_key = lurkw.prove(f'0x{test}', f'0x{value}')
+    return {'hide':    _per_op(lambda: lurkw.hide(['17']), reps),
+            'open':    _per_op(lambda: lurkw.open(f'0x{value}'), reps),
+            'call':    _per_op(lambda: lurkw.call(f'0x{test}', f'0x{value}'), reps),
+            'prove':   _per_op(lambda: lurkw.prove(f'0x{test}', f'0x{value}'), reps),
+            'verify':  _per_op(lambda: lurkw.verify(f'"{proof_key}"'), reps),
+            'inspect': _per_op(lambda: lurkw.get_claim(f'"{proof_key}"'), reps)}
+
+def bench_lurk_spawn(dir, scale):
+    '''
+    Each command in its own `lurk` process, as background jobs run them.
+    '''
+    cd, pd = f'{dir}/spawn/commits', f'{dir}/spawn/proofs'
+    return _lurk_ops(LurkWrapper(15, cd, pd), 20)
+
+def bench_lurk_session(dir, scale):
+    '''
+    Commands in a long-lived Lurk session, as the REPL runs them.
+    '''
+    cd, pd = f'{dir}/session/commits', f'{dir}/session/proofs'
+    session = LurkSession(LurkWrapper._mk_lurk_cmd(cd, pd))
+    results = _lurk_ops(LurkWrapper(15, cd, pd, session), 200)
+    session.close()
+    return results
+
+def bench_parse(dir, scale):
+    '''
+    Parsing Lurk's replies.
+    '''
+    reps = 100_000
+    key  = 'Nova_Pallas_10_' + _hash(1)
+    hash_out    = f'Lurk REPL welcomes you.\nHash: 0x{_hash(1)}\nExiting...\n'
+    call_out    = f'Lurk REPL welcomes you.\nData is now available\nData is now available\n[3 iterations] => t\nExiting...\n'
+    prove_out   = f'Lurk REPL welcomes you.\nClaim hash: 0x{_hash(2)}\nProof key: "{key}"\nExiting...\n'
+    verify_out  = f'Lurk REPL welcomes you.\n✓ Proof "{key}" verified\nExiting...\n'
+    inspect_out = f'Input:\n  ((open 0x{_hash(1)}) (open 0x{_hash(2)}))\nOutput:\n  t\nIterations:\n  3\n'
+    def _read(out):
+        reader = LurkReader('Hash: 0x', None)
+        for line in out.splitlines(keepends=True):
+            if reader.feed(line):
+                break
+        return reader.get_reply()
+    return {'hash':    _per_op(lambda: LurkWrapper._get_hash(hash_out), reps),
+            'output':  _per_op(lambda: LurkWrapper._get_output(call_out), reps),
+            'proof':   _per_op(lambda: LurkWrapper._get_proof_key(prove_out), reps),
+            'verify':  _per_op(lambda: LurkWrapper._get_verify_output(verify_out), reps),
+            'inspect': _per_op(lambda: LurkProofClaim.from_text(inspect_out), reps),
+            'read':    _per_op(lambda: _read(hash_out), reps)}
+
+def _mk_zeek_dir(path, parties, commits):
+    '''
+    Writes a `.zeek` directory with `parties` parties sharing `commits`
+    commits evenly.
+    '''
+    os.makedirs(path)
+    per_party = max(1, commits // parties)
+    for p in range(parties):
+        cd, pd = f'{path}/{_hash(p)}/commits', f'{path}/{_hash(p)}/proofs'
+        os.makedirs(cd)
+        os.makedirs(pd)
+        for c in range(per_party):
+            open(f'{cd}/{_hash(p * per_party + c)}.commit', 'w').close()
+    return per_party
+
+def bench_env(dir, scale):
+    '''
+    Listing parties and looking commits up in a large `.zeek`.
+    '''
+    path = f'{dir}/env/.zeek'
+    parties = max(1, int(_PARTIES * scale))
+    per_party = _mk_zeek_dir(path, parties, int(_COMMITS * scale))
+    env = ZeekEnv(path)
+    party = _hash(parties // 2)
+    commit = _hash(parties // 2 * per_party)
+    results = {'init':          _once(lambda: ZeekEnv(path)),
+               'parties_cold':  _once(env.get_parties),
+               'parties_warm':  _per_op(env.get_parties, 100),
+               'commits_cold':  _once(lambda: env.get_commits(party)),
+               'commits_warm':  _per_op(lambda: env.get_commits(party), 1_000),
+               'is_commited':   _per_op(lambda: env.is_commited(party, commit), 10_000),
+               'is_party':      _per_op(lambda: env.is_party(party), 10_000)}
+    cold = ZeekEnv(path)
+    results['all_commits_cold'] = _once(lambda: [cold.get_commits(_hash(p)) for p in range(parties)])
+    return results
+
+def _labels(n):
+    return [(f'label-{i}', _hash(i)) for i in range(n)]
+
+def bench_labels(dir, scale):
+    '''
+    Setting labels one by one, each synced to disk, and all at once,
+    compacting, loading and looking up labels.
+    '''
+    n = max(1, int(_LABELS * scale))
+    file = f'{dir}/labels.log'
+    items = _labels(n)
+    labels = ZeekLabels(file, lambda v: ZeekLabels.COMMIT)
+    few = items[:min(n, 1_000)]
+    def _set_few():
+        for l, v in few:
+            labels.set_label(l, v, ZeekLabels.COMMIT)
+    results = {'set':     _once(_set_few) / len(few),
+               'set_all': _once(lambda: labels.set_labels(items, ZeekLabels.COMMIT)) / n,
+               'compact': _once(labels.save),
+               'load':    _once(lambda: ZeekLabels(file, lambda v: ZeekLabels.COMMIT).get_generation()),
+               'find':    _per_op(lambda: labels.find_label(_hash(n // 2)), 10_000)}
+    labels.close()
+    return results
+
+def bench_completer(dir, scale):
+    '''
+    Completing commands with many parties, commits and labels.
+    '''
+    path = f'{dir}/completer/.zeek'
+    parties = max(1, int(_PARTIES * scale))
+    per_party = _mk_zeek_dir(path, parties, int(_COMMITS * scale))
+    labels = ZeekLabels(f'{path}/labels.log', lambda v: ZeekLabels.COMMIT)
+    labels.set_labels(_labels(max(1, int(_LABELS * scale))), ZeekLabels.COMMIT)
+    labels.close()
+    zp = ZeekPrompt(path)
+    zp.handle_party(_hash(0))
+    completer = ZeekCompleter(zp)
+    def _complete(text):
+        return list(completer.get_completions(Document(text), None))
+    results = {'call_cold':  _once(lambda: _complete('call ')),
+               'call_warm':  _per_op(lambda: _complete('call label-1'), 100),
+               'party_cold': _once(lambda: _complete('party ')),
+               'party_warm': _per_op(lambda: _complete('party '), 100),
+               'keyword':    _per_op(lambda: _complete('ve'), 10_000)}
+    zp._sessions.close_all()
+    return results
+
+def bench_hide_table(dir, scale):
+    '''
+    Hiding tables from 1 KB to 10 MB.
+    '''
+    return {f'{r["size"]}': r['file_secs'] for r in hide_table.run([1 << 10, 1 << 20, 10 << 20], argv=False)}
+
+def bench_startup(dir, scale):
+    '''
+    Startup of one-shot commands, over that of the interpreter.
+    '''
+    return {cmd: secs for cmd, secs in startup.run(5).items() if cmd != 'python'}
+
+_BENCHMARKS = {'lurk_spawn':   bench_lurk_spawn,
+               'lurk_session': bench_lurk_session,
+               'parse':        bench_parse,
+               'env':          bench_env,
+               'labels':       bench_labels,
+               'completer':    bench_completer,
+               'hide_table':   bench_hide_table,
+               'startup':      bench_startup}
+
+def _git_commit():
+    try:
+        return sp.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=_BENCH_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def run(names, scale):
+    results = {}
+    with tempfile.TemporaryDirectory() as dir:
+        _install_fake_lurk(dir)
+        for name in names:
+            print(f'Running {name}...', file=sys.stderr)
+            os.makedirs(f'{dir}/{name}')
+            # Results go to stdout, anything else Zeek prints to stderr.
+            with contextlib.redirect_stdout(sys.stderr):
+                metrics = _BENCHMARKS[name](f'{dir}/{name}', scale)
+            for metric, secs in metrics.items():
+                results[f'{name}.{metric}'] = secs
+    return {'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': scale,
+            'results': results}
+
+def compare(base, new, threshold):
+    '''
+    Returns the benchmarks of `new` more than `threshold` times slower than
+    in `base`, as triples `(name, base seconds, new seconds)`.
+    '''
+    regressions = []
+    for name, secs in new['results'].items():
+        base_secs = base['results'].get(name)
+        if base_secs != None and base_secs > 0 and secs / base_secs > threshold:
+            regressions.append((name, base_secs, secs))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of Zeek\'s own overhead.')
+    parser.add_argument('--scale', type=float, default=1.0, help='fraction of 1k parties, 100k commits and 50k labels')
+    parser.add_argument('--only', nargs='+', choices=_BENCHMARKS.keys(), default=list(_BENCHMARKS.keys()))
+    parser.add_argument('--out', help='file to write the results to, instead of stdout')
+    parser.add_argument('--compare', help='results of another commit to compare with')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown reported as a regression')
+    args = parser.parse_args()
+    results = run(args.only, args.scale)
+    if args.out != None:
+        with open(args.out, 'w') as fh:
+            json.dump(results, fh, indent=4)
+    else:
+        print(json.dumps(results, indent=4))
+    if args.compare != None:
+        with open(args.compare) as fh:
+            base = json.load(fh)
+        if base['scale'] != results['scale']:
+            print(f'Results at scale {base["scale"]} can not be compared with results at scale {results["scale"]}.', file=sys.stderr)
+            exit(2)
+        regressions = compare(base, results, args.threshold)
+        for name, base_secs, secs in regressions:
+            print(f'{name}: {base_secs * 1e3:.3f}ms -> {secs * 1e3:.3f}ms ({secs / base_secs:.2f}x)', file=sys.stderr)
+        exit(1 if regressions != [] else 0)
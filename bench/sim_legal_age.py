@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+'''
+Runs the legal age protocol of the README with many parties on the sim
+backend. Bee hides the test for legal age and sends it to every party.
+Each party hides its age, proves the test on it and sends the proof to
+Bee, who verifies all of them.
+
+Usage: bench/sim_legal_age.py [parties]
+'''
+try:
+    import os
+    import sys
+    import time
+    import random
+    import tempfile
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeek_prompt import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, time, random, tempfile or zeek_prompt is missing.')
+    exit(1)
+
+_PARTIES = 10_000
+_TEST    = ['(lambda', '(x)', '(>=', 'x', '18))']
+
+def _check(rc, out):
+    if rc != 0:
+        raise Exception(out)
+    return out
+
+def run(parties, seed=0):
+    '''
+    Returns the seconds taken by each phase of the protocol and the number
+    of parties of legal age.
+    '''
+    rand  = random.Random(seed)
+    times = {}
+    with tempfile.TemporaryDirectory() as dir:
+        zp = ZeekPrompt(f'{dir}/.zeek', backend='sim')
+        start = time.perf_counter()
+        bee = _check(*zp.handle_new_party(['bee']))
+        party_hashes = [_check(*zp.handle_new_party([f'"party{i}"'])) for i in range(parties)]
+        times['new parties'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        zp.handle_party(bee)
+        test = _check(*zp.handle_hide(_TEST))
+        for p in party_hashes:
+            _check(*zp.handle_send_commit(p, test))
+        times['send test'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        adults = 0
+        for p in party_hashes:
+            zp.handle_party(p)
+            age = _check(*zp.handle_hide([f'{rand.randint(10, 80)}']))
+            proof_key = _check(*zp.handle_prove(test, age))
+            _check(*zp.handle_send_proof(bee, proof_key))
+            adults += _check(*zp.handle_inspect(proof_key, test, age, 't'))
+        times['hide and prove'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        zp.handle_party(bee)
+        failures, _ = zp.handle_verify_batch(zp.match_proofs('all'), lambda k, rc, out: None)
+        times['verify'] = time.perf_counter() - start
+        if failures != 0:
+            raise Exception(f'{failures} proofs failed verification.')
+        zp.good_bye()
+    return times, adults
+
+if __name__ == '__main__':
+    parties = int(sys.argv[1]) if len(sys.argv) > 1 else _PARTIES
+    times, adults = run(parties)
+    for phase, secs in times.items():
+        print(f'{phase:>16} {secs:8.2f}s')
+    print(f'{"total":>16} {sum(times.values()):8.2f}s')
+    print(f'{adults} of {parties} parties are of legal age.')
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+'''
+Times one-shot commands, `zeek.py <command>`, from start to exit, on the
+sim backend so that Lurk's cold start is left out. Zeek's startup is the
+time over that of a bare Python interpreter. The exit code is 1 if the
+startup of a command is over `--budget` seconds.
+
+Usage: bench/startup.py [--reps N] [--budget SECS]
+'''
+try:
+    import os
+    import sys
+    import time
+    import argparse
+    import tempfile
+    import statistics
+    import subprocess as sp
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, time, argparse, tempfile, statistics or subprocess is missing.')
+    exit(1)
+
+_ZEEK   = f'{os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}/zeek.py'
+_BUDGET = 0.2
+
+def _secs(argv, cwd, reps):
+    '''
+    Returns the median seconds `argv` takes to run, in `cwd`.
+    '''
+    times = []
+    for _ in range(reps):
+        start = time.perf_counter()
+        sp.run(argv, cwd=cwd, stdout=sp.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def _zeek(*cmd):
+    return [sys.executable, _ZEEK, '--backend', 'sim', *cmd]
+
+def run(reps):
+    '''
+    Returns the seconds taken by the interpreter alone and the startup of
+    each command, over the interpreter's.
+    '''
+    with tempfile.TemporaryDirectory() as dir:
+        for cmd in (['new', 'party', 'bee', 'as', 'bee'],
+                    ['--party', 'bee', 'hide', '5', 'as', 'x'],
+                    ['--party', 'bee', 'hide', '(lambda', '(x)', '(>=', 'x', '18))', 'as', 't'],
+                    ['--party', 'bee', 'prove', 't', 'x', 'as', 'p']):
+            sp.run(_zeek(*cmd), cwd=dir, stdout=sp.DEVNULL, check=True)
+        python = _secs([sys.executable, '-c', 'pass'], dir, reps)
+        return {'python':  python,
+                'help':    _secs([sys.executable, _ZEEK, '--help'], dir, reps) - python,
+                'parties': _secs(_zeek('parties'), dir, reps) - python,
+                'verify':  _secs(_zeek('--party', 'bee', 'verify', 'p'), dir, reps) - python}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Startup time of one-shot Zeek commands.')
+    parser.add_argument('--reps', type=int, default=10, help='runs of each command, of which the median is taken')
+    parser.add_argument('--budget', type=float, default=_BUDGET, help='seconds a command may take over the interpreter')
+    args = parser.parse_args()
+    results = run(args.reps)
+    print(f'{"python":>8} {results["python"] * 1e3:8.1f}ms')
+    over = []
+    for cmd, secs in results.items():
+        if cmd != 'python':
+            print(f'{cmd:>8} {secs * 1e3:8.1f}ms over python')
+            if secs > args.budget:
+                over.append(cmd)
+    if over != []:
+        print(f'Over the budget of {args.budget * 1e3:.0f}ms: {", ".join(over)}.', file=sys.stderr)
+        exit(1)
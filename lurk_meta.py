@@ -0,0 +1,93 @@
+try:
+    import json
+    import re
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either json or re is missing.')
+    exit(1)
+
+class LurkProofClaim:
+    '''
+    What a proof is about: the application of the function hidden in
+    `input_hashes[0]` to the value hidden in `input_hashes[1]` yields
+    `output_value` after `iterations` iterations. Hashes are kept
+    without the `0x` prefix, as in the rest of `Zeek`.
+    '''
+    _HASH_RE = re.compile(r'0x([0-9a-fA-F]+)')
+
+    def __init__(self, input_hashes, output_value, iterations):
+        self._input_hashes = input_hashes
+        self._output_value = output_value
+        self._iterations   = iterations
+
+    def get_input_hashes(self):
+        return self._input_hashes
+
+    def get_output_value(self):
+        return self._output_value
+
+    def get_iterations(self):
+        return self._iterations
+
+    def matches(self, test, value, output):
+        '''
+        Checks the claim is about `call <test> <value>` returning `output`.
+        As with `!(inspect ...)`, `output` should be one of the tokens of
+        the output value.
+        '''
+        return self._input_hashes == (LurkProofClaim._strip_hex(test), LurkProofClaim._strip_hex(value)) and \
+               output in self._output_value.split()
+
+    def _strip_hex(hash):
+        return hash[2:] if hash.startswith('0x') else hash
+
+    def _from_fields(input, output, iterations):
+        # The input is expected to be of the form ((open <hash 1>) (open <hash 2>)).
+        hashes = LurkProofClaim._HASH_RE.findall(input)
+        if len(hashes) != 2:
+            return None
+        try:
+            iterations = int(iterations)
+        except (TypeError, ValueError):
+            return None
+        return LurkProofClaim((hashes[0], hashes[1]), ' '.join(str(output).split()), iterations)
+
+    def from_text(text):
+        '''
+        Parses the output of `!(inspect ...)`, where the claim is laid out
+        after the markers `Input:`, `Output:` and `Iterations:`.
+        Returns `None` if `text` is not in this format.
+        '''
+        input_idx      = text.find('Input:')
+        output_idx     = text.find('Output:')
+        iterations_idx = text.find('Iterations:')
+        if not (-1 < input_idx < output_idx < iterations_idx):
+            return None
+        iterations = text[iterations_idx + len('Iterations:'):].split()
+        return LurkProofClaim._from_fields(text[input_idx + len('Input:'):output_idx],
+                                           text[output_idx + len('Output:'):iterations_idx],
+                                           iterations[0] if iterations != [] else None)
+
+    def from_json(obj):
+        if not isinstance(obj, dict) or not all(k in obj for k in ('input', 'output', 'iterations')):
+            return None
+        return LurkProofClaim._from_fields(str(obj['input']), obj['output'], obj['iterations'])
+
+    def to_json(self):
+        return {'input': f'((open 0x{self._input_hashes[0]}) (open 0x{self._input_hashes[1]}))',
+                'output': self._output_value,
+                'iterations': self._iterations}
+
+    def from_sim_meta(path):
+        '''
+        Reads the claim from the `.meta` file of a proof of the sim backend,
+        JSON as `to_json`. Lurk's `.meta` files are binary and are not
+        read: their claims come from `!(inspect ...)`. Returns `None` if
+        the file is missing or not JSON.
+        '''
+        try:
+            with open(path, 'rb') as fh:
+                return LurkProofClaim.from_json(json.loads(fh.read()))
+        except (OSError, ValueError):
+            return None
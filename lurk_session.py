@@ -0,0 +1,245 @@
+try:
+    import subprocess as sp
+    import threading
+    import itertools
+    import time
+    from lurk_wrapper import *
+    from lurk_sim import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either subprocess, threading, itertools, time, lurk_wrapper or lurk_sim is missing.')
+    exit(1)
+
+class LurkSessionException(Exception):
+    pass
+
+def _is_balanced(text):
+    '''
+    Checks that the parentheses in `text`, outside string literals, are
+    balanced. An unbalanced command would make Lurk wait for more input
+    and swallow the sentinel that closes the reply.
+    '''
+    depth, in_str, escaped = 0, False, False
+    for c in text:
+        if in_str:
+            if escaped:
+                escaped = False
+            elif c == '\\':
+                escaped = True
+            elif c == '"':
+                in_str = False
+        elif c == '"':
+            in_str = True
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth < 0:
+                return False
+    return depth == 0 and not in_str
+
+class LurkSession:
+    '''
+    A long-lived `lurk` REPL. Commands are written to its stdin, each one
+    followed by a string literal used as a sentinel: Lurk evaluates it
+    and echoes it back, which marks the end of the command's reply.
+    '''
+    _SENTINEL = 'ZEEK-SENTINEL'
+
+    def __init__(self, lurk_cmd):
+        self._lurk_cmd  = lurk_cmd
+        self._proc      = None
+        self._lock      = threading.Lock()
+        self._counter   = itertools.count()
+        self._last_used = time.monotonic()
+
+    def is_alive(self):
+        return self._proc != None and self._proc.poll() == None
+
+    def idle_time(self):
+        return time.monotonic() - self._last_used
+
+    def _start(self):
+        # Until Lurk's welcome message, which is discarded, is Lurk's cold start.
+        with phase('spawn'):
+            self._proc = sp.Popen(self._lurk_cmd, stdin=sp.PIPE, stdout=sp.PIPE, stderr=sp.STDOUT,
+                                  text=True, encoding='utf-8', bufsize=1, start_new_session=True)
+            self._exchange('')
+
+    def _new_sentinel(self):
+        return f'{LurkSession._SENTINEL}-{next(self._counter)}'
+
+    def _exchange(self, text, on_line=None):
+        sentinel = self._new_sentinel()
+        self._proc.stdin.write(f'{text}\n"{sentinel}"\n')
+        self._proc.stdin.flush()
+        return self._read_reply(sentinel, on_line)
+
+    def _read_reply(self, sentinel, on_line=None):
+        # Lurk echoes the sentinel as a string, in quotes, after the
+        # iterations it took: the quotes keep `ZEEK-SENTINEL-1` from
+        # matching `ZEEK-SENTINEL-10`.
+        quoted = f'"{sentinel}"'
+        lines  = []
+        for line in self._proc.stdout:
+            if quoted in line:
+                return ''.join(lines)
+            lines.append(line)
+            if on_line != None:
+                on_line(line)
+        raise LurkSessionException('Lurk session terminated unexpectedly.')
+
+    def _start_timer(self, deadline, expired):
+        if deadline == None:
+            return None
+        proc = self._proc
+        def _expire():
+            # Killing Lurk ends the reply being read.
+            expired.set()
+            LurkWrapper._kill_group(proc)
+        timer = threading.Timer(deadline, _expire)
+        timer.start()
+        return timer
+
+    def run(self, text, deadline=None, on_line=None):
+        '''
+        Runs `text` in the session and returns Lurk's reply to it. A
+        session whose process died is restarted before running `text`.
+        If there is no reply within `deadline` seconds, the session is
+        killed and `LurkWrapperTimeoutException` is raised. The lines of
+        the reply are also passed to `on_line` as they arrive.
+        '''
+        if not _is_balanced(text):
+            return 'Error: unbalanced expression.\n'
+        with self._lock:
+            timer, expired = None, threading.Event()
+            try:
+                if not self.is_alive():
+                    self._start()
+                timer = self._start_timer(deadline, expired)
+                return self._exchange(text, on_line)
+            except BaseException:
+                self._kill()
+                if expired.is_set():
+                    raise LurkWrapperTimeoutException(f'No reply from Lurk after {deadline} seconds.')
+                raise
+            finally:
+                if timer != None:
+                    timer.cancel()
+                self._last_used = time.monotonic()
+
+    def run_many(self, texts, deadline=None):
+        '''
+        Runs each of `texts` in the session and returns the list of Lurk's
+        replies to them. Texts are pipelined: they are written, each one
+        followed by its sentinel, by another thread while the replies are
+        read, so Lurk never waits for Zeek between them. `deadline` is for
+        all of them.
+        '''
+        replies = ['Error: unbalanced expression.\n' if not _is_balanced(t) else None for t in texts]
+        pending = [i for i, r in enumerate(replies) if r == None]
+        with self._lock:
+            timer, expired = None, threading.Event()
+            try:
+                if not self.is_alive():
+                    self._start()
+                sentinels = [self._new_sentinel() for _ in pending]
+                stdin = self._proc.stdin
+                def _write():
+                    try:
+                        for i, sentinel in zip(pending, sentinels):
+                            stdin.write(f'{texts[i]}\n"{sentinel}"\n')
+                        stdin.flush()
+                    except (OSError, ValueError):
+                        # Lurk died, which the reader finds out.
+                        pass
+                writer = threading.Thread(target=_write, daemon=True)
+                writer.start()
+                timer = self._start_timer(deadline, expired)
+                for i, sentinel in zip(pending, sentinels):
+                    replies[i] = self._read_reply(sentinel)
+                writer.join()
+                return replies
+            except BaseException:
+                self._kill()
+                if expired.is_set():
+                    raise LurkWrapperTimeoutException(f'No reply from Lurk after {deadline} seconds.')
+                raise
+            finally:
+                if timer != None:
+                    timer.cancel()
+                self._last_used = time.monotonic()
+
+    def _kill(self):
+        if self._proc != None:
+            LurkWrapper._kill_group(self._proc)
+            self._proc.wait()
+            self._proc = None
+
+    def close(self):
+        with self._lock:
+            if self.is_alive():
+                try:
+                    # Lurk exits on end of input.
+                    self._proc.stdin.close()
+                    self._proc.wait(timeout=1)
+                except Exception:
+                    pass
+            self._kill()
+
+class LurkSessionManager:
+    '''
+    Keeps one session per (commits dir, proofs dir) pair, that is, one
+    per party. Sessions idle for longer than `idle_timeout` seconds are
+    closed the next time the manager is used.
+    Sessions run the `backend`: `lurk`, the `lurk` binary, or `sim`, the
+    in-process `LurkSim`.
+    '''
+    BACKENDS = ('lurk', 'sim')
+
+    def __init__(self, idle_timeout=300, backend='lurk'):
+        assert(backend in LurkSessionManager.BACKENDS)
+        self._idle_timeout = idle_timeout
+        self._backend      = backend
+        self._sessions     = {}
+        self._lock         = threading.Lock()
+        self._checked      = time.monotonic()
+
+    def get_backend(self):
+        return self._backend
+
+    def new_session(self, cd, pd):
+        '''
+        Returns a new session, not kept by the manager.
+        '''
+        if self._backend == 'sim':
+            return LurkSim(cd, pd)
+        return LurkSession(LurkWrapper._mk_lurk_cmd(cd, pd))
+
+    def get(self, cd, pd):
+        with self._lock:
+            self._close_idle()
+            if (cd, pd) not in self._sessions:
+                self._sessions[(cd, pd)] = self.new_session(cd, pd)
+            return self._sessions[(cd, pd)]
+
+    def _close_idle(self, force=False):
+        # With a session per party, looking for idle ones on every use
+        # would be quadratic in the number of parties.
+        if not force and time.monotonic() - self._checked < 1:
+            return
+        self._checked = time.monotonic()
+        idle = [k for k, s in self._sessions.items() if s.idle_time() > self._idle_timeout]
+        for k in idle:
+            self._sessions.pop(k).close()
+
+    def close_idle(self):
+        with self._lock:
+            self._close_idle(force=True)
+
+    def close_all(self):
+        with self._lock:
+            for s in self._sessions.values():
+                s.close()
+            self._sessions = {}
@@ -0,0 +1,573 @@
+try:
+    import os
+    import sys
+    import re
+    import json
+    import time
+    import hashlib
+    import threading
+    from contextlib import contextmanager
+    from lurk_wrapper import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, re, json, time, hashlib, threading, contextlib or lurk_wrapper is missing.')
+    exit(1)
+
+# Lurk functions recurse over lists, and so does the interpreter. The
+# recursion limit of the process is raised while forms are evaluated, by
+# any of the sims running, and restored once none is.
+_RECURSION_LIMIT = 20_000
+_recursion_lock  = threading.Lock()
+_recursion_users = 0
+_recursion_limit = None
+
+@contextmanager
+def _deep_recursion():
+    global _recursion_users, _recursion_limit
+    with _recursion_lock:
+        if _recursion_users == 0:
+            _recursion_limit = sys.getrecursionlimit()
+            sys.setrecursionlimit(max(_recursion_limit, _RECURSION_LIMIT))
+        _recursion_users += 1
+    try:
+        yield
+    finally:
+        with _recursion_lock:
+            _recursion_users -= 1
+            if _recursion_users == 0:
+                sys.setrecursionlimit(_recursion_limit)
+
+class LurkSimException(Exception):
+    pass
+
+class Sym:
+    '''
+    Symbols are interned, so they are compared by identity.
+    '''
+    _table = {}
+
+    def __init__(self, name):
+        self.name = name
+
+    def intern(name):
+        sym = Sym._table.get(name)
+        if sym == None:
+            sym = Sym._table[name] = Sym(name)
+        return sym
+
+    def __repr__(self):
+        return self.name
+
+_NIL    = Sym.intern('nil')
+_T      = Sym.intern('t')
+_QUOTE  = Sym.intern('quote')
+_LAMBDA = Sym.intern('lambda')
+_LET    = Sym.intern('let')
+_LETREC = Sym.intern('letrec')
+_BANG   = Sym.intern('!')
+
+class Closure:
+    def __init__(self, params, body, env):
+        self.params = params
+        self.body   = body
+        self.env    = env
+
+class Env:
+    def __init__(self, vars, parent=None):
+        self.vars   = vars
+        self.parent = parent
+
+    def lookup(self, sym):
+        env = self
+        while env != None:
+            if sym in env.vars:
+                return env.vars[sym]
+            env = env.parent
+        raise LurkSimException(f'Unbound variable {sym.name}')
+
+# Lists are pairs `(car, cdr)` ending in `_NIL`.
+def _list(items, tail=_NIL):
+    for item in reversed(items):
+        tail = (item, tail)
+    return tail
+
+def _items(lst):
+    items = []
+    while isinstance(lst, tuple):
+        items.append(lst[0])
+        lst = lst[1]
+    if lst is not _NIL:
+        raise LurkSimException('Improper list')
+    return items
+
+_TOKEN_RE = re.compile(r'\s+|;[^\n]*|(\(|\)|\'|"(?:\\.|[^"\\])*"|[^\s()\'";]+)')
+
+def _tokens(text):
+    '''
+    Yields the tokens of `text` with their offsets.
+    '''
+    pos = 0
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if m == None:
+            raise LurkSimException(f'Unexpected character {text[pos]}')
+        if m.group(1) != None:
+            yield m.group(1), m.start(1)
+        pos = m.end()
+
+def _atom(token):
+    if token.startswith('"'):
+        return json.loads(token) if '\\' in token else token[1:-1]
+    if token.isdigit():
+        return int(token)
+    if token.lower().startswith('0x'):
+        try:
+            return int(token, 16)
+        except ValueError:
+            pass
+    return Sym.intern(token)
+
+def read(text):
+    '''
+    Returns the top level forms of `text` as `(form, source)` pairs. Meta
+    commands, as `!(hide ...)`, are read as `(! hide ...)`.
+    '''
+    forms, stack, start = [], [], None
+    toks = list(_tokens(text))
+    i = 0
+    def _push(datum, end):
+        nonlocal start
+        # Quotes wrap the datum that follows them.
+        while stack != [] and stack[-1][0] in ('quote', 'meta'):
+            kind, _ = stack.pop()
+            datum = _list([_QUOTE, datum]) if kind == 'quote' else (_BANG, datum)
+        if stack == []:
+            forms.append((datum, text[start:end]))
+            start = None
+        else:
+            stack[-1][1].append(datum)
+    while i < len(toks):
+        token, offset = toks[i]
+        if start == None:
+            start = offset
+        if token == '(':
+            stack.append(('list', []))
+        elif token == ')':
+            if stack == [] or stack[-1][0] != 'list':
+                raise LurkSimException('Unbalanced expression')
+            _, items = stack.pop()
+            if len(items) >= 3 and items[-2] is Sym.intern('.'):
+                datum = _list(items[:-2], items[-1])
+            else:
+                datum = _list(items)
+            _push(datum, offset + 1)
+        elif token == "'":
+            stack.append(('quote', None))
+        elif token == '!' and i + 1 < len(toks) and toks[i + 1][0] == '(':
+            stack.append(('meta', None))
+        else:
+            _push(_atom(token), offset + len(token))
+        i += 1
+    if stack != []:
+        raise LurkSimException('Unbalanced expression')
+    return forms
+
+def _string(s):
+    return json.dumps(s, ensure_ascii=False)
+
+def show(value):
+    '''
+    Prints `value` as Lurk does.
+    '''
+    if isinstance(value, bool):
+        raise LurkSimException(f'Unexpected value {value}')
+    if isinstance(value, int):
+        return f'{value}'
+    if isinstance(value, str):
+        return _string(value)
+    if isinstance(value, Sym):
+        return value.name
+    if isinstance(value, Closure):
+        return f'<FUNCTION ({" ".join(p.name for p in value.params)}) {show(value.body)}>'
+    if isinstance(value, tuple):
+        if value[0] is _QUOTE and isinstance(value[1], tuple) and value[1][1] is _NIL:
+            return f"'{show(value[1][0])}"
+        items = []
+        while isinstance(value, tuple):
+            items.append(show(value[0]))
+            value = value[1]
+        tail = '' if value is _NIL else f' . {show(value)}'
+        return f'({" ".join(items)}{tail})'
+    raise LurkSimException(f'Unexpected value {value}')
+
+def _bool(b):
+    return _T if b else _NIL
+
+def _num(v):
+    if not isinstance(v, int):
+        raise LurkSimException(f'{show(v)} is not a number')
+    return v
+
+def _car(v):
+    if v is _NIL:
+        return _NIL
+    if not isinstance(v, tuple):
+        raise LurkSimException(f'car of {show(v)} is not defined')
+    return v[0]
+
+def _cdr(v):
+    if v is _NIL:
+        return _NIL
+    if not isinstance(v, tuple):
+        raise LurkSimException(f'cdr of {show(v)} is not defined')
+    return v[1]
+
+def _div(a, b):
+    if _num(b) == 0:
+        raise LurkSimException('Division by zero')
+    return _num(a) // b
+
+_BUILTINS = {
+    'cons':  lambda a, b: (a, b),
+    'car':   _car,
+    'cdr':   _cdr,
+    'atom':  lambda a: _bool(not isinstance(a, tuple)),
+    'eq':    lambda a, b: _bool(a == b),
+    '=':     lambda a, b: _bool(_num(a) == _num(b)),
+    '+':     lambda a, b: _num(a) + _num(b),
+    '-':     lambda a, b: _num(a) - _num(b),
+    '*':     lambda a, b: _num(a) * _num(b),
+    '/':     _div,
+    '%':     lambda a, b: _num(a) % _num(b) if _num(b) != 0 else _div(a, b),
+    '<':     lambda a, b: _bool(_num(a) < _num(b)),
+    '>':     lambda a, b: _bool(_num(a) > _num(b)),
+    '<=':    lambda a, b: _bool(_num(a) <= _num(b)),
+    '>=':    lambda a, b: _bool(_num(a) >= _num(b)),
+}
+_BUILTINS = {Sym.intern(k): v for k, v in _BUILTINS.items()}
+_SPECIAL  = {Sym.intern(k) for k in ('quote', 'if', 'lambda', 'let', 'letrec', 'begin', 'open', 'hide', 'commit')}
+
+class LurkSim:
+    '''
+    A pure-Python stand-in for a `LurkSession`. It interprets the subset
+    of Lurk used by `Zeek` and its examples, and answers with text in
+    Lurk's format, so `LurkWrapper` parses it as it parses Lurk's replies.
+    Commitments are salted SHA-256 hashes of the hidden value, stored as
+    `<hash>.commit` files. Proofs are not proofs: a `.proof` file records
+    the digest of the claim, in a `.meta` file, and verifying checks that
+    digest. Proof keys are named as Lurk's, so `Zeek` treats them alike.
+    '''
+    _PROOF_PREFIX = 'Nova_Pallas_10_'
+    # How often, in iterations, the deadline is checked.
+    _CHECK_EVERY  = 4096
+
+    def __init__(self, cd, pd):
+        self._cd         = cd
+        self._pd         = pd
+        self._globals    = Env({})
+        self._opened     = {}
+        self._last       = None
+        self._iterations = 0
+        self._stop_at    = None
+        self._lock       = threading.Lock()
+        self._last_used  = time.monotonic()
+
+    def is_alive(self):
+        return True
+
+    def idle_time(self):
+        return time.monotonic() - self._last_used
+
+    def close(self):
+        pass
+
+    def _digest(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _commit_path(self, hash):
+        return f'{self._cd}/{hash:064x}.commit'
+
+    # Evaluation
+
+    def _tick(self):
+        self._iterations += 1
+        if self._stop_at != None and self._iterations % LurkSim._CHECK_EVERY == 0 and time.monotonic() > self._stop_at:
+            raise LurkWrapperTimeoutException('Sim timed out.')
+
+    def eval(self, expr, env):
+        self._tick()
+        if isinstance(expr, Sym):
+            if expr is _NIL or expr is _T:
+                return expr
+            return env.lookup(expr)
+        if not isinstance(expr, tuple):
+            return expr
+        head, args = expr[0], _items(expr[1])
+        if head in _SPECIAL:
+            return self._eval_special(head.name, args, env)
+        if head in _BUILTINS:
+            try:
+                return _BUILTINS[head](*[self.eval(a, env) for a in args])
+            except TypeError:
+                raise LurkSimException(f'Wrong number of arguments to {head.name}')
+        return self.apply(self.eval(head, env), [self.eval(a, env) for a in args])
+
+    def _eval_special(self, name, args, env):
+        match name, args:
+            case 'quote', [datum]:
+                return datum
+            case 'if', [c, a]:
+                return self.eval(a, env) if self.eval(c, env) is not _NIL else _NIL
+            case 'if', [c, a, b]:
+                return self.eval(a, env) if self.eval(c, env) is not _NIL else self.eval(b, env)
+            case 'lambda', [params, body]:
+                params = _items(params)
+                if not all(isinstance(p, Sym) for p in params):
+                    raise LurkSimException('Parameters must be symbols')
+                return Closure(params, body, env)
+            case 'let', [bindings, body]:
+                for b in _items(bindings):
+                    name, value = _items(b)
+                    env = Env({name: self.eval(value, env)}, env)
+                return self.eval(body, env)
+            case 'letrec', [bindings, body]:
+                for b in _items(bindings):
+                    name, value = _items(b)
+                    env = Env({}, env)
+                    env.vars[name] = self.eval(value, env)
+                return self.eval(body, env)
+            case 'begin', [*body] if body != []:
+                for e in body:
+                    value = self.eval(e, env)
+                return value
+            case 'open', [h]:
+                return self.open(_num(self.eval(h, env)))
+            case 'hide', [salt, value]:
+                return self.hide(_num(self.eval(salt, env)), self.eval(value, env))
+            case 'commit', [value]:
+                return self.hide(0, self.eval(value, env))
+        raise LurkSimException(f'Malformed {name}')
+
+    def apply(self, f, args):
+        '''
+        Functions are curried: applied to fewer arguments than parameters,
+        they return a function of the remaining parameters.
+        '''
+        if not isinstance(f, Closure):
+            raise LurkSimException(f'{show(f)} is not a function')
+        n = len(f.params)
+        if len(args) < n:
+            if args == []:
+                return f
+            return Closure(f.params[len(args):], f.body, Env(dict(zip(f.params, args)), f.env))
+        value = self.eval(f.body, Env(dict(zip(f.params, args)), f.env) if n > 0 else f.env)
+        return self.apply(value, args[n:]) if len(args) > n else value
+
+    # Commitments
+
+    def _free(expr, bound, free):
+        if isinstance(expr, Sym):
+            if expr not in bound and expr is not _NIL and expr is not _T and expr not in _BUILTINS:
+                free.append(expr)
+        elif isinstance(expr, tuple):
+            head, args = expr[0], _items(expr[1])
+            if head is _QUOTE:
+                return
+            if head is _LAMBDA:
+                LurkSim._free(args[1], bound | set(_items(args[0])), free)
+                return
+            if head is _LET or head is _LETREC:
+                for b in _items(args[0]):
+                    name, value = _items(b)
+                    LurkSim._free(value, bound | {name} if head is _LETREC else bound, free)
+                    bound = bound | {name}
+                LurkSim._free(args[1], bound, free)
+                return
+            if head not in _SPECIAL:
+                LurkSim._free(head, bound, free)
+            for a in args:
+                LurkSim._free(a, bound, free)
+
+    def source(self, value, stack=()):
+        '''
+        Returns an expression that evaluates to `value` on its own. A
+        function is closed over the values of its free variables, and a
+        recursive one is bound by `letrec`.
+        '''
+        if isinstance(value, Closure):
+            free = []
+            LurkSim._free(value.body, set(value.params), free)
+            bindings, rec = [], None
+            for sym in dict.fromkeys(free):
+                v = value.env.lookup(sym)
+                if v is value:
+                    rec = sym
+                elif any(v is s for s in stack):
+                    raise LurkSimException('Mutually recursive functions can not be hidden')
+                else:
+                    bindings.append(f'({sym.name} {self.source(v, stack + (value,))})')
+            src = f'(lambda ({" ".join(p.name for p in value.params)}) {show(value.body)})'
+            if rec != None:
+                src = f'(letrec (({rec.name} {src})) {rec.name})'
+            if bindings != []:
+                src = f'(let ({" ".join(bindings)}) {src})'
+            return src
+        if isinstance(value, tuple):
+            if LurkSim._has_closure(value):
+                return f'(cons {self.source(value[0], stack)} {self.source(value[1], stack)})'
+            return f'(quote {show(value)})'
+        if isinstance(value, Sym) and value is not _NIL and value is not _T:
+            return f'(quote {value.name})'
+        return show(value)
+
+    def _has_closure(value):
+        while isinstance(value, tuple):
+            if isinstance(value[0], Closure) or LurkSim._has_closure(value[0]):
+                return True
+            value = value[1]
+        return isinstance(value, Closure)
+
+    def hide(self, salt, value):
+        src = self.source(value)
+        hash = int(LurkSim._digest(f'{salt} {src}'), 16)
+        with open(self._commit_path(hash), 'w') as fh:
+            json.dump({'backend': 'sim', 'salt': salt, 'value': src}, fh)
+        self._opened[hash] = value
+        return hash
+
+    def open(self, hash):
+        if hash in self._opened:
+            return self._opened[hash]
+        try:
+            with open(self._commit_path(hash)) as fh:
+                src = json.load(fh)['value']
+        except FileNotFoundError:
+            raise LurkSimException(f'Hash 0x{hash:064x} not found')
+        except (ValueError, KeyError, TypeError):
+            raise LurkSimException(f'Hash 0x{hash:064x} was not hidden by the sim backend')
+        # Hidden values are closed, so they are opened in an empty environment.
+        [(expr, _)] = read(src)
+        value = self.eval(expr, Env({}))
+        self._opened[hash] = value
+        return value
+
+    # Proofs
+
+    def _proof_key(input, output):
+        return LurkSim._PROOF_PREFIX + LurkSim._digest(f'{input}\n{output}')
+
+    def _read_proof(self, key):
+        try:
+            with open(f'{self._pd}/{key}.meta', 'rb') as fh:
+                meta = fh.read()
+            with open(f'{self._pd}/{key}.proof') as fh:
+                proof = json.load(fh)
+            claim = json.loads(meta)
+        except FileNotFoundError:
+            raise LurkSimException(f'Proof "{key}" not found')
+        except ValueError:
+            raise LurkSimException(f'Proof "{key}" was not made by the sim backend')
+        return claim, proof, hashlib.sha256(meta).hexdigest()
+
+    def prove(self):
+        if self._last == None:
+            raise LurkSimException('No expression to prove')
+        input, output, iterations = self._last
+        key  = LurkSim._proof_key(input, output)
+        meta = json.dumps({'input': input, 'output': output, 'iterations': iterations}).encode('utf-8')
+        claim_hash = hashlib.sha256(meta).hexdigest()
+        with open(f'{self._pd}/{key}.meta', 'wb') as fh:
+            fh.write(meta)
+        with open(f'{self._pd}/{key}.proof', 'w') as fh:
+            json.dump({'backend': 'sim', 'claim': claim_hash}, fh)
+        return f'Claim hash: 0x{claim_hash}\nProof key: "{key}"'
+
+    def verify(self, key):
+        claim, proof, claim_hash = self._read_proof(key)
+        if proof.get('claim') != claim_hash or LurkSim._proof_key(claim.get('input'), claim.get('output')) != key:
+            raise LurkSimException(f'Proof "{key}" failed verification')
+        return f'✓ Proof "{key}" verified'
+
+    def inspect(self, key):
+        claim, _, _ = self._read_proof(key)
+        return f'Input:\n  {claim["input"]}\nOutput:\n  {claim["output"]}\nIterations:\n  {claim["iterations"]}'
+
+    # REPL
+
+    def _meta(self, form):
+        cmd, args = form[0], _items(form[1])
+        match cmd.name if isinstance(cmd, Sym) else None, args:
+            case 'def', [Sym() as name, expr]:
+                self._globals.vars[name] = self.eval(expr, self._globals)
+                return name.name
+            case 'defrec', [Sym() as name, expr]:
+                env = Env({}, self._globals)
+                env.vars[name] = self.eval(expr, env)
+                self._globals.vars[name] = env.vars[name]
+                return name.name
+            case 'hide', [salt, expr]:
+                return f'Hash: 0x{self.hide(_num(self.eval(salt, self._globals)), self.eval(expr, self._globals)):064x}'
+            case 'commit', [expr]:
+                return f'Hash: 0x{self.hide(0, self.eval(expr, self._globals)):064x}'
+            case 'open', [h]:
+                return show(self.open(_num(self.eval(h, self._globals))))
+            case 'fetch', [h]:
+                hash = _num(self.eval(h, self._globals))
+                if not os.path.exists(self._commit_path(hash)):
+                    raise LurkSimException(f'Hash 0x{hash:064x} not found')
+                return 'Data is now available'
+            case 'load', [str() as file]:
+                with open(file) as fh:
+                    text = fh.read()
+                for f, src in read(text):
+                    self._eval_form(f, src)
+                return f'Loading {file}'
+            case 'prove', []:
+                return self.prove()
+            case 'verify', [str() as key]:
+                return self.verify(key)
+            case 'inspect', [str() as key]:
+                return self.inspect(key)
+        raise LurkSimException(f'Unknown meta command {show(form)}')
+
+    def _eval_form(self, form, src):
+        if isinstance(form, tuple) and form[0] is _BANG:
+            return self._meta(form[1])
+        start = self._iterations
+        value = self.eval(form, self._globals)
+        iterations = self._iterations - start
+        self._last = (' '.join(src.split()), show(value), iterations)
+        return f'[{iterations} iteration{"" if iterations == 1 else "s"}] => {show(value)}'
+
+    def run(self, text, deadline=None, on_line=None):
+        '''
+        Runs `text` and returns the reply Lurk would have given. Forms are
+        evaluated in order and an error ends the reply. If `deadline`
+        seconds pass, `LurkWrapperTimeoutException` is raised.
+        '''
+        with self._lock:
+            self._stop_at = time.monotonic() + deadline if deadline != None else None
+            lines = []
+            try:
+                with _deep_recursion():
+                    for form, src in read(text):
+                        lines.append(self._eval_form(form, src))
+            except (LurkSimException, OSError) as e:
+                lines.append(f'Error: {e}')
+            except RecursionError:
+                lines.append('Error: Recursion too deep')
+            finally:
+                self._last_used = time.monotonic()
+            reply = ''.join(f'{l}\n' for l in '\n'.join(lines).split('\n'))
+            if on_line != None:
+                for line in reply.splitlines(keepends=True):
+                    on_line(line)
+            return reply
+
+    def run_many(self, texts, deadline=None):
+        stop_at = time.monotonic() + deadline if deadline != None else None
+        replies = []
+        for text in texts:
+            replies.append(self.run(text, stop_at - time.monotonic() if stop_at != None else None))
+        return replies
@@ -2,25 +2,116 @@ try:
     import shutil as sh
     import subprocess as sp
     import random as rand
+    import os
+    import signal
+    import time
+    import threading
+    import tempfile
+    from lurk_meta import *
+    from zeek_metrics import *
 except Exception as e:
     print(e)
     print('Check your Python 3 installation.')
-    print('Either shutil, subprocess, or random is missing.')
+    print('Either shutil, subprocess, random, os, signal, time, threading, tempfile, lurk_meta or zeek_metrics is missing.')
     exit(1)
 
+# Draws the salt of each commit. Replaced to record or pin salts, so that
+# a replayed session makes the same commits.
+_salt_source = None
+
+def set_salt_source(source):
+    '''
+    Salts of commits are drawn by `source()`, or at random if `source` is
+    `None`.
+    '''
+    global _salt_source
+    _salt_source = source
+
+def random_salt():
+    return rand.randint(10_000_000_000, 100_000_000_000)
+
+def new_salt():
+    source = _salt_source
+    return source() if source != None else random_salt()
+
 class LurkWrapperCmdException(Exception):
     pass
 
 class LurkWrapperCommException(Exception):
     pass
 
+class LurkWrapperTimeoutException(LurkWrapperCommException):
+    pass
+
+class LurkReader:
+    '''
+    Reads Lurk's reply to a command line by line. If the result of the
+    command fits a line, starting with `marker`, that line is the reply
+    and reading may stop as soon as it arrives. The lines before it are
+    passed to `on_progress` as they arrive. Otherwise the reply is made
+    of all the lines read.
+    '''
+    _WELCOME = 'welcomes you.'
+
+    def __init__(self, marker, on_progress):
+        self._marker      = marker
+        self._on_progress = on_progress
+        self._lines       = []
+        self._result      = None
+
+    def feed(self, line):
+        '''
+        Reads `line` and returns whether the result arrived.
+        '''
+        if self._result != None:
+            return True
+        if self._marker != None and self._marker in line and not LurkWrapper._has_error(line):
+            self._result = line
+            self._lines  = []
+            return True
+        self._lines.append(line)
+        if self._on_progress != None and line.strip() != '' and LurkReader._WELCOME not in line:
+            self._on_progress(line.rstrip('\n'))
+        return False
+
+    def has_result(self):
+        return self._result != None
+
+    def get_reply(self):
+        return self._result if self._result != None else ''.join(self._lines)
+
 class LurkWrapper:
-    def __init__(self, timeout, cd, pd):
+    TIMEOUT = 2
+    _TABLE_NAME = 'zeek_table'
+    # Commands whose result fits a line, and how that line starts.
+    _RESULT_MARKERS = {'Hide': 'Hash: 0x', 'Load': 'Hash: 0x', 'Prove': 'Proof key: ', 'Verify': 'Proof '}
+
+    def __init__(self, timeout, cd, pd, session=None, deadlines=None, on_progress=None):
+        '''
+        When a session, a `LurkSession` or a `LurkSim`, is given, commands
+        are run in it instead of in a fresh `lurk` process.
+        Each command must finish before the deadline `deadlines.get(op)`
+        of its operation, or before `timeout` seconds if no `deadlines`
+        are given. Otherwise Lurk is killed and the command returns
+        `LurkWrapper.TIMEOUT`.
+        The lines Lurk prints before the result of a command are passed to
+        `on_progress`, if given, as they arrive.
+        '''
+        self._timeout = timeout
+        self._lurk_cmd = LurkWrapper._mk_lurk_cmd(cd, pd) if session == None else None
+        self._session = session
+        self._deadlines = deadlines
+        self._on_progress = on_progress
+        self._proc = None
+
+    def set_on_progress(self, on_progress):
+        self._on_progress = on_progress
+
+    def _mk_lurk_cmd(cd, pd):
         lurk_path = sh.which('lurk')
         if lurk_path == None:
             raise LurkWrapperCmdException('Lurk is not installed.')
-        self._timeout = timeout
-        self._lurk_cmd = [lurk_path, f'--commits-dir={cd}', f"--proofs-dir={pd}"]
+        return [lurk_path, f'--commits-dir={cd}', f"--proofs-dir={pd}"]
 
     def _mk_hide_cmd(salt, value):
         '''
@@ -39,6 +130,18 @@ class LurkWrapper:
         assert(fun != None)
         return 'Load', ['!(load', f'\"{file}\")\n'] + ['!(hide', f'{salt}', f'{fun})']
 
+    def _mk_table_file(file):
+        '''
+        Writes a temporary Lurk file defining `zeek_table` as the value in
+        `file`, copied in chunks, and returns its path.
+        '''
+        fd, path = tempfile.mkstemp(prefix='zeek-', suffix='.lurk')
+        with os.fdopen(fd, 'wb') as out, open(file, 'rb') as fh:
+            out.write(f'!(def {LurkWrapper._TABLE_NAME}\n'.encode('utf-8'))
+            sh.copyfileobj(fh, out)
+            out.write(b'\n)\n')
+        return path
+
     def _mk_open_cmd(value):
         assert(value != None)
         return 'Open', ['!(open', f'{value})']
@@ -58,8 +161,16 @@ class LurkWrapper:
 
     def _mk_inspect_cmd(proof_key):
         assert(proof_key != '' and proof_key != None)
-        return 'Verify', ['!(inspect', f'{proof_key})']
+        return 'Inspect', ['!(inspect', f'{proof_key})']
     
+    def _exit_idx(out):
+        '''
+        Replies from a `LurkSession` do not end with `Exiting...`, as the
+        REPL is still running, so the whole reply is used instead.
+        '''
+        exit_idx = out.find('\nExiting...')
+        return exit_idx if exit_idx != -1 else len(out.rstrip('\n'))
+
     def _has_error(out):
         assert(out != '' or out != None)
         return 'Error' in out or 'failed' in out
@@ -69,120 +180,231 @@ class LurkWrapper:
         if 'Error' in out:
             return out[out.find('Error:'):len(out)-1]
         elif 'failed' in out:
-            return out[out.find('failed with ') + len('failed with '):out.find('\nExiting...')]
+            return out[out.find('failed with ') + len('failed with '):LurkWrapper._exit_idx(out)]
         else:
             return None
     
     def _get_hash(out):
         assert(not LurkWrapper._has_error(out))
         hash_idx = out.find('Hash: 0x') + len('Hash: 0x')
-        exit_idx = out.find('\nExiting...')
+        exit_idx = LurkWrapper._exit_idx(out)
         return out[hash_idx:exit_idx]
 
     def _get_output(out):
         assert(not LurkWrapper._has_error(out))
         res_idx = out.find('=> ')
         res_idx += len('=> ')
-        exit_idx = out.find('\nExiting...')
+        exit_idx = LurkWrapper._exit_idx(out)
         return out[res_idx:exit_idx]
 
     def _get_verify_output(out):
         assert(not LurkWrapper._has_error(out))
         res_idx = out.find('Proof ')
-        exit_idx = out.find('\nExiting...')
+        exit_idx = LurkWrapper._exit_idx(out)
         return out[res_idx:exit_idx]
 
     def _get_open_output(out):
         assert(not LurkWrapper._has_error(out))
-        welcome_idx = out.find('you.\n') + len('you.\n') - 1
-        exit_idx = out.find('\nExiting...')
-        return out[welcome_idx+1:exit_idx].replace('FUNCTION', 'lambda').replace('.lurk.user.','')
+        welcome_idx = out.find('you.\n')
+        start_idx = welcome_idx + len('you.\n') if welcome_idx != -1 else 0
+        exit_idx = LurkWrapper._exit_idx(out)
+        return out[start_idx:exit_idx].replace('FUNCTION', 'lambda').replace('.lurk.user.','')
 
     def _get_inspect_output(out):
         assert(not LurkWrapper._has_error(out))
-        out_list = out.split()
-        input_idx  = out_list.index('Input:')
-        output_idx = out_list.index('Output:')
-        iterations_idx = out_list.index('Iterations:')
-        # It's assumed that the input is of the form
-        # ((open <hash 1>)(open <hash 2>))
-        # Therefore, <hash 1> is located at index 1 and <hash 2> is located at index 3.
-        input_list = out_list[input_idx + 1:output_idx]
-        input_hashes = input_list[1].strip(')'), input_list[3].strip(')')
-        # Output value is a list
-        output_value = out_list[output_idx + 1:iterations_idx] 
-        return input_hashes, output_value
+        claim = LurkProofClaim.from_text(out)
+        if claim == None:
+            raise LurkWrapperCommException('Unexpected inspect output.')
+        return claim
     
     def _get_proof_key(out):
         assert(not LurkWrapper._has_error(out))
         # Proof keys are surrouded by "" so we need to adjust the indices
         res_idx = out.find('Proof key: ') + len('Proof key: ') + 1 
-        exit_idx = out.find('\nExiting...') - 1 
+        exit_idx = LurkWrapper._exit_idx(out) - 1
         return out[res_idx:exit_idx].strip('\"')
     
+    def _result(out, get):
+        '''
+        Parses Lurk's reply `out` to a command: `(1, error)` if Lurk
+        reported an error and `(0, get(out))` otherwise.
+        '''
+        with phase('parse'):
+            if LurkWrapper._has_error(out):
+                return 1, LurkWrapper._get_error(out)
+            return 0, get(out)
+
+    def _kill_group(proc):
+        '''
+        Kills `proc` and every process it started. Lurk is run as the leader
+        of its own process group, so no process is left behind.
+        '''
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def _deadline(self, cmd):
+        return self._deadlines.get(cmd.lower()) if self._deadlines != None else self._timeout
+
     def _run(self, cmd, cmd_list):
+        deadline = self._deadline(cmd)
+        start = time.monotonic()
+        with phase('lurk', op=cmd.lower(), session=self._session != None) as attrs:
+            out = self._run_until(cmd, cmd_list, deadline)
+            attrs['rc'] = 1 if LurkWrapper._has_error(out) else 0
+        if self._deadlines != None and not LurkWrapper._has_error(out):
+            self._deadlines.record(cmd.lower(), time.monotonic() - start)
+        return out
+
+    def _reap(lurk_p, echo_p):
+        # Lurk exits once it reads the end of its input. What it prints
+        # after the result is discarded.
+        for _ in lurk_p.stdout:
+            pass
+        lurk_p.wait()
+        echo_p.wait()
+
+    def _run_until(self, cmd, cmd_list, deadline):
+        reader = LurkReader(LurkWrapper._RESULT_MARKERS.get(cmd), self._on_progress)
         try:
-            echo_p = sp.Popen(["echo"] + cmd_list, stdout=sp.PIPE)
-            lurk_p = sp.Popen(self._lurk_cmd, stdin=echo_p.stdout, stdout=sp.PIPE, stderr=sp.PIPE)
+            if self._session != None:
+                # Same text echo would have written to Lurk's stdin.
+                out = self._session.run(' '.join(cmd_list), deadline, reader.feed)
+                return reader.get_reply() if reader.has_result() else out
+            with phase('spawn'):
+                echo_p = sp.Popen(["echo"] + cmd_list, stdout=sp.PIPE)
+                lurk_p = sp.Popen(self._lurk_cmd, stdin=echo_p.stdout, stdout=sp.PIPE, stderr=sp.STDOUT,
+                                  text=True, encoding='utf-8', start_new_session=True)
+            self._proc = lurk_p
             echo_p.stdout.close()
             # Executes echo <cmd> | lurk
             # For example: echo !(hide 123 53) | lurk
-            # comm_out = lurk_p.communicate(timeout=self._timeout)
-            comm_out = lurk_p.communicate()
+            expired = threading.Event()
+            def _expire():
+                # Killing Lurk ends its output.
+                expired.set()
+                LurkWrapper._kill_group(lurk_p)
+            timer = threading.Timer(deadline, _expire) if deadline != None else None
+            if timer != None:
+                timer.start()
+            try:
+                for line in lurk_p.stdout:
+                    if reader.feed(line):
+                        break
+            except BaseException:
+                # Ctrl-C does not reach Lurk, which runs in its own session.
+                LurkWrapper._kill_group(lurk_p)
+                LurkWrapper._reap(lurk_p, echo_p)
+                raise
+            finally:
+                if timer != None:
+                    timer.cancel()
+            if expired.is_set():
+                LurkWrapper._reap(lurk_p, echo_p)
+                raise LurkWrapperTimeoutException(f'{cmd} timed out after {deadline} seconds.')
+            if reader.has_result():
+                threading.Thread(target=LurkWrapper._reap, args=(lurk_p, echo_p), daemon=True).start()
+                return reader.get_reply()
+            LurkWrapper._reap(lurk_p, echo_p)
             if lurk_p.returncode < 0:
                 raise LurkWrapperCommException(f'{cmd} failed.')
             else:
-                return (comm_out[0]).decode('utf-8') + (comm_out[1]).decode('utf-8')
+                return reader.get_reply()
+        except LurkWrapperTimeoutException:
+            raise
         except Exception as e:
             print(e)
             raise LurkWrapperCommException(f'{cmd} failed.')
 
+    def cancel(self):
+        '''
+        Kills the `lurk` process running the current command, if any.
+        Only commands run outside a `LurkSession` can be cancelled.
+        '''
+        if self._proc != None and self._proc.poll() == None:
+            LurkWrapper._kill_group(self._proc)
+
     def load_and_hide(self, file, fun):
-        salt = rand.randint(10_000_000_000, 100_000_000_000)
+        salt = new_salt()
         try:            
             load_cmd = LurkWrapper._mk_load_and_hide_cmd(file, salt, fun)
             out = self._run(load_cmd[0], load_cmd[1])
-            if LurkWrapper._has_error(out):
-                return 1, LurkWrapper._get_error(out)
-            else:
-                return 0, LurkWrapper._get_hash(out)
+            return LurkWrapper._result(out, LurkWrapper._get_hash)
+        except LurkWrapperTimeoutException as e:
+            return LurkWrapper.TIMEOUT, f'{e}'
         except Exception as e:
             print(e)
             raise LurkWrapperCommException('Load failed.')
 
+    def hide_table(self, file):
+        '''
+        Hides the table in `file`. Lurk loads it from a generated file, so
+        its size is not bounded by the command line.
+        '''
+        try:
+            path = LurkWrapper._mk_table_file(file)
+        except OSError as e:
+            return 1, f'{e}'
+        try:
+            return self.load_and_hide(path, LurkWrapper._TABLE_NAME)
+        finally:
+            os.remove(path)
+
     def open(self, value):
         try:
             open_cmd = LurkWrapper._mk_open_cmd(value)
             out = self._run(open_cmd[0], open_cmd[1])
-            if LurkWrapper._has_error(out):
-                return 1, LurkWrapper._get_error(out)
-            else:
-                return 0, LurkWrapper._get_open_output(out)
+            return LurkWrapper._result(out, LurkWrapper._get_open_output)
+        except LurkWrapperTimeoutException as e:
+            return LurkWrapper.TIMEOUT, f'{e}'
         except Exception as e:
             print(e)
             raise LurkWrapperCommException('Open failed.')
 
     def hide(self, value):
-        salt = rand.randint(10_000_000_000, 100_000_000_000)
+        salt = new_salt()
         try:
             hide_cmd = LurkWrapper._mk_hide_cmd(salt, value)
             out = self._run(hide_cmd[0], hide_cmd[1])
-            if LurkWrapper._has_error(out):
-                return 1, LurkWrapper._get_error(out)
-            else:
-                return 0, LurkWrapper._get_hash(out)
+            return LurkWrapper._result(out, LurkWrapper._get_hash)
+        except LurkWrapperTimeoutException as e:
+            return LurkWrapper.TIMEOUT, f'{e}'
         except Exception as e:
             print(e)
             raise LurkWrapperCommException('Hide failed.')
 
+    def hide_many(self, values):
+        '''
+        Hides each of `values`, Lurk expressions, and returns the pair
+        `(rc, out)` of each one. In a `LurkSession`, they are all sent to
+        Lurk at once.
+        '''
+        if self._session == None:
+            return [self.hide([v]) for v in values]
+        hide_cmds = [LurkWrapper._mk_hide_cmd(new_salt(), [v]) for v in values]
+        deadline = self._deadline('Hide')
+        start = time.monotonic()
+        try:
+            with phase('lurk', op='hide', session=True, values=len(values)):
+                outs = self._session.run_many([' '.join(c[1]) for c in hide_cmds],
+                                              deadline * len(values) if deadline != None else None)
+        except LurkWrapperTimeoutException as e:
+            return [(LurkWrapper.TIMEOUT, f'{e}')] * len(values)
+        except Exception as e:
+            print(e)
+            raise LurkWrapperCommException('Hide failed.')
+        if self._deadlines != None and values != []:
+            self._deadlines.record('hide', (time.monotonic() - start) / len(values))
+        return [LurkWrapper._result(out, LurkWrapper._get_hash) for out in outs]
+
     def call(self, test, value):
         try:
             apply_cmd = LurkWrapper._mk_apply_cmd(test, value)
             out = self._run(apply_cmd[0], apply_cmd[1])
-            if LurkWrapper._has_error(out):
-                return 1, LurkWrapper._get_error(out)
-            else:
-                return 0, LurkWrapper._get_output(out)
+            return LurkWrapper._result(out, LurkWrapper._get_output)
+        except LurkWrapperTimeoutException as e:
+            return LurkWrapper.TIMEOUT, f'{e}'
         except Exception as e:
             print(e)
             raise LurkWrapperCommException('Apply failed.')
@@ -191,10 +413,9 @@ class LurkWrapper:
         try:
             prove_cmd = LurkWrapper._mk_prove_cmd(test, value)
             out = self._run(prove_cmd[0], prove_cmd[1])
-            if LurkWrapper._has_error(out):
-                return 1, LurkWrapper._get_error(out)
-            else:
-                return 0, LurkWrapper._get_proof_key(out)
+            return LurkWrapper._result(out, LurkWrapper._get_proof_key)
+        except LurkWrapperTimeoutException as e:
+            return LurkWrapper.TIMEOUT, f'{e}'
         except Exception as e:
             print(e)
             raise LurkWrapperCommException('Prove failed.')
@@ -203,26 +424,26 @@ class LurkWrapper:
         try:
             verify_cmd = LurkWrapper._mk_verify_cmd(proof_key)
             out = self._run(verify_cmd[0], verify_cmd[1])
-            if LurkWrapper._has_error(out):
-                return 1, LurkWrapper._get_error(out)
-            else:
-                return 0, LurkWrapper._get_verify_output(out)
+            return LurkWrapper._result(out, LurkWrapper._get_verify_output)
+        except LurkWrapperTimeoutException as e:
+            return LurkWrapper.TIMEOUT, f'{e}'
         except Exception as e:
             print(e)
             raise LurkWrapperCommException('Verify failed.')
 
-    def inspect(self, proof_key, test, value, output):
+    def get_claim(self, proof_key):
         try:
             inspect_cmd = LurkWrapper._mk_inspect_cmd(proof_key)
             out = self._run(inspect_cmd[0], inspect_cmd[1])
-            if LurkWrapper._has_error(out):
-                return 1, LurkWrapper._get_error(out)
-            else:
-                # Proof_input is a pair of the hash representing a predicate and
-                # the hash representing a value.
-                # Proof output is list denoting a (structured) value.
-                proof_input, proof_output = LurkWrapper._get_inspect_output(out)
-                return 0, (test == proof_input[0] and value == proof_input[1] and output in proof_output)
+            return LurkWrapper._result(out, LurkWrapper._get_inspect_output)
+        except LurkWrapperTimeoutException as e:
+            return LurkWrapper.TIMEOUT, f'{e}'
         except Exception as e:
             print(e)
             raise LurkWrapperCommException('Inspect failed.')
+
+    def inspect(self, proof_key, test, value, output):
+        rc, claim = self.get_claim(proof_key)
+        if rc != 0:
+            return rc, claim
+        return 0, claim.matches(test, value, output)
@@ -0,0 +1,56 @@
+'''
+Tests of reading the claims of proofs.
+'''
+try:
+    import os
+    import sys
+    import json
+    import tempfile
+    import unittest
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from lurk_meta import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, json, tempfile, unittest or lurk_meta is missing.')
+    exit(1)
+
+_TEST  = 'a' * 64
+_VALUE = 'b' * 64
+_INPUT = f'((open 0x{_TEST}) (open 0x{_VALUE}))'
+
+class LurkProofClaimTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _meta(self, data):
+        path = f'{self._dir.name}/proof.meta'
+        with open(path, 'wb') as fh:
+            fh.write(data)
+        return path
+
+    def test_inspect_output(self):
+        claim = LurkProofClaim.from_text(f'Input:\n  {_INPUT}\nOutput:\n  t\nIterations:\n  12\n')
+        self.assertEqual(claim.get_input_hashes(), (_TEST, _VALUE))
+        self.assertEqual(claim.get_iterations(), 12)
+        self.assertTrue(claim.matches(_TEST, f'0x{_VALUE}', 't'))
+        self.assertFalse(claim.matches(_TEST, _VALUE, 'nil'))
+        self.assertEqual(LurkProofClaim.from_text('Error: no such proof'), None)
+
+    def test_sim_meta(self):
+        path  = self._meta(json.dumps({'input': _INPUT, 'output': 't', 'iterations': 3}).encode('utf-8'))
+        claim = LurkProofClaim.from_sim_meta(path)
+        self.assertTrue(claim.matches(_TEST, _VALUE, 't'))
+        self.assertEqual(LurkProofClaim.from_json(claim.to_json()).get_input_hashes(), (_TEST, _VALUE))
+
+    def test_lurk_meta_is_not_read(self):
+        # Lurk's metadata is binary.
+        self.assertEqual(LurkProofClaim.from_sim_meta(self._meta(bytes(range(256)))), None)
+        self.assertEqual(LurkProofClaim.from_sim_meta(self._meta(b'Input: Output: Iterations: 1')), None)
+        self.assertEqual(LurkProofClaim.from_sim_meta(f'{self._dir.name}/missing.meta'), None)
+
+if __name__ == '__main__':
+    unittest.main()
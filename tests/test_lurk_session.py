@@ -0,0 +1,50 @@
+'''
+Tests of how replies of a Lurk session are framed by their sentinels.
+'''
+try:
+    import os
+    import io
+    import sys
+    import unittest
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from lurk_session import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, io, sys, unittest or lurk_session is missing.')
+    exit(1)
+
+class _Proc:
+    # Lurk's stdout, as lines already written.
+    def __init__(self, text):
+        self.stdout = io.StringIO(text)
+
+def _session(text):
+    session = LurkSession(['lurk'])
+    session._proc = _Proc(text)
+    return session
+
+class ReadReplyTest(unittest.TestCase):
+    def test_reply_ends_at_its_sentinel(self):
+        session = _session('[3 iterations] => 42\n[1 iteration] => "ZEEK-SENTINEL-1"\nnext\n')
+        self.assertEqual(session._read_reply('ZEEK-SENTINEL-1'), '[3 iterations] => 42\n')
+        self.assertEqual(session._proc.stdout.readline(), 'next\n')
+
+    def test_sentinel_does_not_match_longer_sentinels(self):
+        session = _session('[1 iteration] => "ZEEK-SENTINEL-10"\n'
+                           '[1 iteration] => "ZEEK-SENTINEL-1"\n')
+        self.assertEqual(session._read_reply('ZEEK-SENTINEL-1'), '[1 iteration] => "ZEEK-SENTINEL-10"\n')
+
+    def test_lines_are_passed_as_they_arrive(self):
+        session = _session('Proving step 1/2\nProving step 2/2\n[1 iteration] => "ZEEK-SENTINEL-7"\n')
+        lines = []
+        session._read_reply('ZEEK-SENTINEL-7', lines.append)
+        self.assertEqual(lines, ['Proving step 1/2\n', 'Proving step 2/2\n'])
+
+    def test_reply_without_sentinel_fails(self):
+        session = _session('[3 iterations] => 42\n')
+        with self.assertRaises(LurkSessionException):
+            session._read_reply('ZEEK-SENTINEL-1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+'''
+Tests of the sim backend on the examples of the README.
+'''
+try:
+    import os
+    import sys
+    import tempfile
+    import unittest
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from lurk_sim import *
+    from zeek_prompt import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, tempfile, unittest, lurk_sim or zeek_prompt is missing.')
+    exit(1)
+
+_DATA_DIR = f'{os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}/data'
+_TEST     = ['(lambda', '(x)', '(>=', 'x', '18))']
+
+def _check(rc, out):
+    if rc != 0:
+        raise Exception(out)
+    return out
+
+class LurkSimTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._sim = LurkSim(self._dir.name, self._dir.name)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_replies_are_in_lurk_format(self):
+        self.assertEqual(self._sim.run('(+ 1 2)'), '[3 iterations] => 3\n')
+        self.assertEqual(self._sim.run('(car 5) (+ 1 2)'), 'Error: car of 5 is not defined\n')
+
+    def test_deep_recursion_restores_the_limit(self):
+        limit = sys.getrecursionlimit()
+        reply = self._sim.run('(letrec ((f (lambda (n) (if (= n 0) 0 (+ 1 (f (- n 1))))))) (f 3000))')
+        self.assertTrue(reply.endswith('=> 3000\n'))
+        self.assertEqual(sys.getrecursionlimit(), limit)
+
+class ReadmeExamplesTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._zp  = ZeekPrompt(f'{self._dir.name}/.zeek', backend='sim')
+        alan = _check(*self._zp.handle_new_party(['alan']))
+        self._zp.handle_party(alan)
+
+    def tearDown(self):
+        self._zp.close()
+        self._dir.cleanup()
+
+    def _credit_report(self, credit_in_use):
+        with open(f'{_DATA_DIR}/credit-score-table.lurk') as fh:
+            table = fh.read().replace('("credit_in_use" . 0)', f'("credit_in_use" . {credit_in_use})')
+        file = f'{self._dir.name}/credit-report-{credit_in_use}.lurk'
+        with open(file, 'w') as fh:
+            fh.write(table)
+        return _check(*self._zp.handle_hide_table(file))
+
+    def test_legal_age(self):
+        zp    = self._zp
+        test  = _check(*zp.handle_hide(_TEST))
+        adult = _check(*zp.handle_hide(['20']))
+        minor = _check(*zp.handle_hide(['15']))
+        self.assertEqual(_check(*zp.handle_call(test, adult)), 't')
+        self.assertEqual(_check(*zp.handle_call(test, minor)), 'nil')
+        proof = _check(*zp.handle_prove(test, adult))
+        _check(*zp.handle_verify(f'"{proof}"'))
+        self.assertTrue(_check(*zp.handle_inspect(proof, test, adult, 't')))
+        self.assertFalse(_check(*zp.handle_inspect(proof, test, minor, 't')))
+
+    def test_credit_score(self):
+        zp = self._zp
+        cr_check = _check(*zp.handle_load_and_hide(f'{_DATA_DIR}/cr-check-function.lurk', 'credit_score_OK?'))
+        self.assertEqual(_check(*zp.handle_call(cr_check, self._credit_report(0))), 't')
+        # Using more than a fifth of the credit fails the check.
+        self.assertEqual(_check(*zp.handle_call(cr_check, self._credit_report(9))), 'nil')
+
+if __name__ == '__main__':
+    unittest.main()
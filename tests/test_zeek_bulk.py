@@ -0,0 +1,96 @@
+'''
+Tests of bulk files: reading CSV and JSON Lines rows and writing them
+as Lurk data.
+'''
+try:
+    import os
+    import sys
+    import tempfile
+    import unittest
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeek_bulk import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, tempfile, unittest or zeek_bulk is missing.')
+    exit(1)
+
+# (row, Lurk expression)
+_TO_LURK = [
+    ({'age': 18},                      "'((\"age\" . 18))"),
+    ({'name': 'Alan'},                 "'((\"name\" . \"Alan\"))"),
+    ({'q': 'say "hi"'},                "'((\"q\" . \"say \\\"hi\\\"\"))"),
+    ({'p': 'a\\b'},                    "'((\"p\" . \"a\\\\b\"))"),
+    ({'ok': True, 'no': False},        "'((\"ok\" . t) (\"no\" . nil))"),
+    ({'none': None},                   "'((\"none\" . nil))"),
+    ({'xs': [1, [2, 3], []]},          "'((\"xs\" . (1 (2 3) ())))"),
+    ({'o': {'a': 1, 'b': {'c': 'd'}}}, "'((\"o\" . ((\"a\" . 1) (\"b\" . ((\"c\" . \"d\"))))))"),
+    ({1: 2},                           "'((\"1\" . 2))"),
+    ({},                               "'()"),
+]
+
+_NOT_LURK = [
+    {'n': -1},
+    {'x': 1.5},
+    {'xs': [1, -2]},
+    {'o': {'x': object()}},
+]
+
+# (file name, contents, [(n, row, is_error)])
+_READ_ROWS = [
+    ('plain.csv', 'name,age\nalan,18\nbee,7\n',
+     [(1, {'name': 'alan', 'age': 18}, False), (2, {'name': 'bee', 'age': 7}, False)]),
+    ('quoted.csv', 'name,note\n"smith, alan","say ""hi"""\n',
+     [(1, {'name': 'smith, alan', 'note': 'say "hi"'}, False)]),
+    ('types.csv', 'a,b,c\n-1,1.5,\n',
+     [(1, {'a': '-1', 'b': '1.5', 'c': ''}, False)]),
+    ('ragged.csv', 'a,b\n1\n1,2,3\n4,5\n',
+     [(1, None, True), (2, None, True), (3, {'a': 4, 'b': 5}, False)]),
+    ('empty.csv', 'a,b\n', []),
+    ('plain.jsonl', '{"name": "alan", "age": 18}\n\n{"xs": [1, {"a": null}]}\n',
+     [(1, {'name': 'alan', 'age': 18}, False), (2, {'xs': [1, {'a': None}]}, False)]),
+    ('bad.jsonl', '{"a": 1\n[1, 2]\n"a"\n{"b": 2}\n',
+     [(1, None, True), (2, None, True), (3, None, True), (4, {'b': 2}, False)]),
+    ('UPPER.JSONL', '{"a": 1}\n', [(1, {'a': 1}, False)]),
+]
+
+class ZeekBulkTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _rows(self, name, text):
+        file = f'{self._dir.name}/{name}'
+        with open(file, 'w', newline='') as f:
+            f.write(text)
+        return list(read_rows(file))
+
+    def test_to_lurk(self):
+        for row, lurk in _TO_LURK:
+            with self.subTest(row=row):
+                self.assertEqual(to_lurk(row), lurk)
+
+    def test_not_lurk(self):
+        for row in _NOT_LURK:
+            with self.subTest(row=row):
+                with self.assertRaises(ZeekBulkException):
+                    to_lurk(row)
+
+    def test_read_rows(self):
+        for name, text, rows in _READ_ROWS:
+            with self.subTest(file=name):
+                got = self._rows(name, text)
+                self.assertEqual([(n, row, error != None) for n, row, error in got], rows)
+                for n, row, error in got:
+                    self.assertTrue((row == None) != (error == None))
+
+    def test_other_files(self):
+        with self.assertRaises(ZeekBulkException):
+            self._rows('rows.txt', 'a,b\n1,2\n')
+        with self.assertRaises(OSError):
+            list(read_rows(f'{self._dir.name}/missing.csv'))
+
+if __name__ == '__main__':
+    unittest.main()
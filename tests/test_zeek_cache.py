@@ -0,0 +1,166 @@
+'''
+Tests of the persistent caches kept in `cache.db`.
+'''
+try:
+    import os
+    import sys
+    import json
+    import shutil
+    import itertools
+    import tempfile
+    import unittest
+    from unittest import mock
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeek_cache import *
+    from zeek_prompt import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, json, shutil, itertools, tempfile, unittest, zeek_cache or zeek_prompt is missing.')
+    exit(1)
+
+class _Clock:
+    # A clock that ticks on every reading, so that entries are never used
+    # at the same time.
+    def __init__(self):
+        self._ticks = itertools.count(1)
+
+    def time(self):
+        return float(next(self._ticks))
+
+class ZeekCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        clock = mock.patch('zeek_cache.time', _Clock())
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _cache(self, max_entries=3):
+        cache = ZeekCache(self._dir.name, 'entries', max_entries)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_hits_and_misses(self):
+        cache = self._cache()
+        self.assertEqual(cache.get('a'), None)
+        cache.put('a', {'out': [1, 2]})
+        self.assertEqual(cache.get('a'), {'out': [1, 2]})
+        cache.put('a', 'b')
+        self.assertEqual(cache.get('a'), 'b')
+        self.assertEqual(cache.get_stats(), (2, 1, 1))
+
+    def test_least_recently_used_are_evicted(self):
+        cache = self._cache()
+        for key in 'abc':
+            cache.put(key, key)
+        # `a` is used again, so `b` is now the least recently used.
+        cache.get('a')
+        cache.put('d', 'd')
+        self.assertEqual([k for k in 'abcd' if cache.get(k) != None], ['a', 'c', 'd'])
+        cache.put('e', 'e')
+        cache.put('f', 'f')
+        self.assertEqual(cache.get_stats()[2], 3)
+        self.assertEqual([k for k in 'acdef' if cache.get(k) != None], ['d', 'e', 'f'])
+
+    def test_updates_do_not_count_as_entries(self):
+        cache = self._cache()
+        for n in range(10):
+            cache.put('a', n)
+        cache.put('b', 'b')
+        cache.put('c', 'c')
+        self.assertEqual([k for k in 'abc' if cache.get(k) != None], ['a', 'b', 'c'])
+
+    def test_entries_are_counted_when_reopened(self):
+        cache = self._cache()
+        cache.put('a', 'a')
+        cache.put('b', 'b')
+        cache.close()
+        cache = self._cache()
+        self.assertEqual(cache._entries, 2)
+        cache.put('c', 'c')
+        cache.put('d', 'd')
+        self.assertEqual(cache._entries, 3)
+        self.assertEqual(cache.get('a'), None)
+
+    def test_entries_of_other_processes_are_evicted(self):
+        cache, other = self._cache(), self._cache()
+        for key in 'abc':
+            other.put(key, key)
+        # They are counted once this cache seems full.
+        for key in 'defg':
+            cache.put(key, key)
+        self.assertEqual(cache.get_stats()[2], 3)
+        self.assertEqual([k for k in 'abcdefg' if cache.get(k) != None], ['e', 'f', 'g'])
+
+def _check(rc, out):
+    if rc != 0:
+        raise Exception(out)
+    return out
+
+class VerifyCacheTest(unittest.TestCase):
+    '''
+    A verification is only served from the cache for the very files that
+    were verified.
+    '''
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._zp  = ZeekPrompt(f'{self._dir.name}/.zeek', backend='sim')
+        zp = self._zp
+        zp.handle_party(_check(*zp.handle_new_party(['alan'])))
+        test = _check(*zp.handle_hide(['(lambda', '(x)', '(>=', 'x', '18))']))
+        self._proofs = [_check(*zp.handle_prove(test, _check(*zp.handle_hide([age])))) for age in ('20', '15')]
+        self._pd = zp._zeek_env.get_current_party_dirs()[1]
+
+    def tearDown(self):
+        self._zp.close()
+        self._dir.cleanup()
+
+    def _verify(self, proof):
+        # Returns whether `proof` verified and whether it was a cache hit.
+        hits = self._zp.get_cache_stats()['verify'][0]
+        rc, _ = self._zp.handle_verify(f'"{proof}"')
+        return rc == 0, self._zp.get_cache_stats()['verify'][0] > hits
+
+    def _replace(self, path, data):
+        # Files are links to the object store: they are replaced, not
+        # written in place, as an attacker swapping files would.
+        os.remove(path)
+        with open(path, 'w') as fh:
+            fh.write(data)
+
+    def test_verifications_are_cached(self):
+        proof = self._proofs[0]
+        self.assertEqual(self._verify(proof), (True, False))
+        self.assertEqual(self._verify(proof), (True, True))
+
+    def test_tampered_proof_is_verified_again(self):
+        proof = self._proofs[0]
+        self._verify(proof)
+        meta = f'{self._pd}/{proof}.meta'
+        with open(meta) as fh:
+            original = fh.read()
+        self._replace(meta, json.dumps(dict(json.loads(original), output='nil')))
+        self.assertEqual(self._verify(proof), (False, False))
+        self._replace(meta, original)
+        self.assertEqual(self._verify(proof), (True, True))
+
+    def test_replaced_proof_is_verified_again(self):
+        proof, other = self._proofs
+        self._verify(proof)
+        self._verify(other)
+        for ext in ('proof', 'meta'):
+            os.remove(f'{self._pd}/{proof}.{ext}')
+            shutil.copy(f'{self._pd}/{other}.{ext}', f'{self._pd}/{proof}.{ext}')
+        self.assertEqual(self._verify(proof), (False, False))
+
+    def test_missing_file_is_not_cached(self):
+        proof = self._proofs[0]
+        self._verify(proof)
+        os.remove(f'{self._pd}/{proof}.meta')
+        self.assertEqual(self._verify(proof), (False, False))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+'''
+Tests of the exit codes and output of one-shot commands, run as
+`zeek.py` would be run by a script, on the sim backend.
+'''
+try:
+    import os
+    import sys
+    import json
+    import tempfile
+    import unittest
+    import subprocess as sp
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeek_cli import *
+    from zeek_cli import _run
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, json, tempfile, unittest, subprocess or zeek_cli is missing.')
+    exit(1)
+
+_ZEEK = f'{os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}/zeek.py'
+_TEST = '(lambda (x) (>= x 18))'
+_FIB  = '(letrec ((fib (lambda (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2))))))) (lambda (x) (fib x)))'
+
+class ZeekCliTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _zeek(self, *args, code=EXIT_OK):
+        p = sp.run([sys.executable, _ZEEK, '--backend', 'sim', *args], cwd=self._dir.name,
+                   stdout=sp.PIPE, stderr=sp.PIPE, text=True, timeout=60)
+        self.assertEqual(p.returncode, code, p.stdout + p.stderr)
+        return json.loads(p.stdout) if p.stdout != '' else None
+
+    def _alan(self):
+        self._zeek('new', 'party', 'alan', 'as', 'alan')
+        self._zeek('--party', 'alan', 'hide', *_TEST.split(), 'as', 'test')
+
+    def test_ok(self):
+        out = self._zeek('parties')
+        self.assertEqual(out['command'], 'parties')
+        self.assertTrue(out['ok'])
+        self.assertEqual([p['value'] for p in out['result']], ['public'])
+
+    def test_failed(self):
+        self._alan()
+        self._zeek('--party', 'alan', 'hide', '15', 'as', 'age')
+        self._zeek('--party', 'alan', 'prove', 'test', 'age', 'as', 'proof')
+        out = self._zeek('--party', 'alan', 'check', 'call', 'test', 'age', 'returns', 't', 'in', 'proof', code=EXIT_FAILED)
+        self.assertFalse(out['ok'])
+        self.assertEqual(self._zeek('--party', 'alan', 'call', 'test', 'age')['result'], 'nil')
+
+    def test_usage(self):
+        self.assertFalse(self._zeek('call', 'test', 'age', code=EXIT_USAGE)['ok'])
+        self.assertFalse(self._zeek('no', 'such', 'command', code=EXIT_USAGE)['ok'])
+        # Rejected by the parser, before any command runs.
+        self.assertEqual(self._zeek('--party', 'alan', code=EXIT_USAGE), None)
+
+    def test_timeout(self):
+        self._alan()
+        self._zeek('--party', 'alan', 'hide', *_FIB.split(), 'as', 'fib')
+        self._zeek('--party', 'alan', 'hide', '40', 'as', 'n')
+        # In-process, as the sim is only bound by the timeout of ZeekEnv,
+        # not by configured deadlines.
+        zp = ZeekPrompt(f'{self._dir.name}/.zeek', 'sim')
+        self.addCleanup(zp.close)
+        zp._zeek_env._timeout = 0.2
+        zp.handle_party(zp.get_value('alan'))
+        with self.assertRaises(ZeekCliException) as cm:
+            _run(zp, ['call', 'fib', 'n'])
+        self.assertEqual(cm.exception.code, EXIT_TIMEOUT)
+
+    def test_sends_are_checked(self):
+        self._alan()
+        self._zeek('new', 'party', 'bee', 'as', 'bee')
+        out = self._zeek('--party', 'alan', 'send', 'secret', 'test', 'to', 'alan', code=EXIT_USAGE)
+        self.assertIn('oneself', out['error'])
+        out = self._zeek('--party', 'alan', 'send', 'secret', 'test', 'to', '1' * 64, code=EXIT_USAGE)
+        self.assertIn('does not exist', out['error'])
+        self._zeek('--party', 'alan', 'send', 'secret', 'test', 'to', 'bee')
+        out = self._zeek('--party', 'alan', 'send', 'secret', 'test', 'to', 'bee', code=EXIT_FAILED)
+        self.assertIn('already available', out['error'])
+        self._zeek('--party', 'alan', 'hide', '20', 'as', 'age')
+        self._zeek('--party', 'alan', 'prove', 'test', 'age', 'as', 'proof')
+        self.assertIn('oneself', self._zeek('--party', 'alan', 'send', 'proof', 'proof', 'to', 'alan', code=EXIT_USAGE)['error'])
+        self._zeek('--party', 'alan', 'send', 'proof', 'proof', 'to', 'bee')
+        self._zeek('--party', 'alan', 'send', 'proof', 'proof', 'to', 'bee', code=EXIT_FAILED)
+
+    def test_files_and_batches(self):
+        self._alan()
+        data = os.path.dirname(_ZEEK) + '/data'
+        self._zeek('--party', 'alan', 'with', f'{data}/credit-score-table.lurk', 'hide', 'table', 'as', 'report')
+        self._zeek('--party', 'alan', 'with', f'{data}/cr-check-function.lurk', 'hide', 'function', 'credit_score_OK?', 'as', 'cr-check')
+        self.assertEqual(self._zeek('--party', 'alan', 'call', 'cr-check', 'report')['result'], 't')
+        with open(f'{self._dir.name}/ages.csv', 'w') as fh:
+            fh.write('name,age\nada,20\nbob,15\n')
+        out = self._zeek('--party', 'alan', 'bulk', 'hide', 'ages.csv', 'name')
+        self.assertEqual(out['result']['rows'], 2)
+        # Rows are hidden as association lists.
+        self._zeek('--party', 'alan', 'hide', *'(lambda (r) (>= (cdr (car (cdr r))) 18))'.split(), 'as', 'adult')
+        # Patterns match hashes as well as labels: only the rows have labels
+        # of three letters.
+        out = self._zeek('--party', 'alan', 'prove', 'batch', 'adult', 'over', '???', 'as', 'p')
+        self.assertEqual([r['label'] for r in out['result']], ['p-1', 'p-2'])
+        self.assertIn('p-2', self._zeek('labels')['result'])
+        out = self._zeek('--party', 'alan', 'bulk', 'hide', 'ages.csv', 'name', code=EXIT_FAILED)
+        self.assertEqual(len(out['result']['failures']), 2)
+
+    def test_error(self):
+        out = self._zeek(f'--connect={self._dir.name}/zeekd.sock', 'parties', code=EXIT_ERROR)
+        self.assertIn('zeekd is not running', out['error'])
+
+    def test_optional_values_do_not_take_the_command(self):
+        self.assertEqual(self._zeek('--profile', 'parties')['command'], 'parties')
+        self.assertTrue(os.path.isdir(f'{self._dir.name}/.zeek/profiles'))
+        self.assertEqual(self._zeek(f'--profile={self._dir.name}/profiles', 'parties')['command'], 'parties')
+        self.assertNotEqual(os.listdir(f'{self._dir.name}/profiles'), [])
+        self.assertEqual(parse_args(['--connect', 'parties']).command, ['parties'])
+
+if __name__ == '__main__':
+    unittest.main()
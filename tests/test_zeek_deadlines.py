@@ -0,0 +1,110 @@
+'''
+Tests of the deadlines of Lurk operations, with Lurk replaced by
+`bench/fake_lurk.py`.
+'''
+try:
+    import os
+    import sys
+    import time
+    import tempfile
+    import unittest
+    from unittest import mock
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from lurk_wrapper import *
+    from lurk_session import *
+    from zeek_env import *
+    from zeek_deadlines import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, time, tempfile, unittest, lurk_wrapper, lurk_session, zeek_env or zeek_deadlines is missing.')
+    exit(1)
+
+_FAKE_LURK = f'{os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}/bench/fake_lurk.py'
+_HASH      = '0x' + 'a' * 64
+
+class _Deadlines:
+    def __init__(self, secs):
+        self._secs = secs
+
+    def get(self, op):
+        return self._secs
+
+    def record(self, op, seconds):
+        pass
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+
+class DeadlineTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        dir = self._dir.name
+        self._pid_file = f'{dir}/lurk.pid'
+        # A `lurk` whose proofs hang, recording its pid.
+        with open(f'{dir}/lurk', 'w') as fh:
+            fh.write(f'#!/bin/sh\necho $$ > {self._pid_file}\nexec {sys.executable} {_FAKE_LURK} "$@"\n')
+        os.chmod(f'{dir}/lurk', 0o755)
+        env = mock.patch.dict(os.environ, {'PATH': f'{dir}:{os.environ["PATH"]}', 'FAKE_LURK_PROVE_DELAY': '60'})
+        env.start()
+        self.addCleanup(env.stop)
+        self._cd, self._pd = f'{dir}/commits', f'{dir}/proofs'
+        os.makedirs(self._cd)
+        os.makedirs(self._pd)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _pid(self):
+        with open(self._pid_file) as fh:
+            return int(fh.read())
+
+    def test_hung_lurk_is_killed(self):
+        lurkw = LurkWrapper(15, self._cd, self._pd, deadlines=_Deadlines(0.5))
+        start = time.monotonic()
+        rc, out = lurkw.prove(_HASH, _HASH)
+        self.assertEqual(rc, LurkWrapper.TIMEOUT)
+        self.assertIn('timed out', out)
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertFalse(_is_running(self._pid()))
+
+    def test_hung_session_is_killed(self):
+        sessions = LurkSessionManager()
+        self.addCleanup(sessions.close_all)
+        lurkw = LurkWrapper(15, self._cd, self._pd, sessions.get(self._cd, self._pd), _Deadlines(0.5))
+        rc, _ = lurkw.prove(_HASH, _HASH)
+        self.assertEqual(rc, LurkWrapper.TIMEOUT)
+        self.assertFalse(_is_running(self._pid()))
+
+class ZeekDeadlinesTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._env = ZeekEnv(f'{self._dir.name}/.zeek')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _deadlines(self):
+        deadlines = ZeekDeadlines(self._env)
+        self.addCleanup(deadlines.close)
+        return deadlines
+
+    def test_operations_that_never_ran_are_not_killed(self):
+        deadlines = self._deadlines()
+        for op in ('hide', 'apply', 'open', 'inspect'):
+            self.assertEqual(deadlines.get(op), None)
+        self.assertEqual(deadlines.get('prove'), 3600)
+
+    def test_deadlines_are_learned(self):
+        deadlines = self._deadlines()
+        deadlines.record('apply', 0.1)
+        self.assertEqual(deadlines.get('apply'), self._env.get_timeout())
+        deadlines.record('apply', 3)
+        self.assertEqual(self._deadlines().get('apply'), 30)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+'''
+Tests of the `.zeek` directory: its indexes of parties, commits and
+proofs, and its object store.
+'''
+try:
+    import os
+    import sys
+    import time
+    import tempfile
+    import unittest
+    import subprocess as sp
+    from unittest import mock
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeek_env import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, time, tempfile, unittest, subprocess or zeek_env is missing.')
+    exit(1)
+
+_HASH  = 'a' * 64
+_PROOF = 'Nova_Pallas_10_' + 'b' * 64
+
+def _elsewhere(code):
+    # Runs `code` in another process, so that `ZeekEnv` is not told of
+    # what it writes. Modification times only change once the clock of the
+    # file system ticks.
+    time.sleep(0.05)
+    sp.run([sys.executable, '-c', f'import os, shutil\n{code}'], check=True)
+
+class ZeekEnvIndexTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._zd  = f'{self._dir.name}/.zeek'
+        self._env = ZeekEnv(self._zd)
+        self._env.add_party('alan')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_parties_made_elsewhere_are_seen(self):
+        self.assertEqual(sorted(self._env.get_parties()), ['alan', 'public'])
+        generation = self._env.get_generation('alan')
+        _elsewhere(f"os.makedirs('{self._zd}/bee/commits'); os.makedirs('{self._zd}/bee/proofs')")
+        self.assertTrue(self._env.is_party('bee'))
+        self.assertEqual(sorted(self._env.get_parties()), ['alan', 'bee', 'public'])
+        self.assertNotEqual(self._env.get_generation('alan'), generation)
+        _elsewhere(f"shutil.rmtree('{self._zd}/bee')")
+        self.assertFalse(self._env.is_party('bee'))
+
+    def test_secrets_made_elsewhere_are_seen(self):
+        cd, pd = self._env.get_party_dirs('alan')
+        self.assertEqual(self._env.get_commits('alan'), [])
+        self.assertEqual(self._env.get_proofs('alan'), [])
+        _elsewhere(f"open('{cd}/{_HASH}.commit', 'w').close()\n"
+                   f"open('{pd}/{_PROOF}.proof', 'w').close()\n"
+                   f"open('{pd}/{_PROOF}.meta', 'w').close()")
+        self.assertEqual(self._env.get_commits('alan'), [_HASH])
+        self.assertTrue(self._env.is_commited('alan', _HASH))
+        # The .meta file of a proof is not listed.
+        self.assertEqual(self._env.get_proofs('alan'), [_PROOF])
+        _elsewhere(f"os.remove('{cd}/{_HASH}.commit')")
+        self.assertFalse(self._env.is_commited('alan', _HASH))
+
+    def test_own_writes_are_not_rescanned(self):
+        self._env.get_parties()
+        cd, _ = self._env.get_party_dirs('alan')
+        self._env.get_commits('alan')
+        with mock.patch.object(ZeekEnv, '_scan', side_effect=AssertionError('rescanned')):
+            self._env.add_party('bee')
+            self.assertTrue(self._env.is_party('bee'))
+            mtime = self._env.get_secret_mtime('alan', 'commits')
+            open(f'{cd}/{_HASH}.commit', 'w').close()
+            self._env.note_secret('alan', 'commits', _HASH, mtime)
+            self.assertTrue(self._env.is_commited('alan', _HASH))
+
+class ZeekEnvObjectsTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._env = ZeekEnv(f'{self._dir.name}/.zeek')
+        for party in ('alan', 'bee', 'cat'):
+            self._env.add_party(party)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _commit(self, party, text):
+        cd, _ = self._env.get_party_dirs(party)
+        with open(f'{cd}/{_HASH}.commit', 'w') as f:
+            f.write(text)
+        return f'{cd}/{_HASH}.commit'
+
+    def test_sends_are_links(self):
+        alan = self._commit('alan', 'secret')
+        rc, _ = self._env.send_commit('alan', 'bee', _HASH)
+        self.assertEqual(rc, 0)
+        bee, _ = self._env.get_party_dirs('bee')
+        # alan's file, its object and bee's file are one inode.
+        self.assertEqual(os.stat(alan).st_nlink, 3)
+        self.assertTrue(os.path.samefile(alan, f'{bee}/{_HASH}.commit'))
+        self.assertTrue(self._env.is_commited('bee', _HASH))
+
+    def test_copies_are_migrated(self):
+        # The layout before the object store: every party has its own copy.
+        alan = self._commit('alan', 'secret')
+        bee  = self._commit('bee', 'secret')
+        size = os.path.getsize(bee)
+        self.assertEqual(self._env.migrate_objects(), (1, size))
+        self.assertTrue(os.path.samefile(alan, bee))
+        self.assertEqual(os.stat(bee).st_nlink, 3)
+        for path in (alan, bee):
+            with open(path) as f:
+                self.assertEqual(f.read(), 'secret')
+        self.assertFalse(any(p.endswith('.tmp') for _, _, ps in os.walk(self._dir.name) for p in ps))
+        self.assertEqual(self._env.migrate_objects(), (0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
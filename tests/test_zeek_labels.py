@@ -0,0 +1,122 @@
+'''
+Tests of the label log: recovery from a crash while appending to it and
+compaction.
+'''
+try:
+    import os
+    import sys
+    import json
+    import time
+    import tempfile
+    import threading
+    import unittest
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeek_labels import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, json, time, tempfile, threading, unittest or zeek_labels is missing.')
+    exit(1)
+
+def _kind_of(value):
+    return ZeekLabels.COMMIT
+
+class _SlowLabels(ZeekLabels):
+    # Reads its log slowly, so that other threads look labels up meanwhile.
+    def _read_log(self):
+        time.sleep(0.2)
+        super()._read_log()
+
+class ZeekLabelsTest(unittest.TestCase):
+    def setUp(self):
+        self._dir  = tempfile.TemporaryDirectory()
+        self._file = f'{self._dir.name}/labels.log'
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _labels(self):
+        labels = ZeekLabels(self._file, _kind_of)
+        self.addCleanup(labels.close)
+        return labels
+
+    def _log(self):
+        with open(self._file) as fh:
+            return [json.loads(line) for line in fh]
+
+    def test_labels_are_read_back(self):
+        labels = self._labels()
+        labels.set_label('a', '1')
+        labels.set_labels([('b', '2'), ('c', '3')], ZeekLabels.PROOF)
+        labels.set_label('a', '4')
+        labels.close()
+        labels = self._labels()
+        self.assertEqual(dict(labels.get_items()), {'a': '4', 'b': '2', 'c': '3'})
+        self.assertEqual(labels.get_kind('b'), ZeekLabels.PROOF)
+        self.assertEqual(labels.find_label('1'), None)
+
+    def test_truncated_last_line_is_dropped(self):
+        labels = self._labels()
+        labels.set_label('a', '1')
+        labels.set_label('b', '2')
+        labels.close()
+        with open(self._file, 'a') as fh:
+            fh.write('["c", "3", "com')
+        labels = self._labels()
+        self.assertEqual(dict(labels.get_items()), {'a': '1', 'b': '2'})
+        # The log is cut back to its last whole line, so that new labels
+        # are appended after it.
+        labels.set_label('d', '4')
+        labels.close()
+        self.assertEqual([l for l, _, _ in self._log()], ['a', 'b', 'd'])
+        self.assertEqual(self._labels().get_labels(), ['a', 'b', 'd'])
+
+    def test_save_compacts_overridden_lines(self):
+        labels = self._labels()
+        for n in range(10):
+            labels.set_label('a', f'{n}')
+        labels.set_label('b', 'x')
+        self.assertEqual(len(self._log()), 11)
+        labels.save()
+        labels.set_label('c', 'y')
+        labels.close()
+        self.assertEqual(self._log(), [['a', '9', 'commit'], ['b', 'x', 'commit'], ['c', 'y', 'commit']])
+        self.assertEqual(dict(self._labels().get_items()), {'a': '9', 'b': 'x', 'c': 'y'})
+
+    def test_log_is_compacted_in_the_background(self):
+        labels = self._labels()
+        for n in range(ZeekLabels._COMPACT_MIN + 1):
+            labels.set_label('a', f'{n}')
+        compactor = labels._compactor
+        if compactor != None:
+            compactor.join()
+        labels.set_label('b', 'x')
+        labels.close()
+        self.assertEqual(self._log(), [['a', f'{ZeekLabels._COMPACT_MIN}', 'commit'], ['b', 'x', 'commit']])
+
+    def test_lookups_wait_for_the_log(self):
+        labels = self._labels()
+        labels.set_label('a', '1')
+        labels.close()
+        labels = _SlowLabels(self._file, _kind_of)
+        self.addCleanup(labels.close)
+        loader = threading.Thread(target=labels.get_labels)
+        loader.start()
+        time.sleep(0.05)
+        self.assertEqual(labels.get_value('a'), '1')
+        self.assertEqual(labels.find_label('1'), 'a')
+        self.assertFalse(labels.empty())
+        loader.join()
+
+    def test_failed_load_is_tried_again(self):
+        with open(self._file, 'w') as fh:
+            fh.write('["a", "1", "commit"]\n["b"\n')
+        labels = self._labels()
+        with self.assertRaises(ValueError):
+            labels.get_labels()
+        with open(self._file, 'w') as fh:
+            fh.write('["a", "1", "commit"]\n')
+        self.assertEqual(labels.get_labels(), ['a'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+'''
+Tests of the latency metrics of commands and of their Prometheus and
+JSON output.
+'''
+try:
+    import os
+    import re
+    import sys
+    import json
+    import math
+    import tempfile
+    import unittest
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeek_metrics import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, re, sys, json, math, tempfile, unittest or zeek_metrics is missing.')
+    exit(1)
+
+_SAMPLE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+
+def _samples(text, name):
+    '''
+    Returns the samples of metric `name` in `text` as `(labels, value)`.
+    '''
+    samples = []
+    for line in text.splitlines():
+        m = _SAMPLE.match(line)
+        if m != None and m.group(1) == name:
+            labels = dict(re.findall(r'(\w+)="([^"]*)"', m.group(2)))
+            samples.append((labels, float(m.group(3))))
+    return samples
+
+class HistogramTest(unittest.TestCase):
+    def test_buckets_and_quantiles(self):
+        h = Histogram()
+        self.assertIsNone(h.quantile(0.5))
+        for value in (0.00001, 0.002, 0.002, 1, 1e9):
+            h.observe(value)
+        self.assertEqual(h.count, 5)
+        self.assertEqual(h.counts[0], 1)
+        self.assertEqual(h.counts[-1], 1)
+        self.assertEqual(sum(h.counts), 5)
+        # A value on a bound is counted in the bucket it closes.
+        self.assertEqual(h.counts[Histogram.BOUNDS.index(1)], 1)
+        # The median is interpolated in the bucket of 0.002.
+        i = next(i for i, bound in enumerate(Histogram.BOUNDS) if bound >= 0.002)
+        self.assertEqual(h.counts[i], 2)
+        self.assertGreater(h.quantile(0.5), Histogram.BOUNDS[i - 1])
+        self.assertLessEqual(h.quantile(0.5), Histogram.BOUNDS[i])
+        self.assertEqual(h.quantile(1), Histogram.BOUNDS[-1])
+        self.assertEqual(set(h.to_json()), {'count', 'sum', 'p50', 'p95', 'p99'})
+
+class ZeekMetricsTest(unittest.TestCase):
+    def setUp(self):
+        self._metrics = ZeekMetrics()
+        self._caches  = {'verify': (3, 1, 2), 'labels': (0, 4, 4)}
+
+    def _run(self):
+        def _hide(rc):
+            with phase('lurk'):
+                pass
+            return rc, 'out'
+        hide = self._metrics.timed('hide', _hide)
+        hide(0)
+        hide(1)
+        self._metrics.record('prove', 2.5, {'lurk': 2}, False)
+
+    def test_prometheus_buckets_are_cumulative(self):
+        self._run()
+        text = self._metrics.to_prometheus(self._caches)
+        buckets = _samples(text, 'zeek_command_seconds_bucket')
+        series  = {}
+        for labels, value in buckets:
+            series.setdefault((labels['command'], labels['phase']), []).append((labels['le'], value))
+        self.assertEqual(set(series), {(c, p) for c in ('hide', 'prove') for p in ('total',) + PHASES + ('other',)})
+        counts = {(l['command'], l['phase']): v for l, v in _samples(text, 'zeek_command_seconds_count')}
+        for key, les in series.items():
+            with self.subTest(series=key):
+                self.assertEqual(len(les), len(Histogram.BOUNDS) + 1)
+                bounds = [math.inf if le == '+Inf' else float(le) for le, _ in les]
+                self.assertEqual(bounds, sorted(bounds))
+                self.assertEqual(bounds[-1], math.inf)
+                values = [v for _, v in les]
+                self.assertEqual(values, sorted(values))
+                self.assertEqual(values[-1], counts[key])
+        self.assertEqual(counts[('hide', 'total')], 2)
+        prove = dict(series[('prove', 'total')])
+        self.assertEqual(prove['1'], 0)
+        self.assertEqual(prove['3.16228'], 1)
+        sums = {(l['command'], l['phase']): v for l, v in _samples(text, 'zeek_command_seconds_sum')}
+        self.assertEqual(sums[('prove', 'lurk')], 2)
+
+    def test_prometheus_counters(self):
+        self._run()
+        text = self._metrics.to_prometheus(self._caches)
+        self.assertIn('# TYPE zeek_command_seconds histogram', text)
+        self.assertEqual({l['command']: v for l, v in _samples(text, 'zeek_commands_total')}, {'hide': 2, 'prove': 1})
+        self.assertEqual({l['command']: v for l, v in _samples(text, 'zeek_command_failures_total')}, {'hide': 1, 'prove': 0})
+        self.assertEqual({l['cache']: v for l, v in _samples(text, 'zeek_cache_hits_total')}, {'verify': 3, 'labels': 0})
+        self.assertEqual({l['cache']: v for l, v in _samples(text, 'zeek_cache_entries')}, {'verify': 2, 'labels': 4})
+        # Every line is a comment or a sample.
+        for line in text.splitlines():
+            self.assertTrue(line.startswith('# ') or _SAMPLE.match(line), line)
+
+    def test_write(self):
+        self._run()
+        with tempfile.TemporaryDirectory() as dir:
+            self._metrics.write(f'{dir}/metrics.json', self._caches)
+            with open(f'{dir}/metrics.json') as fh:
+                metrics = json.load(fh)
+            self.assertEqual(metrics['commands']['hide']['failures'], 1)
+            self.assertEqual(metrics['caches']['verify'], {'hits': 3, 'misses': 1, 'entries': 2})
+            self._metrics.write(f'{dir}/metrics.prom', self._caches)
+            with open(f'{dir}/metrics.prom') as fh:
+                self.assertEqual(fh.read(), self._metrics.to_prometheus(self._caches))
+            self.assertEqual(sorted(os.listdir(dir)), ['metrics.json', 'metrics.prom'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+'''
+Tests of declarative protocols on the sim backend.
+'''
+try:
+    import os
+    import sys
+    import json
+    import tempfile
+    import unittest
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeek_prompt import *
+    from zeek_protocol import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, json, tempfile, unittest, zeek_prompt or zeek_protocol is missing.')
+    exit(1)
+
+_DATA_DIR = f'{os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}/data'
+
+class ZeekProtocolTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._zp  = ZeekPrompt(f'{self._dir.name}/.zeek', backend='sim')
+
+    def tearDown(self):
+        self._zp.close()
+        self._dir.cleanup()
+
+    def _protocol(self, steps):
+        file = f'{self._dir.name}/protocol.json'
+        with open(file, 'w') as fh:
+            json.dump({'steps': steps}, fh)
+        return file
+
+    def _run(self, steps):
+        report = run_protocol(self._zp, self._protocol(steps))
+        return {s['id']: s for s in report['steps']}
+
+    def test_steps_come_after_their_dependencies(self):
+        steps = load_protocol(self._zp, self._protocol([
+            {'id': 'proof', 'party': 'alan', 'prove': 'test', 'with': 'age'},
+            {'id': 'age',   'party': 'alan', 'hide': '20'},
+            {'id': 'test',  'party': 'alan', 'hide': '(lambda (x) (>= x 18))'},
+            {'id': 'alan',  'new party': 'alan'}]))
+        order = [s.id for s in steps]
+        self.assertLess(order.index('alan'), order.index('age'))
+        self.assertLess(order.index('age'), order.index('proof'))
+        self.assertLess(order.index('test'), order.index('proof'))
+
+    def test_cycles_are_rejected(self):
+        file = self._protocol([
+            {'id': 'alan', 'new party': 'alan'},
+            {'id': 'a', 'party': 'alan', 'hide': '1', 'after': 'c'},
+            {'id': 'b', 'party': 'alan', 'hide': '2', 'after': 'a'},
+            {'id': 'c', 'party': 'alan', 'hide': '3', 'after': 'b'}])
+        with self.assertRaisesRegex(ZeekProtocolException, 'depend on each other'):
+            load_protocol(self._zp, file)
+
+    def test_step_depending_on_itself_is_rejected(self):
+        file = self._protocol([{'id': 'a', 'new party': 'alan', 'after': 'a'}])
+        with self.assertRaisesRegex(ZeekProtocolException, 'Steps a -> a depend on each other'):
+            load_protocol(self._zp, file)
+
+    def test_labels_are_not_overwritten(self):
+        self._zp.set_label('alan', self._zp.handle_new_party(['alan'])[1])
+        with self.assertRaisesRegex(ZeekProtocolException, 'label alan exists'):
+            load_protocol(self._zp, self._protocol([{'id': 'p', 'new party': 'x', 'as': 'alan'}]))
+        with self.assertRaisesRegex(ZeekProtocolException, 'same label'):
+            load_protocol(self._zp, self._protocol([{'id': 'p', 'new party': 'x', 'as': 'bee'},
+                                                    {'id': 'q', 'new party': 'y', 'as': 'bee'}]))
+
+    def test_sends_are_checked(self):
+        steps = self._run([
+            {'id': 'alan',   'new party': 'alan'},
+            {'id': 'bee',    'new party': 'bee'},
+            {'id': 'age',    'party': 'alan', 'hide': '20'},
+            {'id': 'self',   'party': 'alan', 'send': 'age', 'to': 'alan'},
+            {'id': 'sent',   'party': 'alan', 'send': 'age', 'to': 'bee'},
+            {'id': 'again',  'party': 'alan', 'send': 'age', 'to': 'bee', 'after': 'sent'},
+            {'id': 'reveal', 'party': 'bee', 'reveal': 'sent'}])
+        self.assertEqual(steps['self']['status'], 'failed')
+        self.assertIn('oneself', steps['self']['out'])
+        self.assertEqual(steps['sent']['status'], 'ok')
+        self.assertEqual(steps['again']['status'], 'failed')
+        self.assertIn('already available', steps['again']['out'])
+        self.assertEqual(steps['reveal']['status'], 'ok')
+        self.assertIn('20', steps['reveal']['out'])
+
+    def test_failed_steps_skip_their_dependents(self):
+        steps = self._run([
+            {'id': 'alan',  'new party': 'alan'},
+            {'id': 'call',  'party': 'alan', 'call': 'alan', 'with': 'alan'},
+            {'id': 'after', 'party': 'alan', 'hide': '1', 'after': 'call'}])
+        self.assertEqual(steps['call']['status'], 'failed')
+        self.assertEqual(steps['after']['status'], 'skipped')
+
+    def test_credit_score(self):
+        report = run_protocol(self._zp, f'{_DATA_DIR}/credit-score.json')
+        self.assertEqual(report['failures'], 0)
+        self.assertEqual(len(report['steps']), len(load_protocol(self._zp, f'{_DATA_DIR}/credit-score.json')))
+
+if __name__ == '__main__':
+    unittest.main()
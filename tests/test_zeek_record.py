@@ -0,0 +1,95 @@
+'''
+Tests of recording a session and replaying it elsewhere, on the sim
+backend.
+'''
+try:
+    import os
+    import sys
+    import json
+    import tempfile
+    import unittest
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeek_prompt import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, json, tempfile, unittest or zeek_prompt is missing.')
+    exit(1)
+
+_TEST = ['(lambda', '(x)', '(>=', 'x', '18))']
+
+def _check(rc, out):
+    if rc != 0:
+        raise Exception(out)
+    return out
+
+def _contents(zp):
+    # The parties and the commits and proofs of each one.
+    env = zp._zeek_env
+    return {p: (sorted(env.get_commits(p)), sorted(env.get_proofs(p))) for p in env.get_parties()}
+
+class ZeekRecordTest(unittest.TestCase):
+    def setUp(self):
+        self._dir  = tempfile.TemporaryDirectory()
+        self._file = f'{self._dir.name}/session.jsonl'
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _prompt(self, name):
+        zp = ZeekPrompt(f'{self._dir.name}/{name}/.zeek', backend='sim')
+        self.addCleanup(zp.close)
+        return zp
+
+    def _command(self, zp, cmd, fn, *args):
+        zp.begin_step(cmd)
+        try:
+            return _check(*fn(*args))
+        finally:
+            zp.end_step()
+
+    def _record(self):
+        # The legal age example of the README.
+        zp = self._prompt('recorded')
+        _check(*zp.start_recording(self._file))
+        alan = self._command(zp, 'new party alan', zp.handle_new_party, ['alan'])
+        bee  = self._command(zp, 'new party bee', zp.handle_new_party, ['bee'])
+        self._command(zp, f'party {bee}', zp.handle_party, bee)
+        test = self._command(zp, 'hide test', zp.handle_hide, _TEST)
+        self._command(zp, f'send secret {test} to {alan}', zp.handle_send_commit, alan, test)
+        self._command(zp, f'party {alan}', zp.handle_party, alan)
+        age   = self._command(zp, 'hide 20', zp.handle_hide, ['20'])
+        proof = self._command(zp, f'prove {test} {age}', zp.handle_prove, test, age)
+        self._command(zp, f'send proof {proof} to {bee}', zp.handle_send_proof, bee, proof)
+        zp.begin_step('record stop')
+        _check(*zp.stop_recording())
+        return zp
+
+    def test_replay_makes_the_same_hashes(self):
+        recorded = self._record()
+        replayed = self._prompt('replayed')
+        report   = _check(*replayed.handle_replay(self._file))
+        self.assertEqual(report['mismatches'], 0)
+        self.assertEqual(len(report['steps']), 9)
+        self.assertEqual(_contents(replayed), _contents(recorded))
+
+    def test_replaying_again_skips_what_exists(self):
+        self._record()
+        replayed = self._prompt('replayed')
+        _check(*replayed.handle_replay(self._file))
+        contents = _contents(replayed)
+        report   = _check(*replayed.handle_replay(self._file))
+        self.assertEqual(report['mismatches'], 0)
+        self.assertEqual(sum(s['skipped'] for s in report['steps']), 7)
+        self.assertEqual(_contents(replayed), contents)
+
+    def test_record_stop_is_not_recorded(self):
+        self._record()
+        with open(self._file) as fh:
+            header, *steps = [json.loads(line) for line in fh]
+        self.assertEqual(header['backend'], 'sim')
+        self.assertEqual(len(steps), 9)
+        self.assertNotIn('record stop', [s['cmd'] for s in steps])
+
+if __name__ == '__main__':
+    unittest.main()
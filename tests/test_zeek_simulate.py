@@ -0,0 +1,62 @@
+'''
+Tests of simulated credit score checks on the sim backend.
+'''
+try:
+    import os
+    import sys
+    import random
+    import tempfile
+    import unittest
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeek_prompt import *
+    from zeek_simulate import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, random, tempfile, unittest, zeek_prompt or zeek_simulate is missing.')
+    exit(1)
+
+class ZeekSimulateTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_simulate(self):
+        zp = ZeekPrompt(f'{self._dir.name}/.zeek', backend='sim')
+        self.addCleanup(zp.close)
+        progress = []
+        report = simulate(zp, 3, 2, lambda *args: progress.append(args))
+        self.assertEqual(report['failures'], 0)
+        self.assertEqual(report['verify']['proofs'], 3)
+        self.assertEqual(report['verify']['failures'], 0)
+        self.assertEqual(report['latency']['count'], 3)
+        self.assertEqual(report['steps']['prove']['count'], 3)
+        self.assertEqual(report['steps']['send']['count'], 6)
+        self.assertEqual(progress, [('prove', n, 3) for n in (1, 2, 3)] + [('verify', n, 3) for n in (1, 2, 3)])
+        self.assertGreater(report['disk']['after'], report['disk']['before'])
+        # Public, the bank and the three provers.
+        self.assertEqual(len(zp._zeek_env.get_parties()), 5)
+        self.assertEqual(zp.get_party(), 'public')
+
+    def test_credit_reports_are_lurk_data(self):
+        rng = random.Random(0)
+        for _ in range(20):
+            self.assertTrue(to_lurk(credit_report(rng)).startswith("'(("))
+
+    def test_disk_usage_counts_links_once(self):
+        dir = f'{self._dir.name}/usage'
+        os.makedirs(f'{dir}/a/b')
+        with open(f'{dir}/a/one', 'w') as fh:
+            fh.write('x' * 100)
+        with open(f'{dir}/two', 'w') as fh:
+            fh.write('y' * 10)
+        self.assertEqual(disk_usage(dir), 110)
+        os.link(f'{dir}/a/one', f'{dir}/a/b/one')
+        os.link(f'{dir}/a/one', f'{dir}/one')
+        self.assertEqual(disk_usage(dir), 110)
+        self.assertEqual(disk_usage(f'{self._dir.name}/missing'), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+'''
+Tests of the traces of commands in Chrome's trace event format.
+'''
+try:
+    import os
+    import sys
+    import json
+    import tempfile
+    import threading
+    import unittest
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeek_metrics import *
+    from zeek_trace import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, json, tempfile, threading, unittest, zeek_metrics or zeek_trace is missing.')
+    exit(1)
+
+class ZeekTraceTest(unittest.TestCase):
+    def setUp(self):
+        self._dir  = tempfile.TemporaryDirectory()
+        self._file = f'{self._dir.name}/trace.json'
+        self.addCleanup(stop_trace)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _trace(self):
+        self.assertEqual(stop_trace(), len(self._spans(self._load())))
+        return self._load()
+
+    def _load(self):
+        with open(self._file) as fh:
+            return json.load(fh)
+
+    def _spans(self, trace):
+        return [e for e in trace['traceEvents'] if e['ph'] == 'X']
+
+    def test_format(self):
+        start_trace(self._file)
+        def _hide(value):
+            with phase('lurk', hash='f' * 64) as attrs:
+                attrs['bytes'] = 3
+            return 0, value
+        hide = ZeekMetrics().timed('hide', _hide)
+        hide('1')
+        worker = threading.Thread(target=hide, args=('2',), name='worker')
+        worker.start()
+        worker.join()
+        with self.assertRaises(ValueError):
+            with span('fail', 'command'):
+                raise ValueError()
+        trace = self._trace()
+        self.assertEqual(trace['displayTimeUnit'], 'ms')
+        spans = self._spans(trace)
+        self.assertEqual([(s['name'], s['cat']) for s in spans],
+                         [('lurk', 'phase'), ('hide', 'command')] * 2 + [('fail', 'command')])
+        for s in spans:
+            self.assertEqual(set(s), {'name', 'cat', 'ph', 'pid', 'tid', 'ts', 'dur', 'args'})
+            self.assertEqual(s['pid'], os.getpid())
+            self.assertGreaterEqual(s['ts'], 0)
+            self.assertGreaterEqual(s['dur'], 0)
+        # The phase of a command is within it, in its thread.
+        for lurk, hide in (spans[0:2], spans[2:4]):
+            self.assertEqual(lurk['tid'], hide['tid'])
+            self.assertLessEqual(hide['ts'], lurk['ts'])
+            self.assertLessEqual(lurk['ts'] + lurk['dur'], hide['ts'] + hide['dur'])
+            self.assertEqual(hide['args']['rc'], 0)
+        self.assertNotEqual(spans[0]['tid'], spans[2]['tid'])
+        self.assertEqual(spans[0]['args'], {'hash': 'ffffffff…', 'bytes': 3})
+        self.assertEqual(spans[4]['args'], {'error': 'ValueError'})
+        names = {e['tid']: e['args']['name'] for e in trace['traceEvents'] if e['ph'] == 'M'}
+        self.assertEqual(names[spans[2]['tid']], 'worker')
+        self.assertEqual(names[spans[0]['tid']], threading.current_thread().name)
+
+    def test_not_tracing(self):
+        with span('hide', 'command') as attrs:
+            attrs['rc'] = 0
+        self.assertEqual(stop_trace(), 0)
+        self.assertFalse(os.path.exists(self._file))
+
+    def test_short(self):
+        self.assertEqual(short('a' * 64), 'aaaaaaaa…')
+        self.assertEqual(short(['hide', 'x', lambda: None]), 'hide x')
+        self.assertEqual(len(short('x ' * 100)), 80)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+'''
+Tests of zeekd: the fair queue of requests and the requests clients may
+make.
+'''
+try:
+    import os
+    import sys
+    import tempfile
+    import threading
+    import unittest
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from zeekd import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, tempfile, threading, unittest or zeekd is missing.')
+    exit(1)
+
+class ZeekFairQueueTest(unittest.TestCase):
+    def _drain(self, queue, n):
+        return [queue.get() for _ in range(n)]
+
+    def test_clients_take_turns(self):
+        queue = ZeekFairQueue()
+        for i in range(3):
+            queue.put('batch', i)
+        queue.put('alan', 'a')
+        queue.put('bee', 'b')
+        queue.put('alan', 'c')
+        self.assertEqual(self._drain(queue, 6),
+                         [('batch', 0), ('alan', 'a'), ('bee', 'b'), ('batch', 1), ('alan', 'c'), ('batch', 2)])
+
+    def test_dropped_clients_are_not_served(self):
+        queue = ZeekFairQueue()
+        queue.put('alan', 'a')
+        queue.put('bee', 'b')
+        queue.put('alan', 'c')
+        queue.drop('alan')
+        queue.drop('cat')
+        self.assertEqual(queue.get(), ('bee', 'b'))
+
+    def _get_later(self, queue, got):
+        worker = threading.Thread(target=lambda: got.append(queue.get()))
+        worker.start()
+        return worker
+
+    def test_get_waits_until_put_or_close(self):
+        queue = ZeekFairQueue()
+        got   = []
+        for wake in (lambda: queue.put('alan', 'a'), queue.close):
+            worker = self._get_later(queue, got)
+            wake()
+            worker.join(5)
+            self.assertFalse(worker.is_alive())
+        self.assertEqual(got, [('alan', 'a'), None])
+        # Once closed, what is left is not served.
+        queue.put('bee', 'b')
+        self.assertEqual(queue.get(), None)
+
+class _Client:
+    def __init__(self):
+        self.party   = 'public'
+        self.cancels = {}
+        self.sent    = []
+
+    def send(self, msg):
+        self.sent.append(msg)
+
+class ZeekDaemonTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        path      = f'{self._dir.name}/.zeek'
+        self._zd  = ZeekDaemon(path, f'{path}/{SOCKET_NAME}', 'sim')
+
+    def tearDown(self):
+        self._zd._zp.close()
+        self._dir.cleanup()
+
+    def _run(self, op, *args):
+        client = _Client()
+        self._zd._run(client, 1, op, list(args))
+        self.assertEqual(len(client.sent), 1)
+        return client.sent[0]
+
+    def test_allowed_requests(self):
+        self.assertEqual(self._run('env.get_parties'), {'id': 1, 'result': ['public']})
+        self.assertEqual(self._run('env.is_party', 'public'), {'id': 1, 'result': True})
+        self.assertEqual(self._run('get_backend'), {'id': 1, 'result': 'sim'})
+        self.assertEqual(self._run('handle_new_party', ['alan'])['result'][0], 0)
+
+    def test_other_requests_are_rejected(self):
+        for op in ('handle_replay', 'close', 'good_bye', '_zeek_env', 'env.add_party', 'env.set_party',
+                   'env._link', 'env.migrate_objects', 'get_parties', 'no_such_op', 'env.'):
+            with self.subTest(op=op):
+                self.assertIsNone(self._zd._method(op))
+                self.assertEqual(self._run(op), {'id': 1, 'error': f'Unknown request {op}.'})
+        self.assertEqual(self._zd._zp._zeek_env.get_parties(), ['public'])
+
+if __name__ == '__main__':
+    unittest.main()
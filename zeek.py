@@ -1,21 +1,50 @@
 #!/usr/bin/python3
+from zeek_cli import *
+
+# One-shot commands, as `zeek.py verify <key>`, run before the REPL and
+# prompt_toolkit are imported, so that they start fast.
+if __name__ == '__main__':
+    args = parse_args()
+    if args.command != []:
+        exit(run_one_shot(args))
+
 import asyncio
 
 
 try:
     import os
     import traceback as tb
+    import html
+    from contextlib import ExitStack
     from lurk_wrapper import *
     from zeek_env import *
     from zeek_prompt import *
+    from zeek_jobs import *
+    from zeek_client import *
+    from zeek_trace import *
+    from zeek_repl import *
     from prompt_toolkit import print_formatted_text, HTML
+    from prompt_toolkit.patch_stdout import patch_stdout
 except Exception as e:
     print(e)
     print('Check your Python 3 installation.')
-    print('Either os, traceback, lurk_wrapper, zeek_env or zeek_prompt is missing.')
+    print('Either os, traceback, html, contextlib, lurk_wrapper, zeek_env, zeek_prompt, zeek_jobs, zeek_client, zeek_trace or zeek_repl is missing.')
     exit(1)
 
-def _main(path):
+async def _main(path, backend, connect=None, profile=None):
+    # A client of zeekd, if connecting to it, has the interface of a ZeekPrompt.
+    zeek_prompt = ZeekClient(connect) if connect != None else ZeekPrompt(path, backend)
+    jobs        = ZeekJobs()
+    try:
+        await _repl(zeek_prompt, jobs, profile)
+    finally:
+        # Also when Zeek is interrupted, so that no Lurk process is left
+        # behind: Lurk runs in a process group of its own, which Ctrl-C in
+        # the terminal does not reach.
+        jobs.cancel_all()
+        zeek_prompt.good_bye()
+
+async def _repl(zeek_prompt, jobs, profile):
     def _print_labeled_commit(s, l):
         print_formatted_text(HTML(f'Secret <ansigreen>{s}</ansigreen> is labeled <ansiyellow>{l}</ansiyellow>'))
     def _print_unlabeled_commit(s):
@@ -24,16 +53,72 @@ def _main(path):
         print_formatted_text(HTML(f'Proof  <ansiblue>{p}</ansiblue> is labeled <ansiyellow>{l}</ansiyellow>'))
     def _print_unlabeled_proof(p):
         print_formatted_text(HTML(f'Proof  <ansiblue>{p}</ansiblue> is <ansigray>unlabeled</ansigray>'))
+    def _print_labeled_party(p, l):
+        print_formatted_text(HTML(f'Party  <ansigreen>{p}</ansigreen> is labeled <ansiyellow>{l}</ansiyellow>'))
     def _well_formed_argument(zp, arg):
         labels = zp.get_labels()
         return zp.get_value(arg) if arg in labels \
                 else arg if ZeekEnv.is_hash(arg) \
                 else None
-    zeek_prompt = ZeekPrompt(path)
+    def _start_prove_job(test, value, label):
+        '''
+        Proofs are generated in the background. A job gets its own Lurk
+        process so that it can be cancelled, and labels its proof key, if
+        `label` is given, once it finishes.
+        '''
+        def _on_done(job):
+            rc, out = job.get_result()
+            if job.get_status() == 'cancelled':
+                print(f'Job {job.get_id()} ({job.get_desc()}) cancelled.')
+            elif rc == 0:
+                if label != None:
+                    zeek_prompt.set_label(label, out, ZeekLabels.PROOF)
+                print(f'Job {job.get_id()} ({job.get_desc()}) finished in {job.elapsed():.1f}s.\n{out}\nProve sucessful.')
+            else:
+                print(f'Job {job.get_id()} ({job.get_desc()}) failed.\n{out}\nProve failed.')
+        try:
+            prove_fn, cancel_fn = zeek_prompt.new_prove_job(test, value)
+        except Exception as e:
+            print(f'{e}\nProve failed.')
+            return
+        desc = f'prove {test[:8]} {value[:8]}' if label == None else f'prove {label}'
+        job  = jobs.submit(desc, prove_fn, cancel_fn, _on_done)
+        print(f'Generating proof in job {job.get_id()}...')
+    def _print_progress(line):
+        print_formatted_text(HTML(f'<ansigray>  {html.escape(line)}</ansigray>'))
+    def _print_job(job):
+        print(f'Job {job.get_id()}: {job.get_desc()} is {job.get_status()} ({job.elapsed():.1f}s).')
+        if job.is_running() and job.get_progress() != None:
+            print(f'  {job.get_progress()}')
+    def _ms(secs):
+        return f'{secs * 1000:.1f}' if secs != None else '-'
+    def _print_stats(stats):
+        phases = PHASES + ('other',)
+        if stats['commands'] == {}:
+            print('No commands run yet.')
+        else:
+            print(f'{"command":<16} {"runs":>6} {"fails":>6} {"p50":>9} {"p95":>9} {"p99":>9} ' + ' '.join(f'{p:>8}' for p in phases))
+            for command, c in stats['commands'].items():
+                total = c['phases']['total']
+                means = ' '.join(f'{_ms(c["phases"][p]["sum"] / c["count"]):>8}' for p in phases)
+                print(f'{command:<16} {c["count"]:>6} {c["failures"]:>6} {_ms(total["p50"]):>9} {_ms(total["p95"]):>9} {_ms(total["p99"]):>9} {means}')
+            print('Times are in ms. Phases are the mean time of a run in each.')
+        for cache, (hits, misses, entries) in stats['caches'].items():
+            print(f'Cache {cache}: {hits} hits, {misses} misses, {entries} entries.')
+    repl        = ZeekRepl(zeek_prompt)
+    if profile != None:
+        ZeekProfiler(profile).instrument(zeek_prompt, 'handle_')
     cmd         = None
+    # The span of the command being run, ended when the next one is read.
+    cmd_span    = ExitStack()
+    interrupted = False
     while True:
+        cmd_span.close()
         try:
-            cmd = zeek_prompt.prompt()
+            cmd = await repl.prompt(jobs.toolbar if jobs.get_running() != [] else None)
+            cmd_span.enter_context(span(cmd.strip(), 'repl', party=zeek_prompt.get_party()))
+            zeek_prompt.begin_step(cmd.strip())
+            cmd_span.callback(zeek_prompt.end_step)
             match cmd.split():
                 case ['call', test_label, value_label]:
                     labels = zeek_prompt.get_labels()
@@ -92,7 +177,6 @@ def _main(path):
                     else:
                         print('Public does not have secrets to show. Only parties.')
                 case ['exit']:
-                    zeek_prompt.good_bye()
                     break
                 case ['hash','hide', *value]:
                     rc, out = zeek_prompt.handle_hide(value)
@@ -114,16 +198,7 @@ def _main(path):
                 case ['hash', 'prove', test, value]:  
                     if not zeek_prompt.is_public():
                       if ZeekEnv.is_hash(test) and ZeekEnv.is_hash(value):
-                        #   with pt.shortcuts.ProgressBar() as pb:
-                        #     for _ in pb(range(zeek_prompt._zeek_env.get_timeout()), label='Generating proof...'):
-                        #         rc, out = zeek_prompt.handle_prove(test, value)
-                          print('Generating proof...')
-                          rc, out = zeek_prompt.handle_prove(test, value)
-                          print(out)
-                          if rc == 0:
-                             print(f'Prove sucessful.')
-                          else:
-                             print(f'Prove failed.')
+                          _start_prove_job(test, value, None)
                       else:
                           print('Both arguments of prove should be hashes.') 
                     else:
@@ -140,23 +215,42 @@ def _main(path):
                        rc, out = zeek_prompt.handle_hide(value)
                        print(out)
                        if rc == 0:
-                          zeek_prompt.set_label(label, out)
+                          zeek_prompt.set_label(label, out, ZeekLabels.COMMIT)
                           print('Hide successful.')
                        else:
                           print('Hide failed.')
+                case ['backend']:
+                    print(f'Backend is {zeek_prompt.get_backend()}.')
+                case ['backend', backend]:
+                    rc, out = zeek_prompt.set_backend(backend)
+                    print(out)
+                case ['bulk', 'hide', file, *label_column] if len(label_column) <= 1:
+                    if zeek_prompt.is_public():
+                        print('Only non-public parties may hide values.')
+                        continue
+                    print(f'Hiding the rows of {file}...')
+                    try:
+                        rows, failures, elapsed = await asyncio.to_thread(zeek_prompt.handle_bulk_hide, file,
+                                                                          label_column[0] if label_column != [] else None)
+                    except Exception as e:
+                        print(f'{e}\nBulk hide failed.')
+                        continue
+                    for n, error in failures:
+                        print(f'Row {n}: {error}')
+                    print(f'Hidden {rows - len(failures)} of {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-6):.1f} rows/s).')
+                    if failures == []:
+                        print('Bulk hide successful.')
+                    else:
+                        print(f'Bulk hide failed for {len(failures)} rows.')
                 case ['with', file, 'hide', 'table', 'as', label]:
-                    fh = open(file)
-                    data = fh.read()
-                    fh.close()
-                    value = data.split()
                     if label in zeek_prompt.get_labels():
                        print(f'Label {label} exists.')
                        continue
                     else:
-                       rc, out = zeek_prompt.handle_hide(value)
+                       rc, out = zeek_prompt.handle_hide_table(file)
                        print(out)
                        if rc == 0:
-                          zeek_prompt.set_label(label, out)
+                          zeek_prompt.set_label(label, out, ZeekLabels.COMMIT)
                           print('Hide successful.')
                        else:
                           print('Hide failed.')
@@ -168,14 +262,29 @@ def _main(path):
                        rc, out = zeek_prompt.handle_load_and_hide(file, function)
                        print(out)
                        if rc == 0:
-                          zeek_prompt.set_label(label, out)
+                          zeek_prompt.set_label(label, out, ZeekLabels.COMMIT)
                           print('Hide successful.')
                        else:
                           print('Hide failed.')
+                case ['jobs']:
+                    if jobs.get_jobs() != []:
+                        [_print_job(j) for j in jobs.get_jobs()]
+                    else:
+                        print('No jobs to print.')
+                case ['cancel', job_id] if job_id.isdigit():
+                    rc, out = jobs.cancel(int(job_id))
+                    print(out)
+                case ['wait', job_id] if job_id.isdigit():
+                    if jobs.get(int(job_id)) == None:
+                        print(f'Job {job_id} does not exist.')
+                        continue
+                    if not await jobs.wait(int(job_id)):
+                        print(f'Stopped waiting for job {job_id}.')
                 case ['labels']:
                     if not zeek_prompt.empty_labels():
-                        [_print_labeled_commit(s, l) if ZeekEnv.is_hash(s) 
-                         else _print_labeled_proof(s, l) if ZeekEnv.is_proof(s)
+                        [_print_labeled_party(s, l) if zeek_prompt.get_kind(l) == ZeekLabels.PARTY
+                         else _print_labeled_commit(s, l) if zeek_prompt.get_kind(l) == ZeekLabels.COMMIT
+                         else _print_labeled_proof(s, l) if zeek_prompt.get_kind(l) == ZeekLabels.PROOF
                          else None
                          for l, s in zeek_prompt.get_items()]
                     else:
@@ -186,7 +295,7 @@ def _main(path):
                             rc, out = zeek_prompt.handle_new_party(value)
                             print(out)
                             if rc == 0:
-                                zeek_prompt.set_label(label, out)
+                                zeek_prompt.set_label(label, out, ZeekLabels.PARTY)
                                 print('New party successful.')
                             else:
                                 print('New party failed.')
@@ -200,7 +309,7 @@ def _main(path):
                         if value == None: 
                             print(f'Argument {value_label} is neither a label nor a hash.')
                             continue
-                        if value not in zeek_prompt._zeek_env.get_commits_from_party():
+                        if not zeek_prompt._zeek_env.is_commited_by_current_party(value):
                             print(f'Current party ({zeek_prompt.get_party()}) does not own {value_label}.')
                             continue
                         rc, out = zeek_prompt.handle_open(value)
@@ -236,6 +345,43 @@ def _main(path):
                        print('Party successful.')
                     else:
                        print('Party failed.')
+                case ['prove', 'batch', test_label, 'over', values_arg, 'as', prefix]:
+                    if zeek_prompt.is_public():
+                        print('Public can not prove.')
+                        continue
+                    test = _well_formed_argument(zeek_prompt, test_label)
+                    if test == None:
+                        print(f'Argument {test_label} is neither a label nor a hash.')
+                        continue
+                    if os.path.isfile(values_arg):
+                        fh = open(values_arg)
+                        value_labels = fh.read().split()
+                        fh.close()
+                        values = [_well_formed_argument(zeek_prompt, v) for v in value_labels]
+                        if None in values:
+                            print(f'Argument {value_labels[values.index(None)]} is neither a label nor a hash.')
+                            continue
+                    else:
+                        values = [v for v in zeek_prompt.match_commits(values_arg) if v != test]
+                    if values == []:
+                        print(f'No secrets of {zeek_prompt.get_party()} match {values_arg}.')
+                        continue
+                    def _print_prove_result(n, value, rc, out):
+                        label = zeek_prompt.find_label_for_value(value)
+                        name  = label if label != None else value
+                        if rc == 0:
+                            print_formatted_text(HTML(f'Proof <ansiyellow>{prefix}-{n}</ansiyellow> of <ansigreen>{name}</ansigreen> <ansiblue>{out}</ansiblue>'))
+                        else:
+                            print_formatted_text(HTML(f'Proof <ansiyellow>{prefix}-{n}</ansiyellow> of <ansigreen>{name}</ansigreen> <ansired>failed</ansired>'))
+                            print(out)
+                    workers = min(zeek_prompt._zeek_env.get_workers(), len(values))
+                    print(f'Proving {len(values)} claims with {workers} workers...')
+                    failures, elapsed = await asyncio.to_thread(zeek_prompt.handle_prove_batch, test, values, prefix, _print_prove_result)
+                    print(f'Proved {len(values) - failures} of {len(values)} claims in {elapsed:.1f}s ({(len(values) - failures) * 60 / max(elapsed, 1e-6):.1f} proofs/min).')
+                    if failures == 0:
+                        print('Prove batch sucessful.')
+                    else:
+                        print(f'Prove batch failed for {failures} claims.')
                 case ['prove', test_label, value_label, 'as', proof_key_label]:
                     if not zeek_prompt.is_public():
                         labels = zeek_prompt.get_labels()
@@ -247,22 +393,88 @@ def _main(path):
                         if value == None: 
                             print(f'Argument {value_label} is neither a label nor a hash.')
                             continue                      
-                        print('Generating proof...')
-                        rc, out = zeek_prompt.handle_prove(test, value)
-                        # with pt.shortcuts.ProgressBar() as pb:
-                        #      for _ in pb(range(zeek_prompt._zeek_env.get_timeout()), label='Generating proof...'):
-                        #          rc, out = zeek_prompt.handle_prove(test, value)
-                        print(out)
-                        if rc == 0:
-                           zeek_prompt.set_label(proof_key_label, out)
-                           print(f'Prove sucessful.')
-                        else:
-                           print(f'Prove failed.')
+                        _start_prove_job(test, value, proof_key_label)
                     else:
                        print(f'Change party to the one holding secrets {test_label} and {value_label}.')
+                case ['migrate', 'objects']:
+                    rc, out = zeek_prompt.handle_migrate_objects()
+                    print(out)
+                case ['record', 'stop']:
+                    rc, out = zeek_prompt.stop_recording()
+                    print(out)
+                case ['record', file]:
+                    rc, out = zeek_prompt.start_recording(file)
+                    print(out)
+                case ['replay', file]:
+                    def _print_replay_step(step):
+                        status = 'mismatch' if step['mismatches'] != [] \
+                                 else 'skipped' if step['skipped'] != 0 and step['secs'] == 0 \
+                                 else 'cached' if step['cached'] != 0 \
+                                 else 'ok'
+                        cmd = step['cmd'] if step['cmd'] != None else '(between commands)'
+                        print(f'{step["n"]:>4} {status:<8} {_ms(step["recorded_secs"]):>9} {_ms(step["secs"]):>9} '
+                              f'{_ms(step["secs"] - step["recorded_secs"]):>9}  {cmd}')
+                        for m in step['mismatches']:
+                            print(f'       {m["op"]} returned {m["replayed"]}, recorded {m["recorded"]}.')
+                    print(f'{"step":>4} {"status":<8} {"recorded":>9} {"replayed":>9} {"diff":>9}  command')
+                    rc, out = await asyncio.to_thread(zeek_prompt.handle_replay, file, _print_replay_step)
+                    if rc != 0:
+                        print(f'{out}\nReplay failed.')
+                    elif out['mismatches'] == 0:
+                        print(f'Replayed {len(out["steps"])} steps in {_ms(out["secs"])}ms, recorded in {_ms(out["recorded_secs"])}ms.\nReplay successful.')
+                    else:
+                        print(f'Replayed {len(out["steps"])} steps in {_ms(out["secs"])}ms, recorded in {_ms(out["recorded_secs"])}ms.\nReplay failed for {out["mismatches"]} calls.')
+                case ['run', 'protocol', file]:
+                    def _print_protocol_step(step):
+                        status = {'ok': 'ansigreen', 'failed': 'ansired', 'skipped': 'ansigray'}[step['status']]
+                        start  = f'{_ms(step["start"])}ms' if step['start'] != None else '-'
+                        print_formatted_text(HTML(f'Step <ansiyellow>{html.escape(step["id"])}</ansiyellow> ({step["op"]}) '
+                                                  f'<{status}>{step["status"]}</{status}> at {start} in {_ms(step["secs"])}ms'))
+                        if step['status'] == 'failed':
+                            print(step['out'])
+                    print(f'Running protocol {file} with {zeek_prompt._zeek_env.get_workers()} workers...')
+                    rc, out = await asyncio.to_thread(zeek_prompt.handle_run_protocol, file, _print_protocol_step)
+                    if rc != 0:
+                        print(f'{out}\nRun protocol failed.')
+                        continue
+                    print(f'Critical path: {" -> ".join(out["critical_path"])} ({_ms(out["critical_secs"])}ms).')
+                    print(f'Makespan {_ms(out["makespan"])}ms, {_ms(out["serial_secs"])}ms if run one step at a time.')
+                    if out['failures'] == 0:
+                        print('Run protocol successful.')
+                    else:
+                        print(f'Run protocol failed for {out["failures"]} steps.')
+                case ['simulate', provers, *concurrency] if provers.isdigit() and len(concurrency) <= 1 and all(c.isdigit() for c in concurrency):
+                    provers = int(provers)
+                    every   = max(1, provers // 10)
+                    def _print_simulate_progress(phase, done, total):
+                        if done % every == 0 or done == total:
+                            print(f'{"Proved" if phase == "prove" else "Verified"} {done} of {total}...')
+                    print(f'Simulating {provers} provers against one verifier...')
+                    rc, out = await asyncio.to_thread(zeek_prompt.handle_simulate, provers,
+                                                      int(concurrency[0]) if concurrency != [] else None, _print_simulate_progress)
+                    if rc != 0:
+                        print(f'{out}\nSimulate failed.')
+                        continue
+                    latency = out['latency']
+                    print(f'Provers: {provers - out["failures"]} of {provers} in {out["prove_secs"]:.1f}s '
+                          f'({out["provers_per_sec"]:.1f} provers/s, {out["concurrency"]} steps at once).')
+                    print(f'{"latency":<16} {"count":>6} {"p50":>9} {"p95":>9} {"p99":>9} {"max":>9}')
+                    for name, l in [('prover', latency)] + list(out['steps'].items()):
+                        print(f'{name:<16} {l["count"]:>6} {_ms(l["p50"]):>9} {_ms(l["p95"]):>9} {_ms(l["p99"]):>9} {_ms(l["max"]):>9}')
+                    print('Times are in ms. A prover\'s latency is from its creation to its proof being sent.')
+                    verify = out['verify']
+                    print(f'Verified {verify["proofs"] - verify["failures"]} of {verify["proofs"]} proofs in {verify["secs"]:.1f}s ({verify["proofs_per_sec"]:.1f} proofs/s).')
+                    disk = out['disk']
+                    print(f'Disk used under .zeek: {disk["after"]} bytes, {disk["after"] - disk["before"]} more, {disk["per_prover"]:.0f} per prover.')
+                    if out['failures'] == 0 and verify['failures'] == 0:
+                        print('Simulate successful.')
+                    else:
+                        print(f'Simulate failed for {out["failures"]} provers and {verify["failures"]} proofs.')
                 case ['save', 'labels']:
                     zeek_prompt.save_labels()
                     print('Labels saved.')
+                case ['stats']:
+                    _print_stats(zeek_prompt.get_stats())
                 case ['send', 'secret', commit, 'to', target_party]:
                     if not zeek_prompt.is_public():                        
                         labels = zeek_prompt.get_labels()
@@ -277,7 +489,7 @@ def _main(path):
                         if party == zeek_prompt.get_party():
                             print(f'Can not send secret to oneself.\nParty {target_party} is the current party.')
                             continue
-                        if value in zeek_prompt._zeek_env.get_commits(party):
+                        if zeek_prompt._zeek_env.is_commited(party, value):
                             print(f'Can not send {commit} to {target_party}.\nIt is already avaiable avaiable to {target_party}.')
                             continue
                         rc, out = zeek_prompt.handle_send_commit(party, value)
@@ -302,7 +514,7 @@ def _main(path):
                         if party == zeek_prompt.get_party():
                             print(f'Can not send proof to oneself.\nParty {target_party} the is current party.')
                             continue
-                        if proof in zeek_prompt._zeek_env.get_proofs(party):
+                        if zeek_prompt._zeek_env.is_proven(party, proof):
                             print(f'Can not send {proof} to {target_party}.\nIt is already avaiable to {target_party}.')
                             continue
                         rc, out = zeek_prompt.handle_send_proof(party, proof)
@@ -313,6 +525,27 @@ def _main(path):
                            print(f'Send proof failed.')
                     else:
                         print(f'Public does not have proofs to send.')
+                case ['verify', pattern] if pattern == 'all' or any(c in pattern for c in '*?['):
+                    proof_keys = zeek_prompt.match_proofs(pattern)
+                    if proof_keys == []:
+                        print(f'No proofs of {zeek_prompt.get_party()} match {pattern}.')
+                        continue
+                    def _print_verify_result(proof_key, rc, out):
+                        label = zeek_prompt.find_label_for_value(proof_key)
+                        name  = f'{label} ({proof_key})' if label != None else proof_key
+                        if rc == 0:
+                            print_formatted_text(HTML(f'Proof <ansiblue>{name}</ansiblue> <ansigreen>verified</ansigreen>'))
+                        else:
+                            out = out.replace('"', '')
+                            print_formatted_text(HTML(f'Proof <ansiblue>{name}</ansiblue> <ansired>failed</ansired>'))
+                            print(out)
+                    print(f'Verifying {len(proof_keys)} proofs with {zeek_prompt._zeek_env.get_workers()} workers...')
+                    failures, elapsed = await asyncio.to_thread(zeek_prompt.handle_verify_batch, proof_keys, _print_verify_result)
+                    print(f'Verified {len(proof_keys) - failures} of {len(proof_keys)} proofs in {elapsed:.1f}s ({len(proof_keys) / max(elapsed, 1e-6):.2f} proofs/s).')
+                    if failures == 0:
+                        print(f'Verify proofs sucessful.')
+                    else:
+                        print(f'Verify proofs failed for {failures} proofs.')
                 case ['verify', proof_key]:
                     labels = zeek_prompt.get_labels()
                     value = _well_formed_argument(zeek_prompt, proof_key)
@@ -320,10 +553,7 @@ def _main(path):
                         print(f'Argument {proof_key} is neither a label or a proof key.')                  
                         continue
                     print('Verifying proof...')
-                    rc, out = zeek_prompt.handle_verify(f'\"{value}\"')
-                    # with pt.shortcuts.ProgressBar() as pb:
-                    #     for _ in pb(range(int(zeek_prompt._zeek_env.get_timeout()/10)), label='Verifying proof...'):
-                    #         rc, out = zeek_prompt.handle_verify(f'\"{value}\"')
+                    rc, out = await asyncio.to_thread(zeek_prompt.handle_verify, f'\"{value}\"', _print_progress)
                     out = out.replace('"', '')
                     print(out)
                     if rc == 0:
@@ -336,20 +566,40 @@ def _main(path):
         except KeyboardInterrupt:
             print()
             continue           
+        except asyncio.CancelledError:
+            # The first Ctrl-C while a command runs in a thread cancels the
+            # REPL's task. The thread can not be stopped, so its command goes
+            # on. Later ones raise KeyboardInterrupt, and the task is then
+            # cancelled to exit.
+            if interrupted:
+                raise
+            interrupted = True
+            asyncio.current_task().uncancel()
+            print('\nInterrupted. The command goes on in the background. Ctrl-C again during a command exits Zeek.')
+            continue
         except EOFError:
-            zeek_prompt.good_bye()
             break
+    cmd_span.close()
 
 if __name__ == '__main__':
+    if args.trace != None:
+        start_trace(args.trace)
     try:
         os.system('clear')
         print_formatted_text(HTML('<ansiblue>Zeek: Prototype ZK Protocol Simulator</ansiblue>'))
         print_formatted_text(HTML('<i>Powered by Lurk</i>'))
         print()
-        _main(f'{os.getcwd()}/.zeek')
+        with patch_stdout():
+            asyncio.run(_main(f'{os.getcwd()}/.zeek', args.backend, args.connect, args.profile))
+    except KeyboardInterrupt:
+        # Jobs and sessions were closed by `_main` as its task was cancelled.
+        print()
     except Exception as e:
         print_formatted_text(HTML(f'<ansired>{e}</ansired>'))
         print(type(e))
         print(tb.print_exc())
         print('zeek internal error.')
         exit(1)
+    finally:
+        if args.trace != None:
+            print(f'Wrote {stop_trace()} spans to {args.trace}.')
@@ -0,0 +1,85 @@
+try:
+    import os
+    import csv
+    import json
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, csv or json is missing.')
+    exit(1)
+
+class ZeekBulkException(Exception):
+    pass
+
+def _lurk_string(s):
+    return '"' + s.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def _lurk_datum(value):
+    '''
+    Writes `value` as Lurk data, to be quoted. Objects become association
+    lists, as the tables in `data/credit-score-table.lurk`.
+    '''
+    if value == None or value is False:
+        return 'nil'
+    elif value is True:
+        return 't'
+    elif isinstance(value, int):
+        if value < 0:
+            raise ZeekBulkException(f'Negative number {value} is not supported.')
+        return f'{value}'
+    elif isinstance(value, float):
+        raise ZeekBulkException(f'Fractional number {value} is not supported.')
+    elif isinstance(value, str):
+        return _lurk_string(value)
+    elif isinstance(value, list):
+        return '(' + ' '.join(_lurk_datum(v) for v in value) + ')'
+    elif isinstance(value, dict):
+        return '(' + ' '.join(f'({_lurk_string(str(k))} . {_lurk_datum(v)})' for k, v in value.items()) + ')'
+    else:
+        raise ZeekBulkException(f'Value {value} is not supported.')
+
+def to_lurk(row):
+    '''
+    Returns the Lurk expression of `row`, a quoted association list from
+    its columns to their values.
+    '''
+    return "'" + _lurk_datum(row)
+
+def _csv_value(s):
+    # CSV has no types: natural numbers are read as such, the rest as strings.
+    return int(s) if s.isdigit() else s
+
+def read_rows(file):
+    '''
+    Yields the rows of `file`, a CSV file with a header or a JSON Lines
+    file of objects, as `(n, row, error)`, where `n` counts rows from 1
+    and either `row` or `error` is `None`.
+    '''
+    ext = os.path.splitext(file)[1].lower()
+    if ext not in ('.csv', '.jsonl'):
+        raise ZeekBulkException(f'File {file} is neither .csv nor .jsonl.')
+    with open(file, newline='') as fh:
+        if ext == '.csv':
+            reader = csv.DictReader(fh)
+            for n, row in enumerate(reader, 1):
+                # DictReader keys extra fields by None and fills missing
+                # ones with None.
+                if None in row or None in row.values():
+                    yield n, None, f'Row has not the {len(reader.fieldnames)} columns of the header.'
+                else:
+                    yield n, {k: _csv_value(v) for k, v in row.items()}, None
+        else:
+            n = 0
+            for line in fh:
+                if line.strip() == '':
+                    continue
+                n += 1
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield n, None, f'Invalid JSON: {e}.'
+                    continue
+                if isinstance(row, dict):
+                    yield n, row, None
+                else:
+                    yield n, None, 'Row is not a JSON object.'
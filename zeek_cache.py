@@ -0,0 +1,172 @@
+try:
+    import sqlite3
+    import json
+    import time
+    import threading
+    import hashlib
+    from lurk_meta import *
+    from zeek_metrics import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either sqlite3, json, time, threading, hashlib, lurk_meta or zeek_metrics is missing.')
+    exit(1)
+
+class ZeekCache:
+    '''
+    A persistent key/value store kept in table `name` of `<dir>/cache.db`.
+    Values are JSON encoded. When there are more than `max_entries`
+    entries, the least recently used ones are evicted.
+    '''
+    _DB_FILE = 'cache.db'
+
+    def __init__(self, dir, name, max_entries):
+        self._name        = name
+        self._max_entries = max_entries
+        self._hits        = 0
+        self._misses      = 0
+        self._lock        = threading.Lock()
+        self._conn = sqlite3.connect(f'{dir}/{ZeekCache._DB_FILE}', check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # Losing the last entries on a power failure is harmless for a cache.
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS {name} (key TEXT PRIMARY KEY, value TEXT NOT NULL, atime REAL NOT NULL)')
+        self._conn.execute(f'CREATE INDEX IF NOT EXISTS {name}_atime ON {name} (atime)')
+        # Entries are counted as they are added, so that puts do not scan
+        # the table. Entries added by other processes are only counted
+        # when the table is evicted from, which counts them again.
+        self._entries = self._size()
+
+    def get(self, key):
+        with self._lock, phase('fs'):
+            row = self._conn.execute(f'SELECT value FROM {self._name} WHERE key = ?', (key,)).fetchone()
+            if row == None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._conn.execute(f'UPDATE {self._name} SET atime = ? WHERE key = ?', (time.time(), key))
+            return json.loads(row[0])
+
+    def put(self, key, value):
+        with self._lock, phase('fs'):
+            value, atime = json.dumps(value), time.time()
+            cur = self._conn.execute(f'UPDATE {self._name} SET value = ?, atime = ? WHERE key = ?', (value, atime, key))
+            if cur.rowcount > 0:
+                return
+            self._conn.execute(f'INSERT OR REPLACE INTO {self._name} VALUES (?, ?, ?)', (key, value, atime))
+            self._entries += 1
+            if self._entries <= self._max_entries:
+                return
+            self._entries = self._size()
+            excess = self._entries - self._max_entries
+            if excess > 0:
+                self._conn.execute(f'DELETE FROM {self._name} WHERE key IN '
+                                   f'(SELECT key FROM {self._name} ORDER BY atime LIMIT ?)', (excess,))
+                self._entries -= excess
+
+    def _size(self):
+        return self._conn.execute(f'SELECT COUNT(*) FROM {self._name}').fetchone()[0]
+
+    def get_stats(self):
+        '''
+        Returns the hits and misses of this session and the number of entries.
+        '''
+        with self._lock:
+            return self._hits, self._misses, self._size()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class CallCache(ZeekCache):
+    '''
+    Results of `call <test> <value>`. Applying a committed function to a
+    committed value always yields the same result, so results are keyed
+    by the pair of hashes. A result is only returned to a party holding
+    both commits, so a hit never discloses anything the party could not
+    compute itself.
+    '''
+    def __init__(self, dir, max_entries):
+        super().__init__(dir, 'calls', max_entries)
+
+    def get_call(self, zeek_env, party, test, value):
+        if not (zeek_env.is_commited(party, test) and zeek_env.is_commited(party, value)):
+            return None
+        return self.get(f'{test}:{value}')
+
+    def put_call(self, test, value, out):
+        self.put(f'{test}:{value}', out)
+
+class VerifyCache(ZeekCache):
+    '''
+    Results of successful `verify <proof_key>`. Entries are keyed by the
+    proof key and a digest of the proof's `.proof` and `.meta` files, so
+    a proof whose files changed is always verified again. Verification
+    needs no secrets, hence entries are shared by all parties.
+    '''
+    _CHUNK_SIZE = 1 << 20
+
+    def __init__(self, dir, max_entries):
+        super().__init__(dir, 'verifications', max_entries)
+
+    def proof_digest(pd, proof_key):
+        '''
+        Returns the SHA-256 digest of the files of `proof_key` in proofs
+        dir `pd`, or `None` if any of them is missing.
+        '''
+        h = hashlib.sha256()
+        try:
+            with phase('fs'):
+                for ext in ('proof', 'meta'):
+                    with open(f'{pd}/{proof_key}.{ext}', 'rb') as fh:
+                        for chunk in iter(lambda: fh.read(VerifyCache._CHUNK_SIZE), b''):
+                            h.update(chunk)
+                    h.update(b'\0')
+        except OSError:
+            return None
+        return h.hexdigest()
+
+    def get_verification(self, proof_key, digest):
+        if digest == None:
+            return None
+        return self.get(f'{proof_key}:{digest}')
+
+    def put_verification(self, proof_key, digest, out):
+        if digest != None:
+            self.put(f'{proof_key}:{digest}', out)
+
+class ClaimCache(ZeekCache):
+    '''
+    Claims of proofs read with `!(inspect ...)`, keyed as in `VerifyCache`.
+    '''
+    def __init__(self, dir, max_entries):
+        super().__init__(dir, 'claims', max_entries)
+
+    def get_claim(self, proof_key, digest):
+        if digest == None:
+            return None
+        claim = self.get(f'{proof_key}:{digest}')
+        return LurkProofClaim.from_json(claim) if claim != None else None
+
+    def put_claim(self, proof_key, digest, claim):
+        if digest != None:
+            self.put(f'{proof_key}:{digest}', claim.to_json())
+
+class DurationCache(ZeekCache):
+    '''
+    Durations, in seconds, of the last successful runs of each Lurk
+    operation, from which `ZeekDeadlines` learns how long an operation
+    may run.
+    '''
+    _HISTORY = 20
+
+    def __init__(self, dir):
+        super().__init__(dir, 'durations', 64)
+
+    def get_durations(self, op):
+        durations = self.get(op)
+        return durations if durations != None else []
+
+    def put_duration(self, op, seconds):
+        durations = self.get_durations(op)[-(DurationCache._HISTORY - 1):]
+        self.put(op, durations + [seconds])
@@ -0,0 +1,288 @@
+try:
+    import os
+    import sys
+    import json
+    import argparse
+    import contextlib
+    from lurk_wrapper import *
+    from lurk_session import *
+    from zeek_env import *
+    from zeek_labels import *
+    from zeek_prompt import *
+    from zeek_client import *
+    from zeek_trace import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, json, argparse, contextlib, lurk_wrapper, lurk_session, zeek_env, zeek_labels, zeek_prompt, zeek_client or zeek_trace is missing.')
+    exit(1)
+
+# Exit codes of one-shot commands.
+EXIT_OK      = 0
+EXIT_FAILED  = 1
+EXIT_USAGE   = 2
+EXIT_TIMEOUT = 3
+EXIT_ERROR   = 4
+
+class ZeekCliException(Exception):
+    def __init__(self, msg, code=EXIT_USAGE, result=None):
+        super().__init__(msg)
+        self.code   = code
+        self.result = result
+
+def arg_parser():
+    '''
+    Options of `zeek.py`. Given a command, `zeek.py` runs it and prints its
+    result as JSON, instead of starting the REPL.
+    '''
+    parser = argparse.ArgumentParser(description='Zeek: Prototype ZK Protocol Simulator',
+                                     epilog='Given a command, as typed in the REPL, Zeek runs it, prints its result as JSON '
+                                            f'and exits with {EXIT_OK} if it succeeded, {EXIT_FAILED} if it failed, '
+                                            f'{EXIT_USAGE} if it is not well formed, {EXIT_TIMEOUT} if Lurk timed out '
+                                            f'and {EXIT_ERROR} on internal errors.')
+    parser.add_argument('--backend', choices=LurkSessionManager.BACKENDS, default='lurk',
+                        help='run commands in the lurk binary or in the in-process sim')
+    parser.add_argument('--connect', nargs='?', const=f'{os.getcwd()}/.zeek/{SOCKET_NAME}', metavar='SOCKET',
+                        help='run commands in zeekd, listening on the socket of .zeek or on SOCKET, given as --connect=SOCKET')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write spans of commands, Lurk runs and their phases to FILE, in Chrome trace format')
+    parser.add_argument('--profile', nargs='?', const=f'{os.getcwd()}/.zeek/{ZeekEnv._PROFILES_DIR}', metavar='DIR',
+                        help='run each command under cProfile, dumping its statistics to .zeek/profiles or to DIR, given as --profile=DIR')
+    parser.add_argument('--party', metavar='PARTY',
+                        help='label or hash of the party running the command')
+    parser.add_argument('command', nargs=argparse.REMAINDER,
+                        help='command to run, as typed in the REPL, instead of starting it')
+    return parser
+
+# Options whose value is optional. Their value must be given as
+# `--option=VALUE`, so that the first word of a command is not taken as
+# one.
+_OPTIONAL_VALUES = ('--connect', '--profile')
+
+def _bare_options(parser, argv):
+    '''
+    Returns `argv` with the options of `_OPTIONAL_VALUES` given with no
+    `=` set to their default values, up to the command.
+    '''
+    consts = {a.option_strings[0]: a.const for a in parser._actions if a.option_strings[:1] != [] and a.option_strings[0] in _OPTIONAL_VALUES}
+    argv, i = list(argv), 0
+    while i < len(argv) and argv[i].startswith('-'):
+        if argv[i] in consts:
+            argv[i] = f'{argv[i]}={consts[argv[i]]}'
+        elif '=' not in argv[i] and argv[i] not in ('-h', '--help'):
+            # Options as --backend take the next word.
+            i += 1
+        i += 1
+    return argv
+
+def parse_args(argv=None):
+    parser = arg_parser()
+    args = parser.parse_args(_bare_options(parser, sys.argv[1:] if argv == None else argv))
+    if args.profile != None and args.connect != None:
+        parser.error('commands of zeekd can not be profiled by its clients')
+    if args.party != None and args.command == []:
+        parser.error('--party is only for one-shot commands')
+    return args
+
+def _arg(zp, arg, kind='hash'):
+    # Hashes are checked first, so labels are only loaded if needed.
+    if ZeekEnv.is_hash(arg) or ZeekEnv.is_proof(arg):
+        return arg
+    if arg in zp.get_labels():
+        return zp.get_value(arg)
+    raise ZeekCliException(f'Argument {arg} is neither a label nor a {kind}.')
+
+def _check(rc, out):
+    if rc == LurkWrapper.TIMEOUT:
+        raise ZeekCliException(out, EXIT_TIMEOUT)
+    if rc != 0:
+        raise ZeekCliException(out, EXIT_FAILED)
+    return out
+
+def _not_public(zp, msg):
+    if zp.is_public():
+        raise ZeekCliException(msg)
+
+def _new_label(zp, label):
+    if label in zp.get_labels():
+        raise ZeekCliException(f'Label {label} exists.')
+
+def _target(zp, party, kind):
+    # The party a secret or proof of `kind` is sent to.
+    target = _arg(zp, party)
+    if not zp._zeek_env.is_party(target):
+        raise ZeekCliException(f'Party {party} does not exist.')
+    if target == zp.get_party():
+        raise ZeekCliException(f'Can not send {kind} to oneself. Party {party} is the current party.')
+    return target
+
+def _labeled(zp, values):
+    return [{'value': v, 'label': zp.find_label_for_value(v)} for v in values]
+
+def _run(zp, cmd):
+    '''
+    Runs `cmd`, the words of a command, and returns its result.
+    '''
+    match cmd:
+        case ['call', test, value]:
+            return _check(*zp.handle_call(_arg(zp, test), _arg(zp, value)))
+        case ['check', 'call', test, value, 'returns', output, 'in', proof_key]:
+            output = zp.get_value(output) if output in zp.get_labels() else output
+            holds = _check(*zp.handle_inspect(_arg(zp, proof_key, 'proof key'), _arg(zp, test), _arg(zp, value), output))
+            if not holds:
+                raise ZeekCliException(f'Proof {proof_key} does not prove that call {test} {value} returns {output}.', EXIT_FAILED, holds)
+            return holds
+        case ['hash', 'hide', *value]:
+            return _check(*zp.handle_hide(value))
+        case ['hide', *value, 'as', label]:
+            _new_label(zp, label)
+            out = _check(*zp.handle_hide(value))
+            zp.set_label(label, out, ZeekLabels.COMMIT)
+            return out
+        case ['with', file, 'hide', 'table', 'as', label]:
+            _new_label(zp, label)
+            out = _check(*zp.handle_hide_table(file))
+            zp.set_label(label, out, ZeekLabels.COMMIT)
+            return out
+        case ['with', file, 'hide', 'function', function, 'as', label]:
+            _new_label(zp, label)
+            out = _check(*zp.handle_load_and_hide(file, function))
+            zp.set_label(label, out, ZeekLabels.COMMIT)
+            return out
+        case ['bulk', 'hide', file, *label_column] if len(label_column) <= 1:
+            _not_public(zp, 'Only non-public parties may hide values.')
+            try:
+                rows, failures, elapsed = zp.handle_bulk_hide(file, label_column[0] if label_column != [] else None)
+            except (OSError, ValueError) as e:
+                raise ZeekCliException(f'{e}\nBulk hide failed.')
+            result = {'rows': rows, 'failures': [{'row': n, 'error': error} for n, error in failures], 'secs': elapsed}
+            if failures != []:
+                raise ZeekCliException(f'Bulk hide failed for {len(failures)} of {rows} rows.', EXIT_FAILED, result)
+            return result
+        case ['hash', 'new', 'party', *value]:
+            if not zp.is_public():
+                raise ZeekCliException('Only public can create a party.')
+            return _check(*zp.handle_new_party(value))
+        case ['new', 'party', *value, 'as', label]:
+            if not zp.is_public():
+                raise ZeekCliException('Only public can create a party.')
+            _new_label(zp, label)
+            out = _check(*zp.handle_new_party(value))
+            zp.set_label(label, out, ZeekLabels.PARTY)
+            return out
+        case ['reveal', value]:
+            _not_public(zp, 'Public does not have secrets to reveal.')
+            value = _arg(zp, value)
+            if not zp._zeek_env.is_commited_by_current_party(value):
+                raise ZeekCliException(f'Current party ({zp.get_party()}) does not own {value}.', EXIT_FAILED)
+            return _check(*zp.handle_open(value))
+        case ['parties']:
+            return _labeled(zp, _check(*zp.handle_parties()))
+        case ['secrets']:
+            _not_public(zp, 'Public does not have secrets to show. Only parties.')
+            commits, proofs = zp.handle_env()
+            return {'secrets': _labeled(zp, commits), 'proofs': _labeled(zp, proofs)}
+        case ['labels']:
+            return {l: {'value': v, 'kind': zp.get_kind(l)} for l, v in zp.get_items()}
+        case ['hash', 'prove', test, value]:
+            _not_public(zp, 'Public can not prove.')
+            return _check(*zp.handle_prove(_arg(zp, test), _arg(zp, value)))
+        case ['prove', 'batch', test, 'over', values_arg, 'as', prefix]:
+            _not_public(zp, 'Public can not prove.')
+            test = _arg(zp, test)
+            if os.path.isfile(values_arg):
+                with open(values_arg) as fh:
+                    values = [_arg(zp, v) for v in fh.read().split()]
+            else:
+                values = [v for v in zp.match_commits(values_arg) if v != test]
+            if values == []:
+                raise ZeekCliException(f'No secrets of {zp.get_party()} match {values_arg}.')
+            results = []
+            def _on_result(n, value, rc, out):
+                results.append({'label': f'{prefix}-{n}', 'value': value, 'proved': rc == 0, 'output': out})
+            failures, elapsed = zp.handle_prove_batch(test, values, prefix, _on_result)
+            results.sort(key=lambda r: int(r['label'][len(prefix) + 1:]))
+            if failures != 0:
+                raise ZeekCliException(f'Prove batch failed for {failures} of {len(values)} claims.', EXIT_FAILED, results)
+            return results
+        case ['prove', test, value, 'as', label]:
+            _not_public(zp, 'Public can not prove.')
+            _new_label(zp, label)
+            out = _check(*zp.handle_prove(_arg(zp, test), _arg(zp, value)))
+            zp.set_label(label, out, ZeekLabels.PROOF)
+            return out
+        case ['send', 'secret', commit, 'to', party]:
+            _not_public(zp, 'Public does not have secrets to send.')
+            commit, target = _arg(zp, commit), _target(zp, party, 'secret')
+            if zp._zeek_env.is_commited(target, commit):
+                raise ZeekCliException(f'Can not send {commit} to {party}. It is already available to {party}.', EXIT_FAILED)
+            return _check(*zp.handle_send_commit(target, commit))
+        case ['send', 'proof', proof_key, 'to', party]:
+            _not_public(zp, 'Public does not have proofs to send.')
+            proof, target = _arg(zp, proof_key, 'proof key'), _target(zp, party, 'proof')
+            if zp._zeek_env.is_proven(target, proof):
+                raise ZeekCliException(f'Can not send {proof_key} to {party}. It is already available to {party}.', EXIT_FAILED)
+            return _check(*zp.handle_send_proof(target, proof))
+        case ['verify', pattern] if pattern == 'all' or any(c in pattern for c in '*?['):
+            results = []
+            def _on_result(proof_key, rc, out):
+                results.append({'proof_key': proof_key, 'label': zp.find_label_for_value(proof_key),
+                                'verified': rc == 0, 'output': out.replace('"', '')})
+            failures, elapsed = zp.handle_verify_batch(zp.match_proofs(pattern), _on_result)
+            if failures != 0:
+                raise ZeekCliException(f'Verify proofs failed for {failures} of {len(results)} proofs.', EXIT_FAILED, results)
+            return results
+        case ['verify', proof_key]:
+            return _check(*zp.handle_verify(f'"{_arg(zp, proof_key, "proof key")}"')).replace('"', '')
+        case ['replay', file]:
+            report = _check(*zp.handle_replay(file))
+            if report['mismatches'] != 0:
+                raise ZeekCliException(f'Replay failed for {report["mismatches"]} calls.', EXIT_FAILED, report)
+            return report
+        case ['run', 'protocol', file]:
+            report = _check(*zp.handle_run_protocol(file))
+            if report['failures'] != 0:
+                raise ZeekCliException(f'Protocol failed for {report["failures"]} steps.', EXIT_FAILED, report)
+            return report
+        case ['simulate', provers, *concurrency] if provers.isdigit() and len(concurrency) <= 1 and all(c.isdigit() for c in concurrency):
+            report = _check(*zp.handle_simulate(int(provers), int(concurrency[0]) if concurrency != [] else None))
+            if report['failures'] != 0 or report['verify']['failures'] != 0:
+                raise ZeekCliException(f'Simulate failed for {report["failures"]} provers and {report["verify"]["failures"]} proofs.', EXIT_FAILED, report)
+            return report
+        case other:
+            raise ZeekCliException(f'Unknown command {" ".join(other)}.')
+
+def run_one_shot(args):
+    '''
+    Runs the one-shot command of `args`, printing its result as JSON on
+    stdout, and returns the exit code. Anything else Zeek prints goes to
+    stderr.
+    '''
+    reply = {'command': ' '.join(args.command)}
+    code  = EXIT_OK
+    if args.trace != None:
+        start_trace(args.trace)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            zp = ZeekClient(args.connect) if args.connect != None else ZeekPrompt(f'{os.getcwd()}/.zeek', args.backend)
+            try:
+                if args.profile != None:
+                    ZeekProfiler(args.profile).instrument(zp, 'handle_')
+                if args.party != None:
+                    party = args.party if args.party == 'public' else _arg(zp, args.party, 'party')
+                    _check(*zp.handle_party(party))
+                reply['party']  = zp.get_party()
+                reply['result'] = _run(zp, args.command)
+            finally:
+                zp.close()
+    except ZeekCliException as e:
+        reply['error'], code = f'{e}', e.code
+        if e.result != None:
+            reply['result'] = e.result
+    except Exception as e:
+        reply['error'], code = f'{e}', EXIT_ERROR
+    finally:
+        stop_trace()
+    reply['ok'] = code == EXIT_OK
+    print(json.dumps(reply))
+    return code
@@ -0,0 +1,172 @@
+try:
+    import os
+    import json
+    import socket
+    import itertools
+    import threading
+    import queue
+    from zeek_prompt import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, json, socket, itertools, threading, queue or zeek_prompt is missing.')
+    exit(1)
+
+class ZeekClientException(Exception):
+    pass
+
+# Name of the socket of `zeekd` in a `.zeek` directory.
+SOCKET_NAME = 'zeekd.sock'
+
+def _callbacks(args, callbacks):
+    # Functions can not be sent: they are numbered and called back by `zeekd`.
+    out = []
+    for a in args:
+        if callable(a):
+            callbacks.append(a)
+            out.append({'$callback': len(callbacks) - 1})
+        else:
+            out.append(a)
+    return out
+
+class _ZeekRemote:
+    '''
+    Calls the methods named `<prefix><method>` of `zeekd`.
+    '''
+    def __init__(self, client, prefix):
+        self._client = client
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args: self._client._call(f'{self._prefix}{name}', *args)
+
+class ZeekClient:
+    '''
+    A `ZeekPrompt` whose commands run in `zeekd`, the daemon serving the
+    `.zeek` directory. Only help is local. Requests are JSON lines
+    `{"id", "op", "args"}` answered with `{"id", "result"}` or
+    `{"id", "error"}`. Functions passed as
+    arguments, as progress reporters, are called back on
+    `{"id", "event", "args"}` lines, in the thread that made the
+    request, so they may make requests too. Several requests may be
+    running at once, as background jobs.
+    '''
+    handle_help = ZeekPrompt.handle_help
+
+    def __init__(self, socket_path):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.connect(socket_path)
+        except OSError as e:
+            raise ZeekClientException(f'{e}\nzeekd is not running on {socket_path}.')
+        self._rfile    = self._sock.makefile('r', encoding='utf-8')
+        self._wfile    = self._sock.makefile('w', encoding='utf-8')
+        self._lock     = threading.Lock()
+        self._ids      = itertools.count()
+        self._calls    = {}
+        self._closed   = False
+        self._reader   = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+        self._zeek_env = _ZeekRemote(self, 'env.')
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args: self._call(name, *args)
+
+    def _read(self):
+        try:
+            for line in self._rfile:
+                msg = json.loads(line)
+                replies = self._calls.get(msg['id'])
+                if replies != None:
+                    replies.put(msg)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._closed = True
+            for replies in list(self._calls.values()):
+                replies.put(None)
+
+    def _call_with_id(self, id, op, *args):
+        callbacks = []
+        replies   = self._calls[id] = queue.Queue()
+        try:
+            if self._closed:
+                replies.put(None)
+            line = json.dumps({'id': id, 'op': op, 'args': _callbacks(args, callbacks)})
+            with self._lock:
+                try:
+                    self._wfile.write(line + '\n')
+                    self._wfile.flush()
+                except OSError:
+                    replies.put(None)
+            while True:
+                reply = replies.get()
+                if reply == None:
+                    raise ZeekClientException('zeekd closed the connection.')
+                if 'event' in reply:
+                    callbacks[reply['event']](*reply['args'])
+                elif 'error' in reply:
+                    raise ZeekClientException(reply['error'])
+                else:
+                    return reply['result']
+        finally:
+            del self._calls[id]
+
+    def _call(self, op, *args):
+        return self._call_with_id(next(self._ids), op, *args)
+
+    # Files are read by `zeekd`, which may run in another directory.
+
+    def handle_hide_table(self, file):
+        return self._call('handle_hide_table', os.path.abspath(file))
+
+    def handle_load_and_hide(self, file, fun):
+        return self._call('handle_load_and_hide', os.path.abspath(file), fun)
+
+    def handle_bulk_hide(self, file, label_column=None):
+        return self._call('handle_bulk_hide', os.path.abspath(file), label_column)
+
+    # zeekd does not record nor replay, see `ZeekDaemon`.
+
+    def start_recording(self, file):
+        return 1, f'Commands run in zeekd can not be recorded.\nCould not record to {file}.'
+
+    def stop_recording(self):
+        return 1, 'Not recording.'
+
+    def begin_step(self, cmd):
+        pass
+
+    def end_step(self):
+        pass
+
+    def handle_replay(self, file, on_step=None):
+        return 1, f'Recordings can not be replayed in zeekd.\nCould not replay {file}.'
+
+    def handle_run_protocol(self, file, on_step=None):
+        return self._call('handle_run_protocol', os.path.abspath(file), on_step)
+
+    def new_prove_job(self, test, value):
+        id = next(self._ids)
+        def _prove_job(on_progress):
+            return self._call_with_id(id, 'prove_job', test, value, on_progress)
+        def _cancel():
+            self._call('cancel', id)
+        return _prove_job, _cancel
+
+    def set_backend(self, backend):
+        return 1, 'The backend of zeekd is chosen when starting it.'
+
+    def good_bye(self):
+        print('\nBye')
+        self.close()
+
+    def close(self):
+        try:
+            self._call('save_labels')
+        finally:
+            self._sock.close()
@@ -0,0 +1,154 @@
+try:
+    import os
+    from prompt_toolkit.completion import Completer, Completion
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os or prompt_toolkit is missing.')
+    exit(1)
+
+# Key of the node following a word that is none of the keywords of a node.
+_OTHER = ''
+
+def _slot(kind, next=None):
+    '''
+    A grammar position filled by one of the candidates of `kind`, such
+    as the commits of the current party, followed by `next`.
+    '''
+    return kind, next
+
+class ZeekCompleter(Completer):
+    '''
+    Completes Zeek commands following `_GRAMMAR`. A grammar node is either
+    `None`, when the command is complete, a dictionary from keywords to
+    nodes, or a slot. In a dictionary, `_OTHER` maps to the node followed
+    by any other word. Candidates are only computed for the token being
+    completed. The candidates of each slot kind are cached, and computed
+    again only when the party, its commits or proofs, the parties or the
+    labels change.
+    - In the case of `call`, the secrets of the current party are
+    completed twice.
+    - For `party`, the available parties are listed.
+    - Command `prove` is completed with two secrets as in a `call`.
+    - Command `send` can be completed as `secret` or `proof`. For the
+    `secret` case, the secrets for the current party are shown first and
+    the parties next, after the `to` syntax. For the `proof` case, the
+    proofs of the current party are shown, then the `to` syntax and then
+    the available parties.
+    '''
+    _DATA_DIR = './data'
+    _GRAMMAR = {
+        'backend': {'lurk': None, 'sim': None},
+        'bulk'   : {'hide': _slot('files')},
+        'call'   : _slot('commits', _slot('commits')),
+        'cancel' : None,
+        'check'  : {'call': _slot('labels', _slot('labels', {'returns': {'t'  : {'in': _slot('proofs')},
+                                                                          'nil': {'in': _slot('proofs')}}}))},
+        'exit'   : None,
+        'hash'   : {'hide': None,
+                    'new' : {'party': None},
+                    'prove': _slot('commits', _slot('commits'))},
+        'help'   : None,
+        'hide'   : None,
+        'jobs'   : None,
+        'labels' : None,
+        'migrate': {'objects': None},
+        'new'    : {'party': None},
+        'parties': None,
+        'party'  : _slot('parties'),
+        'prove'  : {'batch': _slot('commits', {'over': None}),
+                    _OTHER : _slot('commits', _slot('commits', {'as': None}))},
+        'record' : {'stop': None},
+        'replay' : None,
+        'reveal' : _slot('commits'),
+        'run'    : {'protocol': _slot('files')},
+        'save'   : {'labels': None},
+        'secrets': None,
+        'simulate': None,
+        'stats'  : None,
+        'send'   : {'secret': _slot('commits', {'to': _slot('parties')}),
+                    'proof' : _slot('proofs',  {'to': _slot('parties')})},
+        'verify' : _slot('verify'),
+        'wait'   : None,
+        'with'   : _slot('files', {'hide': {'table': {'as': None}, 'function': None}})
+    }
+
+    def __init__(self, zeek_prompt):
+        self._zp    = zeek_prompt
+        self._cache = {}
+
+    def _labeled(self, values):
+        '''
+        Values are shown by their labels, when they have one. Labels come
+        before unlabeled hashes.
+        '''
+        names = [l if l != None else v for v, l in ((v, self._zp.find_label_for_value(v)) for v in values)]
+        return sorted(names, key=lambda x: (x[0].isnumeric(), x))
+
+    def _stamp(self, kind):
+        env   = self._zp._zeek_env
+        party = self._zp.get_party()
+        if kind == 'labels':
+            return self._zp.get_labels_generation()
+        elif kind == 'files':
+            path = ZeekCompleter._DATA_DIR
+            return os.stat(path).st_mtime_ns if os.path.isdir(path) else None
+        else:
+            return party, env.get_generation(party), self._zp.get_labels_generation()
+
+    def _compute(self, kind):
+        env   = self._zp._zeek_env
+        party = self._zp.get_party()
+        match kind:
+            case 'commits':
+                return self._labeled(env.get_commits(party))
+            case 'proofs':
+                return self._labeled(env.get_proofs(party))
+            case 'verify':
+                return ['all'] + self._labeled(env.get_proofs(party))
+            case 'parties':
+                return self._labeled(p for p in env.get_parties() if p != party)
+            case 'labels':
+                return self._labeled(self._zp.get_labels())
+            case 'files':
+                path = ZeekCompleter._DATA_DIR
+                if not os.path.isdir(path):
+                    return []
+                return sorted(f'{path}/{f}' for f in os.listdir(path) if os.path.isfile(f'{path}/{f}'))
+
+    def _candidates(self, kind):
+        stamp = self._stamp(kind)
+        cached = self._cache.get(kind)
+        if cached == None or cached[0] != stamp:
+            cached = stamp, self._compute(kind)
+            self._cache[kind] = cached
+        return cached[1]
+
+    def get_completions(self, document, complete_event):
+        text  = document.text_before_cursor.lstrip()
+        words = text.split()
+        if text == '' or text[-1].isspace():
+            partial = ''
+        else:
+            partial = words.pop()
+        node = ZeekCompleter._GRAMMAR
+        for w in words:
+            if isinstance(node, dict) and _OTHER in node and w not in node:
+                node = node[_OTHER]
+            if isinstance(node, dict) and w in node:
+                node = node[w]
+            elif isinstance(node, tuple):
+                node = node[1]
+            else:
+                return
+        if isinstance(node, dict):
+            candidates = [k for k in node.keys() if k != _OTHER]
+            if isinstance(node.get(_OTHER), tuple):
+                candidates += self._candidates(node[_OTHER][0])
+        elif isinstance(node, tuple):
+            candidates = self._candidates(node[0])
+        else:
+            return
+        for c in candidates:
+            if c.startswith(partial):
+                yield Completion(c, start_position=-len(partial))
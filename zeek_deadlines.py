@@ -0,0 +1,53 @@
+try:
+    import threading
+    from zeek_cache import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either threading or zeek_cache is missing.')
+    exit(1)
+
+class ZeekDeadlines:
+    '''
+    How long each Lurk operation (`hide`, `load`, `open`, `apply`, `prove`,
+    `verify` or `inspect`) may run before its process group is killed.
+    - A deadline given for the operation in setting `deadlines` is used
+      as is. A deadline of 0 means none.
+    - Otherwise, the deadline is learned from the last successful runs of
+      the operation: `deadline_factor` times the longest of them, but not
+      less than `timeout` seconds.
+    - Operations that never ran have no deadline, as before deadlines
+      were enforced, but for `load`, `prove` and `verify`, which get a
+      generous one.
+    '''
+    _DEFAULT_DEADLINES = {'load': 120, 'prove': 3600, 'verify': 600}
+    _DEFAULT_FACTOR    = 10
+
+    def __init__(self, zeek_env):
+        self._timeout   = zeek_env.get_timeout()
+        self._deadlines = zeek_env.get_config('deadlines', {})
+        self._factor    = zeek_env.get_config('deadline_factor', ZeekDeadlines._DEFAULT_FACTOR)
+        self._durations = DurationCache(zeek_env.get_path())
+        self._learned   = {}
+        self._lock      = threading.Lock()
+
+    def get(self, op):
+        '''
+        Returns the deadline of `op` in seconds, or `None` if it has none.
+        '''
+        if op in self._deadlines:
+            return self._deadlines[op] if self._deadlines[op] > 0 else None
+        with self._lock:
+            if op not in self._learned:
+                durations = self._durations.get_durations(op)
+                self._learned[op] = max(self._timeout, self._factor * max(durations)) if durations != [] else \
+                                    ZeekDeadlines._DEFAULT_DEADLINES.get(op)
+            return self._learned[op]
+
+    def record(self, op, seconds):
+        with self._lock:
+            self._durations.put_duration(op, seconds)
+            self._learned.pop(op, None)
+
+    def close(self):
+        self._durations.close()
@@ -2,10 +2,14 @@ try:
     import shutil as sh
     import os
     import string
+    import json
+    import threading
+    import filecmp
+    from zeek_metrics import *
 except Exception as e:
     print(e)
     print('Check your Python 3 installation.')
-    print('Either shutil, os or string is missing.')
+    print('Either shutil, os, string, json, threading, filecmp or zeek_metrics is missing.')
     exit(1)
 
 class ZeekEnv:
@@ -13,27 +17,119 @@ class ZeekEnv:
     _PROOFS_DIR  = 'proofs'
     _HASH_SIZE   = 64
     _PROOF_SIZE  = 79
+    _CONFIG_FILE = 'config.json'
+    _OBJECTS_DIR = 'objects'
+    _PROFILES_DIR = 'profiles'
     '''
-    A commit or proof is not represented in memory. Any computation that
-    requires either one must query the filesystem for it.
+    Commits and proofs live in the filesystem. The names of the parties
+    and of the commits and proofs of each party are indexed in memory, as
+    sets, one per directory. An index is rebuilt when the modification
+    time of its directory changes, unless the change was made by `Zeek`
+    itself, in which case the index is updated in place.
+
+    The files of a commit or proof are kept once, in the object store
+    `<dir>/objects`, and parties holding it have hard links to them.
+    Lurk names commits and proofs after their contents, so objects are
+    stored under the same names. Sending a secret or a proof to a party
+    only adds links, whatever its size.
     '''
     def __init__(self, dir, timeout=15):
         self._dir     = dir
         self._hist    = f'{self._dir}/.zeek_history'
         self._party = 'public'
+        self._local = threading.local()
+        self._index = {}
+        self._index_lock = threading.Lock()
+        self._generation = 0
         self._timeout = timeout
         if not os.path.exists(self._dir):
             os.makedirs(self._dir)
         if not os.path.isfile(self._hist):
             f = open(self._hist,'a')
             f.close()
+        for secret in ('commits', 'proofs'):
+            os.makedirs(f'{self._dir}/{ZeekEnv._OBJECTS_DIR}/{secret}', exist_ok=True)
         self.add_party('public')
+        self._config = self._load_config()
+
+    def _load_config(self):
+        '''
+        Settings are read from `<dir>/config.json`, if it exists.
+        - `workers`: how many Lurk processes batch commands may run at once.
+          Defaults to the number of cores.
+        - `call_cache_size`: how many `call` results are cached.
+        - `verify_cache_size`: how many `verify` results are cached.
+        '''
+        config_file_name = f'{self._dir}/{ZeekEnv._CONFIG_FILE}'
+        if os.path.isfile(config_file_name) and os.path.getsize(config_file_name) > 0:
+            fh = open(config_file_name, 'r')
+            config = json.load(fh)
+            fh.close()
+            return config
+        return {}
+
+    def _scan(dir, is_entry, name):
+        with os.scandir(dir) as it:
+            return {name(e) for e in it if is_entry(e)}
+
+    def _indexed(self, dir, is_entry, name):
+        '''
+        Returns the index of `dir`, the set of `name(e)` for its entries `e`
+        such that `is_entry(e)`.
+        '''
+        with phase('fs'):
+            mtime = os.stat(dir).st_mtime_ns
+        with self._index_lock:
+            entry = self._index.get(dir)
+            if entry != None and entry[0] == mtime:
+                return entry[1]
+        with phase('fs'):
+            entries = ZeekEnv._scan(dir, is_entry, name)
+        with self._index_lock:
+            self._index[dir] = mtime, entries
+            self._generation += 1
+        return entries
+
+    def _dir_mtime(dir):
+        with phase('fs'):
+            return os.stat(dir).st_mtime_ns
+
+    def _note_written(self, dir, name, mtime_before):
+        '''
+        Adds `name` to the index of `dir` after `Zeek`, or Lurk on its behalf,
+        wrote it. If `dir` was indexed when its modification time was still
+        `mtime_before`, the index is up to date and need not be rebuilt.
+        '''
+        mtime = ZeekEnv._dir_mtime(dir)
+        with self._index_lock:
+            entry = self._index.get(dir)
+            if entry != None:
+                entry[1].add(name)
+                self._generation += 1
+                if entry[0] == mtime_before:
+                    self._index[dir] = mtime, entry[1]
+
+    def get_generation(self, party):
+        '''
+        Returns a number that changes whenever the parties, or the commits
+        or proofs of `party`, change.
+        '''
+        self._party_names()
+        self._secret_names(party, 'commits')
+        self._secret_names(party, 'proofs')
+        return self._generation
+
+    def _party_names(self):
+        return self._indexed(self._dir, lambda e: e.is_dir() and e.name not in (ZeekEnv._OBJECTS_DIR, ZeekEnv._PROFILES_DIR), lambda e: e.name)
 
     def add_party(self, party):
         assert(os.path.exists(self._dir))
         if (not os.path.exists(f'{self._dir}/{party}')):
-            os.makedirs(f'{self._dir}/{party}/{ZeekEnv._COMMITS_DIR}')
-            os.makedirs(f'{self._dir}/{party}/{ZeekEnv._PROOFS_DIR}')
+            mtime_before = ZeekEnv._dir_mtime(self._dir)
+            with phase('fs'):
+                os.makedirs(f'{self._dir}/{party}/{ZeekEnv._COMMITS_DIR}')
+                os.makedirs(f'{self._dir}/{party}/{ZeekEnv._PROOFS_DIR}')
+            self._note_written(self._dir, party, mtime_before)
 
     def get_path(self):
         return self._dir
@@ -41,15 +137,21 @@ class ZeekEnv:
     def get_timeout(self):
         return self._timeout
 
+    def get_config(self, key, default):
+        return self._config.get(key, default)
+
+    def get_workers(self):
+        workers = self._config.get('workers')
+        return workers if workers != None and workers > 0 else os.cpu_count()
+
     def get_parties(self):
         assert(os.path.exists(self._dir))
-        parties = []
-        # os.walk() returns a generator that requires the following
-        # repetition.
-        for (_, dirnames, _) in os.walk(self._dir):
-            parties.extend(dirnames)
-            break
-        return parties
+        parties = self._party_names()
+        with self._index_lock:
+            return list(parties)
+
+    def is_party(self, party):
+        return party in self._party_names()
 
     def is_proof(proof):
         proof_prefix = 'Nova_Pallas_10'
@@ -59,14 +161,25 @@ class ZeekEnv:
         return len(hash) == ZeekEnv._HASH_SIZE and all(c in string.hexdigits for c in hash[2:])
 
     def set_party(self, party):
-        if party in self.get_parties():
-           self._party = party
+        if self.is_party(party):
+           if hasattr(self._local, 'party'):
+               self._local.party = party
+           else:
+               self._party = party
            return True
         else:        
            return False
 
+    def bind_party(self, party):
+        '''
+        Gives the calling thread a current party of its own, `party`, that
+        `set_party` then changes. Used by `zeekd`, where each client has
+        its own current party.
+        '''
+        self._local.party = party
+
     def get_party(self):
-        return self._party
+        return getattr(self._local, 'party', self._party)
     
     def get_hist(self):
         return self._hist
@@ -76,27 +189,35 @@ class ZeekEnv:
                f'{self._dir}/{party}/{ZeekEnv._PROOFS_DIR}'
 
     def get_current_party_dirs(self):
-        return self.get_party_dirs(self._party)
+        return self.get_party_dirs(self.get_party())
 
-    def get_secrets(self, party, secret):
+    def _secret_dir(self, party, secret):
         assert(secret == 'commits' or secret == 'proofs')
         if secret == 'commits':
-            dir = f'{self._dir}/{party}/{ZeekEnv._COMMITS_DIR}'
-            ext = '.commit'
+            return f'{self._dir}/{party}/{ZeekEnv._COMMITS_DIR}', '.commit'
         else:
-            dir = f'{self._dir}/{party}/{ZeekEnv._PROOFS_DIR}'
-            ext = '.proof'
+            return f'{self._dir}/{party}/{ZeekEnv._PROOFS_DIR}', '.proof'
+
+    def _secret_names(self, party, secret):
+        dir, ext = self._secret_dir(party, secret)
         assert(os.path.exists(dir))
-        secrets = []
-        # os.walk() returns a generator that requires the following
-        # repetition.
-        for (_, _, filenames) in os.walk(dir):
-            secrets.extend(filenames)
-            break
-        secrets = [ f.split(ext)[0] for f in secrets ]
-        if ext == '.proof':
-            secrets = [ f for f in secrets if 'meta' not in f ] 
-        return secrets
+        # Proofs also have a .meta file, which is not listed.
+        return self._indexed(dir, lambda e: e.name.endswith(ext), lambda e: e.name[:-len(ext)])
+
+    def get_secrets(self, party, secret):
+        secrets = self._secret_names(party, secret)
+        with self._index_lock:
+            return list(secrets)
+
+    def get_secret_mtime(self, party, secret):
+        '''
+        To be read before writing a commit or proof to `party`, so that the
+        write can be recorded with `note_secret` without a rescan.
+        '''
+        return ZeekEnv._dir_mtime(self._secret_dir(party, secret)[0])
+
+    def note_secret(self, party, secret, name, mtime_before):
+        self._note_written(self._secret_dir(party, secret)[0], name, mtime_before)
 
     def get_commits(self, party):
         return self.get_secrets(party, 'commits')
@@ -111,10 +232,10 @@ class ZeekEnv:
         return self.get_proofs(self.get_party())
 
     def is_commited(self, party, hash):
-        return hash in self.get_commits(party)
+        return hash in self._secret_names(party, 'commits')
 
     def is_proven(self, party, proof):
-        return proof in self.get_proofs(party)
+        return proof in self._secret_names(party, 'proofs')
     
     def is_proven_by_current_party(self, proof):
         return self.is_proven(self.get_party(), proof)
@@ -122,13 +243,43 @@ class ZeekEnv:
     def is_commited_by_current_party(self, hash):
         return self.is_commited(self.get_party(), hash)
     
+    def _link(src, dst):
+        try:
+            os.link(src, dst)
+        except FileExistsError:
+            raise
+        except OSError:
+            # Filesystems without hard links get a copy.
+            # shutil.copy2 preserves time.
+            sh.copy2(src, dst)
+
+    def _object(self, secret, path):
+        '''
+        Returns the object of the file at `path`, adding the file to the
+        store if it is not there yet.
+        '''
+        obj = f'{self._dir}/{ZeekEnv._OBJECTS_DIR}/{secret}/{os.path.basename(path)}'
+        if not os.path.exists(obj):
+            try:
+                ZeekEnv._link(path, obj)
+            except FileExistsError:
+                pass
+        return obj
+
+    def _send(self, source_party, target_party, secret, name, exts):
+        source_dir, _ = self._secret_dir(source_party, secret)
+        target_dir, _ = self._secret_dir(target_party, secret)
+        mtime_before = self.get_secret_mtime(target_party, secret)
+        with phase('fs'):
+            for ext in exts:
+                ZeekEnv._link(self._object(secret, f'{source_dir}/{name}{ext}'), f'{target_dir}/{name}{ext}')
+        self.note_secret(target_party, secret, name, mtime_before)
+
     def send_commit(self, source_party, target_party, hash):
         assert(self.is_commited(source_party, hash))
         assert(not self.is_commited(target_party, hash))
-        # shutil.copy2 preserves time.
         try:
-            sh.copy2(f'{self._dir}/{source_party}/{ZeekEnv._COMMITS_DIR}/{hash}.commit', 
-                     f'{self._dir}/{target_party}/{ZeekEnv._COMMITS_DIR}')
+            self._send(source_party, target_party, 'commits', hash, ('.commit',))
             return 0, f'Secret {hash} sent to {target_party}.'
         except Exception as e:
             return 1, e
@@ -139,15 +290,38 @@ class ZeekEnv:
     def send_proof(self, source_party, target_party, proof):
         assert(self.is_proven(source_party, proof))
         assert(not self.is_proven(target_party, proof))
-        # shutil.copy2 preserves time.
         try:
-            sh.copy2(f'{self._dir}/{source_party}/{ZeekEnv._PROOFS_DIR}/{proof}.proof', 
-                     f'{self._dir}/{target_party}/{ZeekEnv._PROOFS_DIR}')
-            sh.copy2(f'{self._dir}/{source_party}/{ZeekEnv._PROOFS_DIR}/{proof}.meta', 
-                     f'{self._dir}/{target_party}/{ZeekEnv._PROOFS_DIR}')
+            self._send(source_party, target_party, 'proofs', proof, ('.proof', '.meta'))
             return 0, f'Proof {proof} sent to {target_party}.'
         except Exception as e:
             return 1, e
 
     def send_proof_from_current_party(self, target_party, proof):
         return self.send_proof(self.get_party(), target_party, proof)
+
+    def migrate_objects(self):
+        '''
+        Replaces the copies of commits and proofs made before the object
+        store by links to their objects. Returns how many files were
+        replaced and how many bytes were freed.
+        '''
+        files, freed = 0, 0
+        for party in self.get_parties():
+            for secret in ('commits', 'proofs'):
+                dir, _ = self._secret_dir(party, secret)
+                with os.scandir(dir) as it:
+                    paths = [e.path for e in it if e.is_file()]
+                for path in paths:
+                    obj = self._object(secret, path)
+                    if os.path.samefile(path, obj) or not filecmp.cmp(path, obj, shallow=False):
+                        continue
+                    tmp = f'{path}.tmp'
+                    try:
+                        os.link(obj, tmp)
+                    except OSError:
+                        continue
+                    size = os.path.getsize(path)
+                    os.replace(tmp, path)
+                    files += 1
+                    freed += size
+        return files, freed
@@ -0,0 +1,133 @@
+try:
+    import asyncio
+    import itertools
+    import signal
+    import time
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either asyncio, itertools, signal or time is missing.')
+    exit(1)
+
+class ZeekJob:
+    '''
+    A command running in the background. `fn` returns the usual pair
+    `(rc, out)` and `cancel_fn` interrupts it. `fn` is called with a
+    function to report its progress, a line of text.
+    '''
+    def __init__(self, id, desc, cancel_fn):
+        self._id        = id
+        self._desc      = desc
+        self._cancel_fn = cancel_fn
+        self._status    = 'running'
+        self._started   = time.monotonic()
+        self._finished  = None
+        self._result    = None
+        self._progress  = None
+        self._future    = None
+
+    def get_id(self):
+        return self._id
+
+    def get_desc(self):
+        return self._desc
+
+    def get_status(self):
+        return self._status
+
+    def get_result(self):
+        return self._result
+
+    def get_progress(self):
+        return self._progress
+
+    def set_progress(self, progress):
+        self._progress = progress
+
+    def is_running(self):
+        return self._status == 'running'
+
+    def elapsed(self):
+        end = self._finished if self._finished != None else time.monotonic()
+        return end - self._started
+
+class ZeekJobs:
+    _PROGRESS_WIDTH = 40
+
+    def __init__(self):
+        self._jobs    = {}
+        self._counter = itertools.count(1)
+
+    def submit(self, desc, fn, cancel_fn, on_done):
+        '''
+        Runs `fn` in a worker thread. Once it finishes, `on_done` is
+        called, in the event loop, with the job.
+        '''
+        job = ZeekJob(next(self._counter), desc, cancel_fn)
+        self._jobs[job.get_id()] = job
+        job._future = asyncio.get_running_loop().run_in_executor(None, fn, job.set_progress)
+        job._future.add_done_callback(lambda f: self._finish(job, f, on_done))
+        return job
+
+    def _finish(self, job, future, on_done):
+        job._finished = time.monotonic()
+        if future.exception() != None:
+            job._result = 1, f'{future.exception()}'
+        else:
+            job._result = future.result()
+        if job._status != 'cancelled':
+            job._status = 'done' if job._result[0] == 0 else 'failed'
+        on_done(job)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def get_jobs(self):
+        return list(self._jobs.values())
+
+    def get_running(self):
+        return [j for j in self._jobs.values() if j.is_running()]
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job == None:
+            return 1, f'Job {job_id} does not exist.'
+        if not job.is_running():
+            return 1, f'Job {job_id} is not running.'
+        job._status = 'cancelled'
+        job._cancel_fn()
+        return 0, f'Job {job_id} cancelled.'
+
+    def cancel_all(self):
+        for job in self.get_running():
+            self.cancel(job.get_id())
+
+    async def wait(self, job_id):
+        '''
+        Waits for job `job_id` to finish. Ctrl-C stops waiting but
+        leaves the job running.
+        '''
+        job = self._jobs[job_id]
+        loop = asyncio.get_running_loop()
+        interrupted = loop.create_future()
+        sigint = signal.getsignal(signal.SIGINT)
+        loop.add_signal_handler(signal.SIGINT, lambda: interrupted.done() or interrupted.set_result(None))
+        try:
+            await asyncio.wait([job._future, interrupted], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            loop.remove_signal_handler(signal.SIGINT)
+            signal.signal(signal.SIGINT, sigint)
+        return not job.is_running()
+
+    def toolbar(self):
+        running = self.get_running()
+        if running == []:
+            return ''
+        return ' | '.join(ZeekJobs._status_line(j) for j in running)
+
+    def _status_line(job):
+        line = f'job {job.get_id()}: {job.get_desc()} ({int(job.elapsed())}s)'
+        progress = job.get_progress()
+        if progress != None:
+            line += f' {progress[:ZeekJobs._PROGRESS_WIDTH]}'
+        return line
@@ -0,0 +1,279 @@
+try:
+    import os
+    import json
+    import tempfile
+    import threading
+    from json.encoder import encode_basestring_ascii
+    from zeek_metrics import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, json, tempfile, threading or zeek_metrics is missing.')
+    exit(1)
+
+def _lines(entries):
+    # As `json.dumps` writes them, but several times faster. Labels, values
+    # and kinds are strings.
+    e = encode_basestring_ascii
+    return ''.join(f'[{e(l)}, {e(v)}, {e(k)}]\n' for l, v, k in entries)
+
+class ZeekLabels:
+    '''
+    Labels for party hashes, commit hashes and proof keys. Each label maps
+    to its value and each value maps back to its labels, in the order they
+    were set, so lookups take constant time in both directions. Labels are
+    tagged with the kind of their value.
+
+    Labels are kept in `file`, `labels.log`, a log with one JSON line
+    [<label>, <value>, <kind>] per label set. Lines are appended and
+    synced to disk as labels are set, so no label is lost if `Zeek`
+    crashes, and later lines override earlier ones. A last line cut short
+    by a crash is dropped. Once most lines are overridden, the log is
+    compacted in the background: it is written again aside, one line per
+    label, and swapped in at once.
+
+    If there is no log, the labels of earlier versions, in `labels.json`,
+    are imported. That file is either
+        {"version": 2, "labels": {<label>: [<value>, <kind>], ...}}
+    or, in the original format, a plain {<label>: <value>} dictionary,
+    with kinds inferred by `kind_of(value)`. Labels are only read when
+    first used, as one-shot commands given hashes never use them.
+    '''
+    PARTY  = 'party'
+    COMMIT = 'commit'
+    PROOF  = 'proof'
+    _LEGACY_FILE = 'labels.json'
+    # The log is compacted once it has more lines than this and than
+    # twice the labels.
+    _COMPACT_MIN = 1000
+
+    def __init__(self, file, kind_of):
+        self._file    = file
+        self._kind_of = kind_of
+        self._labels  = {}
+        self._kinds   = {}
+        self._values  = {}
+        self._generation = 0
+        self._loaded  = False
+        self._lock    = threading.RLock()
+        self._log     = None
+        self._lines   = 0
+        # Lines appended while the log is being compacted.
+        self._pending = None
+        self._compact_lock = threading.Lock()
+        self._compactor    = None
+
+    def is_loaded(self):
+        return self._loaded
+
+    def _load(self):
+        # Labels are only seen as loaded once all of them are, so other
+        # threads wait for them on the lock.
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                with phase('fs'):
+                    if os.path.exists(self._file):
+                        self._read_log()
+                    else:
+                        self._import_legacy()
+            except Exception:
+                # Loading is tried again by the next lookup.
+                self._labels, self._kinds, self._values = {}, {}, {}
+                raise
+            self._loaded = True
+
+    def _read_log(self):
+        with open(self._file, 'rb') as fh:
+            data = fh.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            # The last line was cut short by a crash.
+            with open(self._file, 'r+b') as fh:
+                fh.truncate(end)
+        # Parsed as one array, as parsing each line apart is much slower.
+        entries = json.loads(b'[' + b','.join(data[:end].splitlines()) + b']')
+        for l, v, k in entries:
+            self._set(l, v, k)
+        self._lines = len(entries)
+
+    def _import_legacy(self):
+        legacy = f'{os.path.dirname(self._file)}/{ZeekLabels._LEGACY_FILE}'
+        if not (os.path.exists(legacy) and os.path.getsize(legacy) > 0):
+            return
+        fh = open(legacy, 'r')
+        data = json.load(fh)
+        fh.close()
+        if isinstance(data.get('labels'), dict):
+            for l, (v, k) in data['labels'].items():
+                self._set(l, v, k)
+        else:
+            for l, v in data.items():
+                self._set(l, v, self._kind_of(v))
+        self._compact()
+
+    def _append(self, entries):
+        with phase('fs'):
+            if self._log == None:
+                self._log = open(self._file, 'a', encoding='utf-8')
+            self._log.write(_lines(entries))
+            self._log.flush()
+            os.fsync(self._log.fileno())
+        self._lines += len(entries)
+        if self._pending != None:
+            self._pending += entries
+        elif self._compactor == None and self._lines > max(ZeekLabels._COMPACT_MIN, 2 * len(self._labels)):
+            self._compactor = threading.Thread(target=self._compact_in_background, daemon=True)
+            self._compactor.start()
+
+    def _compact_in_background(self):
+        try:
+            self._compact()
+        except Exception as e:
+            print(f'{e}\nCould not compact {self._file}.')
+        finally:
+            self._compactor = None
+
+    def _compact(self):
+        '''
+        Writes the log again, one line per label. Lines appended meanwhile
+        are copied to the new log before it replaces the old one.
+        '''
+        with self._compact_lock:
+            with self._lock:
+                entries = [[l, v, self._kinds[l]] for l, v in self._labels.items()]
+                self._pending = []
+            dir = os.path.dirname(os.path.abspath(self._file))
+            tmp = None
+            try:
+                fd, tmp = tempfile.mkstemp(dir=dir, prefix='.labels-')
+                with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+                    fh.write(_lines(entries))
+                    with self._lock:
+                        fh.write(_lines(self._pending))
+                        fh.flush()
+                        os.fsync(fh.fileno())
+                        os.replace(tmp, self._file)
+                        if self._log != None:
+                            self._log.close()
+                            self._log = None
+                        self._lines = len(entries) + len(self._pending)
+                        self._pending = None
+                # The new name of the log is only durable once its directory is.
+                dir_fd = os.open(dir, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+            finally:
+                with self._lock:
+                    self._pending = None
+                if tmp != None and os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def save(self):
+        '''
+        Labels are saved as they are set. The log is compacted, if any of
+        its lines are overridden.
+        '''
+        self._load()
+        compactor = self._compactor
+        if compactor != None:
+            compactor.join()
+        if self._lines > len(self._labels):
+            self._compact()
+
+    def close(self):
+        compactor = self._compactor
+        if compactor != None:
+            compactor.join()
+        with self._lock:
+            if self._log != None:
+                self._log.close()
+                self._log = None
+
+    def empty(self):
+        self._load()
+        with self._lock:
+            return self._labels == {}
+
+    # Copies are returned, as labels may be set by other threads, as
+    # background jobs or other clients of zeekd, while they are read.
+
+    def get_labels(self):
+        self._load()
+        with self._lock:
+            return list(self._labels.keys())
+
+    def get_values(self):
+        self._load()
+        with self._lock:
+            return list(self._labels.values())
+
+    def get_items(self):
+        self._load()
+        with self._lock:
+            return list(self._labels.items())
+
+    def get_value(self, l):
+        self._load()
+        with self._lock:
+            return self._labels[l]
+
+    def get_kind(self, l):
+        self._load()
+        with self._lock:
+            return self._kinds[l]
+
+    def _set(self, l, v, kind):
+        if l in self._labels:
+            self._unset_value(l)
+        self._labels[l] = v
+        self._kinds[l]  = kind
+        self._values.setdefault(v, {})[l] = None
+
+    def set_label(self, l, v, kind=None):
+        self._load()
+        with self._lock:
+            kind = kind if kind != None else self._kind_of(v)
+            self._set(l, v, kind)
+            self._append([[l, v, kind]])
+            self._generation += 1
+
+    def set_labels(self, items, kind=None):
+        '''
+        Sets all the labels in `items`, pairs `(label, value)`, at once.
+        They are synced to disk together.
+        '''
+        self._load()
+        with self._lock:
+            entries = []
+            for l, v in items:
+                k = kind if kind != None else self._kind_of(v)
+                self._set(l, v, k)
+                entries.append([l, v, k])
+            if entries != []:
+                self._append(entries)
+            self._generation += 1
+
+    def get_generation(self):
+        '''
+        Returns a number that changes whenever a label is set.
+        '''
+        self._load()
+        return self._generation
+
+    def _unset_value(self, l):
+        labels = self._values[self._labels[l]]
+        del labels[l]
+        if labels == {}:
+            del self._values[self._labels[l]]
+
+    def find_label(self, v):
+        self._load()
+        with self._lock:
+            labels = self._values.get(v)
+            return next(iter(labels)) if labels != None else None
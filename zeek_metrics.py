@@ -0,0 +1,256 @@
+try:
+    import os
+    import json
+    import math
+    import time
+    import threading
+    import tempfile
+    from contextlib import contextmanager
+    from zeek_trace import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, json, math, time, threading, tempfile, contextlib or zeek_trace is missing.')
+    exit(1)
+
+# Phases of a command, besides `total`. Time in none of them is `other`.
+PHASES = ('spawn', 'lurk', 'parse', 'fs')
+
+_local = threading.local()
+
+class _Timer:
+    '''
+    Seconds spent in each phase by one command, possibly in several
+    threads.
+    '''
+    def __init__(self):
+        self._phases = {}
+        self._lock   = threading.Lock()
+
+    def add(self, name, secs):
+        with self._lock:
+            self._phases[name] = self._phases.get(name, 0) + secs
+
+    def get_phases(self):
+        with self._lock:
+            return dict(self._phases)
+
+@contextmanager
+def phase(name, **attrs):
+    '''
+    Times the block as phase `name` of the command running in this
+    thread, if any. Time in nested phases only counts for them. The
+    block is also traced, with attributes `attrs` and those it adds to
+    the dictionary it is given.
+    '''
+    with span(name, 'phase', **attrs) as attrs:
+        timer = getattr(_local, 'timer', None)
+        if timer == None:
+            yield attrs
+            return
+        frame = [time.perf_counter(), 0]
+        _local.stack.append(frame)
+        try:
+            yield attrs
+        finally:
+            _local.stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            timer.add(name, elapsed - frame[1])
+            if _local.stack != []:
+                _local.stack[-1][1] += elapsed
+
+@contextmanager
+def _bind(timer):
+    saved = getattr(_local, 'timer', None), getattr(_local, 'stack', None)
+    _local.timer, _local.stack = timer, []
+    try:
+        yield
+    finally:
+        _local.timer, _local.stack = saved
+
+def bound(fn):
+    '''
+    Returns `fn` timed as part of the command running in this thread,
+    for `fn` to be run in another thread.
+    '''
+    timer = getattr(_local, 'timer', None)
+    def _bound(*args):
+        with _bind(timer):
+            return fn(*args)
+    return _bound
+
+def _rc(result):
+    return result[0] if isinstance(result, tuple) and len(result) > 0 else None
+
+class Histogram:
+    '''
+    Counts observations in buckets growing by a factor of 10^(1/4), from
+    0.1 ms to about 3 hours. Quantiles are interpolated in their bucket.
+    '''
+    BOUNDS = [10 ** (e / 4) for e in range(-16, 17)]
+
+    def __init__(self):
+        self.counts = [0] * (len(Histogram.BOUNDS) + 1)
+        self.sum    = 0.0
+        self.count  = 0
+
+    def observe(self, value):
+        i = 0
+        while i < len(Histogram.BOUNDS) and value > Histogram.BOUNDS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum       += value
+        self.count     += 1
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n > 0 and seen + n >= rank:
+                if i == len(Histogram.BOUNDS):
+                    return Histogram.BOUNDS[-1]
+                lo = Histogram.BOUNDS[i - 1] if i > 0 else 0
+                hi = Histogram.BOUNDS[i]
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return Histogram.BOUNDS[-1]
+
+    def to_json(self):
+        return {'count': self.count, 'sum': self.sum, 'p50': self.quantile(0.5),
+                'p95': self.quantile(0.95), 'p99': self.quantile(0.99)}
+
+class ZeekMetrics:
+    '''
+    Latency histograms of each command, overall and by phase, and counts
+    of commands and failures. A command fails if it returns `(rc, out)`
+    with `rc != 0`, or raises.
+    '''
+    def __init__(self):
+        self._commands = {}
+        self._lock     = threading.Lock()
+        self._export   = None
+        self._stop     = threading.Event()
+
+    def instrument(self, obj, prefix):
+        '''
+        Times the methods of `obj` named `<prefix><command>` as `<command>`.
+        '''
+        for name in dir(type(obj)):
+            if name.startswith(prefix):
+                setattr(obj, name, self.timed(name[len(prefix):].replace('_', ' '), getattr(obj, name)))
+
+    def timed(self, command, fn):
+        '''
+        Returns `fn` recording its latency as `command`. Commands run by
+        another command are part of it.
+        '''
+        def _timed(*args, **kwargs):
+            with span(command, 'command', args=args) as attrs:
+                if getattr(_local, 'timer', None) != None:
+                    result = fn(*args, **kwargs)
+                    attrs['rc'] = _rc(result)
+                    return result
+                timer  = _Timer()
+                failed = True
+                start  = time.perf_counter()
+                try:
+                    with _bind(timer):
+                        result = fn(*args, **kwargs)
+                    attrs['rc'] = _rc(result)
+                    failed = attrs['rc'] not in (None, 0)
+                    return result
+                finally:
+                    self.record(command, time.perf_counter() - start, timer.get_phases(), failed)
+        return _timed
+
+    def record(self, command, total, phases, failed):
+        with self._lock:
+            c = self._commands.get(command)
+            if c == None:
+                c = self._commands[command] = {'count': 0, 'failures': 0,
+                                               'phases': {p: Histogram() for p in ('total',) + PHASES + ('other',)}}
+            c['count']    += 1
+            c['failures'] += failed
+            c['phases']['total'].observe(total)
+            for p in PHASES:
+                c['phases'][p].observe(phases.get(p, 0))
+            # Phases in parallel threads may add up to more than the total.
+            c['phases']['other'].observe(max(0, total - sum(phases.values())))
+
+    def snapshot(self):
+        with self._lock:
+            return {command: {'count': c['count'], 'failures': c['failures'],
+                              'phases': {p: h.to_json() for p, h in c['phases'].items()}}
+                    for command, c in sorted(self._commands.items())}
+
+    def to_prometheus(self, caches):
+        '''
+        Returns the metrics in Prometheus' text format. `caches` maps each
+        cache to its hits, misses and entries.
+        '''
+        lines = ['# HELP zeek_command_seconds Latency of Zeek commands, by phase.',
+                 '# TYPE zeek_command_seconds histogram']
+        counts, failures = [], []
+        with self._lock:
+            for command, c in sorted(self._commands.items()):
+                for p, h in c['phases'].items():
+                    labels = f'command="{command}",phase="{p}"'
+                    cumulative = 0
+                    for bound, n in zip(Histogram.BOUNDS + [math.inf], h.counts):
+                        cumulative += n
+                        le = '+Inf' if bound == math.inf else f'{bound:.6g}'
+                        lines.append(f'zeek_command_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                    lines.append(f'zeek_command_seconds_sum{{{labels}}} {h.sum}')
+                    lines.append(f'zeek_command_seconds_count{{{labels}}} {h.count}')
+                counts.append(f'zeek_commands_total{{command="{command}"}} {c["count"]}')
+                failures.append(f'zeek_command_failures_total{{command="{command}"}} {c["failures"]}')
+        lines += ['# HELP zeek_commands_total Zeek commands run.', '# TYPE zeek_commands_total counter'] + counts
+        lines += ['# HELP zeek_command_failures_total Zeek commands that failed.',
+                  '# TYPE zeek_command_failures_total counter'] + failures
+        for metric, i, kind in (('hits_total', 0, 'counter'), ('misses_total', 1, 'counter'), ('entries', 2, 'gauge')):
+            lines.append(f'# TYPE zeek_cache_{metric} {kind}')
+            lines += [f'zeek_cache_{metric}{{cache="{cache}"}} {stats[i]}' for cache, stats in sorted(caches.items())]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, file, caches):
+        '''
+        Writes the metrics to `file`, as JSON if it ends in `.json` and in
+        Prometheus' text format otherwise. The file is replaced at once,
+        so readers never see it half written.
+        '''
+        if file.endswith('.json'):
+            text = json.dumps({'commands': self.snapshot(),
+                               'caches': {k: dict(zip(('hits', 'misses', 'entries'), v)) for k, v in caches.items()}},
+                              indent=1)
+        else:
+            text = self.to_prometheus(caches)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file)), prefix='.zeek-metrics-')
+        with os.fdopen(fd, 'w') as fh:
+            fh.write(text)
+        os.replace(tmp, file)
+
+    def start_export(self, file, interval, get_caches):
+        '''
+        Writes the metrics to `file` every `interval` seconds, and once
+        more on `close`.
+        '''
+        def _export():
+            while not self._stop.wait(interval):
+                self._write_quietly(file, get_caches)
+        self._export = file, get_caches, threading.Thread(target=_export, daemon=True)
+        self._export[2].start()
+
+    def _write_quietly(self, file, get_caches):
+        try:
+            self.write(file, get_caches())
+        except Exception as e:
+            print(f'{e}\nCould not write metrics to {file}.')
+
+    def close(self):
+        self._stop.set()
+        if self._export != None:
+            file, get_caches, thread = self._export
+            thread.join()
+            self._write_quietly(file, get_caches)
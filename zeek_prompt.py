@@ -1,143 +1,102 @@
 try:
     import os
     import json
-    import prompt_toolkit as pt
-    from prompt_toolkit.completion import NestedCompleter
+    import time
+    import threading
+    import fnmatch
+    from concurrent.futures import ThreadPoolExecutor, as_completed
     from lurk_wrapper import *
+    from lurk_session import *
     from zeek_env import *
+    from zeek_cache import *
+    from zeek_deadlines import *
+    from zeek_labels import *
+    from zeek_bulk import *
+    from zeek_metrics import *
+    from zeek_record import *
+    from zeek_protocol import *
+    from zeek_simulate import *
 except Exception as e:
     print(e)
     print('Check your Python 3 installation.')
-    print('Either os, json, prompt_toolkit, lurk_wrapper or zeek_env is missing.')
+    print('Either os, json, time, threading, fnmatch, concurrent, lurk_wrapper, lurk_session, zeek_env, zeek_cache, zeek_deadlines, zeek_labels, zeek_bulk, zeek_metrics, zeek_record, zeek_protocol or zeek_simulate is missing.')
     exit(1) 
 
 class ZeekPrompt:
-    def __init__(self, path):
+    def __init__(self, path, backend='lurk'):
         self._zeek_env = ZeekEnv(path)
-        self.session = pt.PromptSession(history=pt.history.FileHistory(self._zeek_env.get_hist()))
-        labels_file_name = f'{path}/labels.json' 
-        if os.path.exists(labels_file_name) and \
-           os.path.getsize(labels_file_name) > 0:
-            fh = open(labels_file_name, 'r')
-            self._labels = json.load(fh)
-            fh.close()
+        self._sessions = LurkSessionManager(backend=backend)
+        self._call_cache = CallCache(path, self._zeek_env.get_config('call_cache_size', 10_000))
+        self._verify_cache = VerifyCache(path, self._zeek_env.get_config('verify_cache_size', 10_000))
+        self._claim_cache = ClaimCache(path, self._zeek_env.get_config('verify_cache_size', 10_000))
+        self._deadlines = ZeekDeadlines(self._zeek_env)
+        self._labels = ZeekLabels(f'{path}/labels.log', self._kind_of)
+        self._metrics = ZeekMetrics()
+        self._metrics.instrument(self, 'handle_')
+        self._recorder = ZeekRecorder(self.get_party)
+        self._recorder.instrument(self, [n for n in dir(self) if n.startswith('handle_') and n not in ('handle_help', 'handle_replay', 'handle_run_protocol', 'handle_simulate')] + ['set_label', 'set_labels'])
+        metrics_file = self._zeek_env.get_config('metrics_file', None)
+        if metrics_file != None:
+            self._metrics.start_export(metrics_file, self._zeek_env.get_config('metrics_interval', 60), self.get_cache_stats)
+
+    def _kind_of(self, value):
+        if ZeekEnv.is_proof(value):
+            return ZeekLabels.PROOF
+        elif self._zeek_env.is_party(value):
+            return ZeekLabels.PARTY
         else:
-            self._labels = {}
+            return ZeekLabels.COMMIT
 
     def save_labels(self):
-        if self._labels != {}:
-            labels_file_name = f'{self._zeek_env.get_path()}/labels.json'
-            fh = open(labels_file_name, 'w')
-            json.dump(self._labels, fh, indent=4)  
-            fh.close()              
+        # Labels never loaded were not changed.
+        if self._labels.is_loaded():
+            self._labels.save()
 
     def good_bye(self):
         print('\nBye')
-        self.save_labels()
+        self.close()
 
-    def _right_prompt(self, party):
-        if party != None and ZeekEnv.is_hash(party):
-            if not self.empty_labels():
-                k = [l for l, v in self._labels.items() if v == party]
-                return f'<ansiyellow>{k[0]}</ansiyellow>:<ansigreen>{party[:4]}...{party[len(party) - 4:]}</ansigreen>'
-            else:
-                return f'<ansigreen>{party[:4]}...{party[len(party) - 4:]}</ansigreen>'
-        elif party == 'public':
-            return '<ansiyellow>public</ansiyellow>'
-        else:
-            return ''
-
-    def prompt(self):
-        style = pt.styles.Style.from_dict({
-            # User input (default text).
-            # '':              '#ff0066',
-            # Prompt.
-            'tool':          'ansigreen',
-            'prompt_symbol': 'ansiyellow'
-        })
-
-        message = [
-            ('class:tool',          'zeek '),
-            ('class:prompt_symbol', '❯ '),
-        ]
-
-        '''
-        A `NestedCompleter` is component of the `prompt_toolkit. An instance is a dictionary with the elements that should appear 
-        when certain commands are typed in the REPL.
-        - In the case of `call`, the secrets of the current party should appear twice. The second set of secrets
-        is a nested dictionary which is a value for each secret in the first completion.
-        - For `party`, the avaiable parties should be listed.
-        - Command `prove` is completed with two secrets as in a `call`.
-        - Command `send` can be completed as `secret` or `proof`. For the `secret` case, the secrets for the current party are 
-        shown first and the parties next, after the `to` syntax. For the `proof` case, similarly to the `secret` case, the proofs 
-        of the current party are shown, then the `to` syntax and then a list of the available parties.
-        '''
-        def _make_completer_dictionary(env, outter_list, inner_dict):
-            d = {str(env.find_label_for_value(v)) 
-                        if env.find_label_for_value(v) != None else v : inner_dict
-                        for v in outter_list}
-            sorted_keys = sorted(d, key=lambda x: (str(x)[0][0].isnumeric(), str(x)))
-            d = {k : d[k] for k in sorted_keys}
-            return d
-        
-        commits = self._zeek_env.get_commits_from_party()
-        proofs  = self._zeek_env.get_proofs_from_party()
-        parties = [p for p in self._zeek_env.get_parties() if p != self.get_party()]
-        path  = './data'
-        files = [f'{path}/{f}' for f in os.listdir(path) if os.path.isfile(f'{path}/{f}')]
-        completer = NestedCompleter.from_nested_dict({
-            'call'  : _make_completer_dictionary(self, commits, _make_completer_dictionary(self, commits, None)), 
-            'check' : {'call' : _make_completer_dictionary(self, self.get_labels(), 
-                                 _make_completer_dictionary(self, self.get_labels(), 
-                                    {'returns' : {'t'   : {'in' : _make_completer_dictionary(self, proofs, None)},
-                                                  'nil' : {'in' : _make_completer_dictionary(self, proofs, None)}}}))},
-            'secrets'   : None,
-            'exit'  : None,
-            'hash'  : {'hide': None,
-                       'new party': None,
-                       'prove': _make_completer_dictionary(self, commits, _make_completer_dictionary(self, commits, None))},
-            'help'  : None,
-            'hide'  : None,
-            'labels': None,
-            'new party': None,
-            'parties': None,
-            'party' : _make_completer_dictionary(self, parties, None),
-            'prove' : _make_completer_dictionary(self, commits, _make_completer_dictionary(self, commits, {'as': None})), 
-            'reveal': _make_completer_dictionary(self, commits, None),
-            'save labels': None,
-            'send'  : {'secret': _make_completer_dictionary(self, commits, {'to' : _make_completer_dictionary(self, parties, None)}), 
-                       'proof':  _make_completer_dictionary(self, proofs,  {'to' : _make_completer_dictionary(self, parties, None)})},
-            'verify': _make_completer_dictionary(self, proofs, None),
-            'with' : _make_completer_dictionary(self, files, { 'hide': {'table': {'as': None},
-                                                                        'function': None}})
-        })
-
-        return self.session.prompt(message, style=style, completer=completer, rprompt=pt.HTML(self._right_prompt(self._zeek_env.get_party())))
+    def close(self):
+        self._recorder.stop()
+        self._metrics.close()
+        self.save_labels()
+        self._labels.close()
+        self._sessions.close_all()
+        self._call_cache.close()
+        self._verify_cache.close()
+        self._claim_cache.close()
+        self._deadlines.close()
 
     def empty_labels(self):
-        return self._labels == {}
+        return self._labels.empty()
     
     def get_labels(self):
-        return self._labels.keys()
+        return self._labels.get_labels()
     
     def get_values(self):
-        return self._labels.values()
+        return self._labels.get_values()
 
     def get_items(self):
-        return self._labels.items()
+        return self._labels.get_items()
     
     def get_value(self, l):
-        assert(self._labels != {} and l in self._labels.keys())
-        return self._labels[l]
+        assert(not self._labels.empty() and l in self._labels.get_labels())
+        return self._labels.get_value(l)
 
-    def set_label(self, l, v):
-        self._labels[l] = v 
+    def get_kind(self, l):
+        return self._labels.get_kind(l)
+
+    def set_label(self, l, v, kind=None):
+        self._labels.set_label(l, v, kind)
+
+    def set_labels(self, items, kind=None):
+        self._labels.set_labels(items, kind)
+
+    def get_labels_generation(self):
+        return self._labels.get_generation()
 
     def find_label_for_value(self, value):
-        key_list = [k for k in self._labels if self._labels[k] == value]
-        if key_list != []:
-            return key_list[0]
-        return None
+        return self._labels.find_label(value)
 
     def is_public(self):
         return self._zeek_env.get_party() == 'public'
@@ -145,6 +104,75 @@ class ZeekPrompt:
     def get_party(self):
         return self._zeek_env.get_party()
 
+    def bind_party(self, party):
+        self._zeek_env.bind_party(party)
+
+    def get_cache_stats(self):
+        return {'call': self._call_cache.get_stats(), 
+                'verify': self._verify_cache.get_stats(), 
+                'claim': self._claim_cache.get_stats()}
+
+    def get_backend(self):
+        return self._sessions.get_backend()
+
+    def set_backend(self, backend):
+        '''
+        Runs the following commands in `backend`, closing the sessions of
+        the previous one.
+        '''
+        if backend not in LurkSessionManager.BACKENDS:
+            return 1, f'Unknown backend {backend}. Backends are {", ".join(LurkSessionManager.BACKENDS)}.'
+        self._sessions.close_all()
+        self._sessions = LurkSessionManager(backend=backend)
+        return 0, f'Backend is now {backend}.'
+
+    def _is_sim(self):
+        return self.get_backend() == 'sim'
+
+    def _lurk_deadlines(self):
+        # Durations in the sim say nothing about Lurk's, so they are not learned.
+        return None if self._is_sim() else self._deadlines
+
+    def get_stats(self):
+        '''
+        Returns the latency of each command, overall and by phase, as in
+        `ZeekMetrics.snapshot`, and the hits, misses and entries of each
+        cache.
+        '''
+        return {'commands': self._metrics.snapshot(), 'caches': self.get_cache_stats()}
+
+    def _lurk_wrapper(self):
+        '''
+        Returns a `LurkWrapper` for the current party that runs its commands
+        in the party's long-lived Lurk session.
+        '''
+        cd, pd = self._zeek_env.get_current_party_dirs()
+        return LurkWrapper(self._zeek_env.get_timeout(), cd, pd, self._sessions.get(cd, pd), self._lurk_deadlines())
+
+    def new_lurk_wrapper(self):
+        '''
+        Returns a `LurkWrapper` for the current party that runs each command
+        in its own `lurk` process, so that it can be cancelled without
+        tearing down the party's session. The sim has no process, so it
+        runs them in a session of its own, which can not be cancelled.
+        '''
+        cd, pd = self._zeek_env.get_current_party_dirs()
+        if self._is_sim():
+            return LurkWrapper(self._zeek_env.get_timeout(), cd, pd, self._sessions.new_session(cd, pd))
+        return LurkWrapper(self._zeek_env.get_timeout(), cd, pd, deadlines=self._deadlines)
+
+    def _note_commit(self, hide):
+        '''
+        Runs `hide`, which has Lurk write a commit for the current party,
+        and records the resulting hash in the party's index.
+        '''
+        party = self.get_party()
+        mtime_before = self._zeek_env.get_secret_mtime(party, 'commits')
+        rc, out = hide()
+        if rc == 0:
+            self._zeek_env.note_secret(party, 'commits', out, mtime_before)
+        return rc, out
+
     def handle_call(self, test, value):
         '''
         A call executes the application of test to value.
@@ -159,31 +187,103 @@ class ZeekPrompt:
             return 1, f'Secret {test} was not hiden nor sent to {self._zeek_env.get_party()}.' 
         if not self._zeek_env.is_commited_by_current_party(value):
             return 1, f'Secret {value} was not hiden nor sent to {self._zeek_env.get_party()}.'             
+        out = self._call_cache.get_call(self._zeek_env, self.get_party(), test, value)
+        if out != None:
+            return 0, out
         try:
-            cd, pd = self._zeek_env.get_current_party_dirs()
-            lurkw = LurkWrapper(self._zeek_env.get_timeout(), cd, pd)
-            return lurkw.call('0x'+test, '0x'+value)
+            lurkw = self._lurk_wrapper()
+            rc, out = lurkw.call('0x'+test, '0x'+value)
+            if rc == 0:
+                self._call_cache.put_call(test, value, out)
+            return rc, out
         except Exception as e:
             return 1, f'{e}\nUnexpected error while executing Call.'
         
     def handle_load_and_hide(self, file, fun):
         if not self.is_public():
             try:
-                cd, pd = self._zeek_env.get_current_party_dirs()
-                lurkw = LurkWrapper(self._zeek_env.get_timeout(), cd, pd)
-                return lurkw.load_and_hide(file, fun)
+                lurkw = self._lurk_wrapper()
+                return self._note_commit(lambda: lurkw.load_and_hide(file, fun))
             except Exception as e:
                 return 1, f'{e}\nUnexpected error while executing load.'
         else:
             return 1, 'Only non-public parties may load values.'
 
+    def handle_hide_table(self, file):
+        if not self.is_public():
+            if not os.path.isfile(file):
+                return 1, f'File {file} does not exist.'
+            try:
+                lurkw = self._lurk_wrapper()
+                return self._note_commit(lambda: lurkw.hide_table(file))
+            except Exception as e:
+                return 1, f'{e}\nUnexpected error while executing hide.'
+        else:
+            return 1, 'Only non-public parties may hide values.'
+
+    def handle_bulk_hide(self, file, label_column=None):
+        '''
+        Hides each row of `file`, a CSV or JSON Lines file, for the current
+        party. Rows are labeled by their `label_column` or, if it is not
+        given, as `<file name>-<row>`. They are sent to the party's Lurk
+        session in chunks of `bulk_chunk_size` rows and their labels are
+        set and saved at once, at the end. A row that can not be hidden is
+        reported and skipped. Returns the number of rows, the failures,
+        as pairs `(row, error)`, and the elapsed time.
+        '''
+        start    = time.monotonic()
+        chunk    = self._zeek_env.get_config('bulk_chunk_size', 500)
+        prefix   = os.path.splitext(os.path.basename(file))[0]
+        party    = self.get_party()
+        labels   = set(self.get_labels())
+        lurkw    = self._lurk_wrapper()
+        rows     = 0
+        failures = []
+        hidden   = []
+        pending  = []
+        def _hide(pending):
+            mtime_before = self._zeek_env.get_secret_mtime(party, 'commits')
+            try:
+                results = lurkw.hide_many([v for _, _, v in pending])
+            except LurkWrapperCommException as e:
+                results = [(1, f'{e}')] * len(pending)
+            for (n, label, _), (rc, out) in zip(pending, results):
+                if rc == 0:
+                    self._zeek_env.note_secret(party, 'commits', out, mtime_before)
+                    hidden.append((label, out))
+                else:
+                    failures.append((n, out))
+        for n, row, error in read_rows(file):
+            rows += 1
+            if error == None:
+                label = f'{prefix}-{n}' if label_column == None else row.get(label_column)
+                if label == None or f'{label}'.split() != [f'{label}']:
+                    error = f'Column {label_column} is missing or is not a label.'
+                elif f'{label}' in labels:
+                    error = f'Label {label} exists.'
+            if error == None:
+                try:
+                    pending.append((n, f'{label}', to_lurk(row)))
+                    labels.add(f'{label}')
+                except ZeekBulkException as e:
+                    error = f'{e}'
+            if error != None:
+                failures.append((n, error))
+            if len(pending) == chunk:
+                _hide(pending)
+                pending = []
+        if pending != []:
+            _hide(pending)
+        self.set_labels(hidden, ZeekLabels.COMMIT)
+        failures.sort()
+        return rows, failures, time.monotonic() - start
+
     def handle_hide(self, value):
         assert(type(value) == list)
         if not self.is_public():
             try:
-                cd, pd = self._zeek_env.get_current_party_dirs()
-                lurkw = LurkWrapper(self._zeek_env.get_timeout(), cd, pd)
-                return lurkw.hide(value)
+                lurkw = self._lurk_wrapper()
+                return self._note_commit(lambda: lurkw.hide(value))
             except Exception as e:
                 return 1, f'{e}\nUnexpected error while executing hide.'
         else:
@@ -192,8 +292,7 @@ class ZeekPrompt:
     def handle_open(self, value):
         if not self.is_public():
             try:
-                cd, pd = self._zeek_env.get_current_party_dirs()
-                lurkw = LurkWrapper(self._zeek_env.get_timeout(), cd, pd)
+                lurkw = self._lurk_wrapper()
                 return lurkw.open(f'0x{value}')
             except Exception as e:
                 return 1, f'{e}\nUnexpected error while executing open.'
@@ -225,32 +324,222 @@ class ZeekPrompt:
     def handle_new_party(self, value):
         assert(type(value) == list)
         try:
-            cd, pd = self._zeek_env.get_current_party_dirs()
-            lurkw = LurkWrapper(self._zeek_env.get_timeout(), cd, pd)
-            rc, out = lurkw.hide(value)
+            lurkw = self._lurk_wrapper()
+            rc, out = self._note_commit(lambda: lurkw.hide(value))
             if rc == 0:
                 self._zeek_env.add_party(out)            
             return rc, out
         except Exception as e:
             return 1, f'{e}\nUnexpected error while executing New party.'
 
+    def _prove(self, party, lurkw, test, value):
+        try:
+            mtime_before = self._zeek_env.get_secret_mtime(party, 'proofs')
+            rc, out = lurkw.prove('0x'+test, '0x'+value)
+            if rc == 0:
+                self._zeek_env.note_secret(party, 'proofs', out, mtime_before)
+            return rc, out
+        except Exception as e:
+            return 1, f'{e}\nUnexpected error while executing Prove.'
+
     def handle_prove(self, test, value):
         try:
-            cd, pd = self._zeek_env.get_current_party_dirs()
-            lurkw = LurkWrapper(self._zeek_env.get_timeout(), cd, pd)
-            return lurkw.prove('0x'+test, '0x'+value)
+            lurkw = self._lurk_wrapper()
         except Exception as e:
             return 1, f'{e}\nUnexpected error while executing Prove.'
+        return self._prove(self.get_party(), lurkw, test, value)
+
+    def new_prove_job(self, test, value):
+        '''
+        Returns a function proving `call <test> <value>` for the current
+        party, to be run in the background, and a function cancelling it.
+        The former is called with a function reporting Lurk's progress.
+        '''
+        lurkw = self.new_lurk_wrapper()
+        party = self.get_party()
+        def _prove_job(on_progress):
+            lurkw.set_on_progress(on_progress)
+            return self._prove(party, lurkw, test, value)
+        _prove_job = self._recorder.recorded_job('handle_prove', [test, value], _prove_job)
+        return self._metrics.timed('prove job', _prove_job), lurkw.cancel
+
+    def start_recording(self, file):
+        try:
+            self._recorder.start(file, self.get_backend())
+            return 0, f'Recording to {file}.'
+        except Exception as e:
+            return 1, f'{e}\nCould not record to {file}.'
+
+    def stop_recording(self):
+        if not self._recorder.is_recording():
+            return 1, 'Not recording.'
+        return 0, f'Recorded {self._recorder.stop()} commands.'
+
+    def begin_step(self, cmd):
+        self._recorder.begin_step(cmd)
+
+    def end_step(self):
+        self._recorder.end_step()
+
+    def handle_replay(self, file, on_step=None):
+        '''
+        Replays the recording in `file`, as in `zeek_record.replay`. The
+        current party is restored at the end.
+        '''
+        if self._recorder.is_recording():
+            return 1, 'Can not replay while recording.'
+        party = self.get_party()
+        try:
+            return 0, replay(self, file, on_step)
+        except Exception as e:
+            return 1, f'{e}\nCould not replay {file}.'
+        finally:
+            self._zeek_env.set_party(party)
 
-    def handle_verify(self, proof_key):
+    def handle_verify(self, proof_key, on_progress=None):
+        _, pd = self._zeek_env.get_current_party_dirs()
+        # Proof keys are passed quoted, as Lurk expects them.
+        digest = VerifyCache.proof_digest(pd, proof_key.strip('\"'))
+        out = self._verify_cache.get_verification(proof_key.strip('\"'), digest)
+        if out != None:
+            return 0, out
         try:
-            cd, pd = self._zeek_env.get_current_party_dirs()
-            lurkw = LurkWrapper(self._zeek_env.get_timeout(), cd, pd)
-            return lurkw.verify(proof_key)
+            lurkw = self._lurk_wrapper()
+            lurkw.set_on_progress(on_progress)
+            rc, out = lurkw.verify(proof_key)
+            if rc == 0:
+                self._verify_cache.put_verification(proof_key.strip('\"'), digest, out)
+            return rc, out
         except Exception as e:
             print(e)
             return 1, f'Unexpected error while executing Verify.'
 
+    def _match(self, values, pattern):
+        matches = []
+        for v in values:
+            label = self.find_label_for_value(v)
+            if fnmatch.fnmatchcase(v, pattern) or (label != None and fnmatch.fnmatchcase(label, pattern)):
+                matches.append(v)
+        return matches
+
+    def match_proofs(self, pattern):
+        '''
+        Returns the proofs of the current party whose key, or label, matches
+        the glob `pattern`. Pattern `all` matches every proof.
+        '''
+        proofs = self._zeek_env.get_proofs_from_party()
+        if pattern == 'all':
+            return proofs
+        return self._match(proofs, pattern)
+
+    def match_commits(self, pattern):
+        '''
+        Returns the commits of the current party whose hash, or label,
+        matches the glob `pattern`, sorted by label or hash.
+        '''
+        commits = self._match(self._zeek_env.get_commits_from_party(), pattern)
+        return sorted(commits, key=lambda c: (self.find_label_for_value(c) or c, c))
+
+    def _run_batch(self, items, run, on_result):
+        '''
+        Runs `run(lurkw, item)` for each of `items` of the current party
+        with at most `workers` Lurk processes at once. `lurkw()` returns
+        a `LurkWrapper` for the worker running `item`. Each worker keeps
+        its own Lurk session, so the cold start is paid once per worker and
+        not once per item. `on_result(item, rc, out)` is called, in the
+        calling thread, as each item ends.
+        Returns the number of failures and the elapsed time.
+        '''
+        cd, pd   = self._zeek_env.get_current_party_dirs()
+        timeout  = self._zeek_env.get_timeout()
+        local    = threading.local()
+        sessions = []
+        def _lurkw():
+            if not hasattr(local, 'session'):
+                local.session = self._sessions.new_session(cd, pd)
+                sessions.append(local.session)
+            return LurkWrapper(timeout, cd, pd, local.session, self._lurk_deadlines())
+        failures = 0
+        start = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(self._zeek_env.get_workers(), len(items)))) as pool:
+                # Workers' time counts for the command that started them.
+                futures = {pool.submit(bound(run), _lurkw, i): i for i in items}
+                for f in as_completed(futures):
+                    try:
+                        rc, out = f.result()
+                    except Exception as e:
+                        rc, out = 1, f'{e}'
+                    if rc != 0:
+                        failures += 1
+                    on_result(futures[f], rc, out)
+        finally:
+            for s in sessions:
+                s.close()
+        return failures, time.monotonic() - start
+
+    def handle_verify_batch(self, proof_keys, on_result):
+        '''
+        Verifies `proof_keys` of the current party in parallel, as in
+        `_run_batch`.
+        '''
+        _, pd = self._zeek_env.get_current_party_dirs()
+        def _verify(lurkw, proof_key):
+            digest = VerifyCache.proof_digest(pd, proof_key)
+            out = self._verify_cache.get_verification(proof_key, digest)
+            if out != None:
+                return 0, out
+            rc, out = lurkw().verify(f'\"{proof_key}\"')
+            if rc == 0:
+                self._verify_cache.put_verification(proof_key, digest, out)
+            return rc, out
+        return self._run_batch(proof_keys, _verify, on_result)
+
+    def handle_prove_batch(self, test, values, prefix, on_result):
+        '''
+        Proves `call <test> <value>` for each of `values` of the current
+        party in parallel, as in `_run_batch`. Lurk loads the proving
+        parameters once per worker session, not once per proof. The proof
+        of the `n`th value is labeled `<prefix>-<n>`, counting from 1.
+        `on_result(n, value, rc, out)` is called as each proof ends.
+        '''
+        party  = self.get_party()
+        labels = set(self.get_labels())
+        def _prove(lurkw, item):
+            n, value = item
+            if f'{prefix}-{n}' in labels:
+                return 1, f'Label {prefix}-{n} exists.'
+            return self._prove(party, lurkw(), test, value)
+        def _on_result(item, rc, out):
+            n, value = item
+            if rc == 0:
+                self.set_label(f'{prefix}-{n}', out, ZeekLabels.PROOF)
+            on_result(n, value, rc, out)
+        return self._run_batch(list(enumerate(values, 1)), _prove, _on_result)
+
+    def handle_run_protocol(self, file, on_step=None):
+        '''
+        Runs the protocol in `file`, as in `zeek_protocol.ZeekProtocol`.
+        Its steps run in threads of their own, with their parties bound to
+        them, so the current party is left as it is.
+        '''
+        try:
+            report = run_protocol(self, file, on_step)
+        except (OSError, ValueError, ZeekProtocolException) as e:
+            return 1, f'{e}\nCould not run protocol {file}.'
+        return 0, report
+
+    def handle_simulate(self, provers, concurrency=None, on_progress=None):
+        '''
+        Simulates `provers` applicants proving their credit score to a
+        bank, as in `zeek_simulate.simulate`, running up to `concurrency`
+        steps at once, `workers` by default.
+        '''
+        if provers < 1:
+            return 1, 'There should be at least one prover.'
+        concurrency = concurrency if concurrency != None else self._zeek_env.get_workers()
+        return 0, simulate(self, provers, max(1, concurrency), on_progress)
+
     def handle_help(self, cmd):
         fh = open(f'{os.getcwd()}/help_msgs.json')
         hm = json.load(fh)
@@ -264,16 +553,38 @@ class ZeekPrompt:
                 print(hm[c_str]) if c_str in hm.keys() else print(f'Command {c_str} unknown.')
 
     def handle_inspect(self, proof_key, test, value, output):
+        '''
+        Proofs are inspected by Lurk the first time they are checked, and
+        the claim it returns is cached. On the sim backend, claims are read
+        from the proofs' `.meta` files instead.
+        '''
+        _, pd = self._zeek_env.get_current_party_dirs()
+        if self._is_sim():
+            with phase('parse'):
+                claim = LurkProofClaim.from_sim_meta(f'{pd}/{proof_key}.meta')
+            if claim != None:
+                return 0, claim.matches(test, value, output)
+        digest = VerifyCache.proof_digest(pd, proof_key)
+        claim = self._claim_cache.get_claim(proof_key, digest)
+        if claim != None:
+            return 0, claim.matches(test, value, output)
         try:
-            cd, pd = self._zeek_env.get_current_party_dirs()
-            lurkw = LurkWrapper(self._zeek_env.get_timeout(), cd, pd)
-            return lurkw.inspect(f'\"{proof_key}\"', f'0x{test}', f'0x{value}', output)       
+            lurkw = self._lurk_wrapper()
+            rc, claim = lurkw.get_claim(f'\"{proof_key}\"')
+            if rc != 0:
+                return rc, claim
+            self._claim_cache.put_claim(proof_key, digest, claim)
+            return 0, claim.matches(test, value, output)
         except Exception as e:
             return 1, f'{e}\nUnexpected error while executing Inspect.'
 
     def handle_env(self):
         return self._zeek_env.get_commits_from_party(), self._zeek_env.get_proofs_from_party()
                 
+    def handle_migrate_objects(self):
+        files, freed = self._zeek_env.migrate_objects()
+        return 0, f'{files} files linked to the object store, {freed} bytes freed.'
+
     def handle_send_commit(self, target_party, hash):
         if not self.is_public():
             if self._zeek_env.is_commited_by_current_party(hash): 
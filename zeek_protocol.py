@@ -0,0 +1,328 @@
+try:
+    import os
+    import json
+    import time
+    import heapq
+    import threading
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    from zeek_env import *
+    from zeek_metrics import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, json, time, heapq, threading, concurrent, zeek_env or zeek_metrics is missing.')
+    exit(1)
+
+# PyYAML is only needed for protocols written in YAML.
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+class ZeekProtocolException(Exception):
+    pass
+
+# The operation a step may run, with the fields of the step that are its
+# arguments. Arguments in `_REFS` are hashes, given by the id of the step
+# that returns them, a label or the hash itself.
+_OPS = {'new party':     ('new party',),
+        'hide':          ('hide',),
+        'hide table':    ('hide table',),
+        'hide function': ('hide function', 'function'),
+        'call':          ('call', 'with'),
+        'prove':         ('prove', 'with'),
+        'send':          ('send', 'to'),
+        'reveal':        ('reveal',),
+        'verify':        ('verify',),
+        'check':         ('check', 'with', 'returns', 'in')}
+_REFS = {'call', 'with', 'prove', 'send', 'to', 'reveal', 'verify', 'check', 'returns', 'in'}
+_KEYS = {'id', 'party', 'after', 'as'} | {f for fields in _OPS.values() for f in fields}
+
+class ZeekStep:
+    '''
+    A step of a protocol: operation `op`, run by `party` on `args`, after
+    the steps in `deps`.
+    '''
+    def __init__(self, id, party, op, args, deps, label):
+        self.id    = id
+        self.party = party
+        self.op    = op
+        self.args  = args
+        self.deps  = deps
+        self.label = label
+
+def _read(file):
+    with open(file) as fh:
+        if os.path.splitext(file)[1] in ('.yaml', '.yml'):
+            if yaml == None:
+                raise ZeekProtocolException(f'PyYAML is needed to read {file}. Install it or write the protocol in JSON.')
+            return yaml.safe_load(fh)
+        return json.load(fh)
+
+def _is_ref(zp, arg):
+    return ZeekEnv.is_hash(arg) or ZeekEnv.is_proof(arg) or arg == 'public' or arg in zp.get_labels()
+
+def _step(zp, n, spec, ids, dir):
+    if not isinstance(spec, dict):
+        raise ZeekProtocolException(f'Step {n} is not an object.')
+    unknown = set(spec.keys()) - _KEYS
+    if unknown != set():
+        raise ZeekProtocolException(f'Step {n} has unknown fields {", ".join(sorted(unknown))}.')
+    ops = [op for op in _OPS if op in spec]
+    if len(ops) != 1:
+        raise ZeekProtocolException(f'Step {n} should have one of {", ".join(_OPS)}.')
+    op = ops[0]
+    id = f'{spec.get("id", f"step-{n}")}'
+    missing = [f for f in _OPS[op] if f not in spec]
+    if missing != []:
+        raise ZeekProtocolException(f'Step {id} ({op}) is missing {", ".join(missing)}.')
+    args = [f'{spec[f]}' for f in _OPS[op]]
+    if op in ('hide table', 'hide function'):
+        # Files are read relative to the protocol.
+        args[0] = os.path.join(dir, args[0])
+    party = f'{spec.get("party", "public")}'
+    if op == 'new party' and party != 'public':
+        raise ZeekProtocolException(f'Step {id}: only public can create a party.')
+    after = spec.get('after', [])
+    after = after if isinstance(after, list) else [after]
+    deps  = []
+    for f, a in [('party', party)] + [(f, a) for f, a in zip(_OPS[op], args) if f in _REFS] + [('after', f'{a}') for a in after]:
+        if a in ids:
+            deps.append(a)
+        elif f == 'after' or not (_is_ref(zp, a) or (op, f) == ('check', 'returns')):
+            raise ZeekProtocolException(f'Step {id}: {a} is neither a step, a label nor a hash.')
+    label = f'{spec["as"]}' if spec.get('as') != None else None
+    return ZeekStep(id, party, op, args, deps, label)
+
+def load_protocol(zp, file):
+    '''
+    Reads the protocol in `file`, a JSON file or, if PyYAML is installed,
+    a YAML one, as in `ZeekProtocol`. Returns its steps, in an order in
+    which each step comes after the ones it depends on.
+    '''
+    protocol = _read(file)
+    specs = protocol.get('steps') if isinstance(protocol, dict) else None
+    if not isinstance(specs, list) or specs == []:
+        raise ZeekProtocolException(f'{file} has no steps.')
+    ids = {}
+    for n, spec in enumerate(specs, 1):
+        id = f'{spec.get("id", f"step-{n}")}' if isinstance(spec, dict) else None
+        if id in ids:
+            raise ZeekProtocolException(f'Step {id} is defined twice.')
+        ids[id] = n
+    dir   = os.path.dirname(os.path.abspath(file))
+    steps = {s.id: s for s in (_step(zp, n, spec, ids, dir) for n, spec in enumerate(specs, 1))}
+    # Labels are checked before any step runs, so that a protocol does
+    # not overwrite them.
+    labels = {}
+    for step in steps.values():
+        if step.label == None:
+            continue
+        if step.label in labels:
+            raise ZeekProtocolException(f'Steps {labels[step.label]} and {step.id} have the same label {step.label}.')
+        if step.label in zp.get_labels():
+            raise ZeekProtocolException(f'Step {step.id}: label {step.label} exists.')
+        labels[step.label] = step.id
+    order, done = [], set()
+    def _visit(step, path):
+        if step.id in done:
+            return
+        if step.id in path:
+            raise ZeekProtocolException(f'Steps {" -> ".join(path[path.index(step.id):] + [step.id])} depend on each other.')
+        for d in step.deps:
+            _visit(steps[d], path + [step.id])
+        done.add(step.id)
+        order.append(step)
+    for step in steps.values():
+        _visit(step, [])
+    return order
+
+class ZeekProtocol:
+    '''
+    Runs a protocol, a list of steps of its parties, with each step run as
+    soon as the steps it depends on are done, and independent steps run at
+    once, by up to `workers` threads. Steps of a party share its Lurk
+    session, so they run one at a time in Lurk, while steps of different
+    parties run in parallel. A protocol is
+        {"steps": [<step>, ...]}
+    where a step is an object with one of
+        {"new party": <value>}
+        {"hide": <value>}
+        {"hide table": <file>}
+        {"hide function": <file>, "function": <function>}
+        {"call": <test>, "with": <value>}
+        {"prove": <test>, "with": <value>}
+        {"send": <secret or proof>, "to": <party>}
+        {"reveal": <secret>}
+        {"verify": <proof>}
+        {"check": <test>, "with": <value>, "returns": <output>, "in": <proof>}
+    and, optionally, its `id`, the `party` running it, `public` by default,
+    the steps it runs `after` and a new label, `as`, for what it returns,
+    that no other step nor existing label has. Steps
+    refer to parties, secrets and proofs by the id of the step that returns
+    them, a label or a hash. A step depends on the steps it refers to,
+    including its party. A `send` step returns what it sent, so steps
+    using a secret or proof sent to their party refer to the `send` step.
+    Files are relative to the protocol file.
+
+    The same rules as in the REPL apply: only public creates parties, and
+    only parties hide, prove, send and reveal their own secrets. A step
+    that fails skips the steps that depend on it.
+    '''
+    def __init__(self, zp, steps, workers):
+        self._zp      = zp
+        self._steps   = steps
+        self._workers = max(1, min(workers, len(steps)))
+        self._outs    = {}
+        self._lock    = threading.Lock()
+
+    def _arg(self, arg):
+        with self._lock:
+            if arg in self._outs:
+                return self._outs[arg]
+        if arg in self._zp.get_labels():
+            return self._zp.get_value(arg)
+        return arg
+
+    def _run_step(self, step):
+        zp    = self._zp
+        party = self._arg(step.party)
+        if not zp._zeek_env.is_party(party):
+            return 1, f'Party {step.party} does not exist.'
+        zp.bind_party(party)
+        args = [self._arg(a) if f in _REFS else a for f, a in zip(_OPS[step.op], step.args)]
+        match step.op:
+            case 'new party':
+                return zp.handle_new_party(args[0].split())
+            case 'hide':
+                return zp.handle_hide(args[0].split())
+            case 'hide table':
+                return zp.handle_hide_table(args[0])
+            case 'hide function':
+                return zp.handle_load_and_hide(args[0], args[1])
+            case 'call':
+                if not (ZeekEnv.is_hash(args[0]) and ZeekEnv.is_hash(args[1])):
+                    return 1, 'Both arguments of call should be hashes.'
+                return zp.handle_call(args[0], args[1])
+            case 'prove':
+                if zp.is_public():
+                    return 1, 'Public can not prove.'
+                if not (ZeekEnv.is_hash(args[0]) and ZeekEnv.is_hash(args[1])):
+                    return 1, 'Both arguments of prove should be hashes.'
+                return zp.handle_prove(args[0], args[1])
+            case 'send':
+                kind = 'proof' if ZeekEnv.is_proof(args[0]) else 'secret'
+                if zp.is_public():
+                    return 1, f'Public does not have {kind}s to send.'
+                if not zp._zeek_env.is_party(args[1]):
+                    return 1, f'Party {step.args[1]} does not exist.'
+                if args[1] == party:
+                    return 1, f'Can not send {kind} to oneself.\nParty {step.args[1]} is the current party.'
+                is_available = zp._zeek_env.is_proven if kind == 'proof' else zp._zeek_env.is_commited
+                if is_available(args[1], args[0]):
+                    return 1, f'Can not send {step.args[0]} to {step.args[1]}.\nIt is already available to {step.args[1]}.'
+                if kind == 'proof':
+                    rc, out = zp.handle_send_proof(args[1], args[0])
+                else:
+                    rc, out = zp.handle_send_commit(args[1], args[0])
+                return rc, args[0] if rc == 0 else out
+            case 'reveal':
+                if zp.is_public():
+                    return 1, 'Public does not have secrets to reveal.'
+                if not zp._zeek_env.is_commited_by_current_party(args[0]):
+                    return 1, f'Current party ({zp.get_party()}) does not own {args[0]}.'
+                return zp.handle_open(args[0])
+            case 'verify':
+                return zp.handle_verify(f'"{args[0]}"')
+            case 'check':
+                rc, holds = zp.handle_inspect(args[3], args[0], args[1], args[2])
+                if rc == 0 and not holds:
+                    return 1, f'Proof {step.args[3]} does not prove that call {step.args[0]} {step.args[1]} returns {step.args[2]}.'
+                return rc, holds
+
+    def _timed_step(self, start, step):
+        begin = time.monotonic()
+        try:
+            rc, out = self._run_step(step)
+        except Exception as e:
+            rc, out = 1, f'{e}\nUnexpected error while running step {step.id}.'
+        end = time.monotonic()
+        if rc == 0:
+            with self._lock:
+                self._outs[step.id] = out
+            if step.label != None:
+                self._zp.set_label(step.label, out)
+        return {'id': step.id, 'op': step.op, 'party': step.party, 'status': 'ok' if rc == 0 else 'failed',
+                'out': out, 'start': begin - start, 'secs': end - begin}
+
+    def run(self, on_step=None):
+        '''
+        Runs the steps and returns a report with the result of each step,
+        in the order they ended, the makespan, the time the steps would
+        take one after the other, and the critical path, the chain of
+        dependent steps that took the longest. `on_step(result)` is called,
+        in the calling thread, as each step ends.
+        '''
+        start   = time.monotonic()
+        steps   = {s.id: s for s in self._steps}
+        # Steps ready to run, by their place in the protocol, so that a
+        # chain of steps moves on before later ones start.
+        ready   = [(n, s.id) for n, s in enumerate(self._steps) if s.deps == []]
+        order   = {s.id: n for n, s in enumerate(self._steps)}
+        missing = {s.id: len(set(s.deps)) for s in self._steps}
+        needed  = {}
+        for s in self._steps:
+            for d in set(s.deps):
+                needed.setdefault(d, []).append(s.id)
+        results = {}
+        def _done(result):
+            results[result['id']] = result
+            if on_step != None:
+                on_step(result)
+            for id in needed.get(result['id'], []):
+                if id in results:
+                    continue
+                if result['status'] == 'ok':
+                    missing[id] -= 1
+                    if missing[id] == 0:
+                        heapq.heappush(ready, (order[id], id))
+                else:
+                    _done({'id': id, 'op': steps[id].op, 'party': steps[id].party, 'status': 'skipped',
+                           'out': None, 'start': None, 'secs': 0})
+        with ThreadPoolExecutor(max_workers=self._workers) as pool:
+            running = {}
+            while ready != [] or running != {}:
+                while ready != [] and len(running) < self._workers:
+                    _, id = heapq.heappop(ready)
+                    if id not in results:
+                        # Steps' time counts for the command that started them.
+                        running[pool.submit(bound(self._timed_step), start, steps[id])] = id
+                if running == {}:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for f in finished:
+                    del running[f]
+                    _done(f.result())
+        makespan = time.monotonic() - start
+        # Longest chain of steps, each run after the previous one, by the
+        # time the steps took.
+        longest = {}
+        for s in self._steps:
+            prev = max(s.deps, key=lambda d: longest[d][0], default=None)
+            secs, path = longest[prev] if prev != None else (0, [])
+            longest[s.id] = (secs + results[s.id]['secs'], path + [s.id])
+        critical_secs, critical_path = max(longest.values(), key=lambda l: l[0])
+        return {'steps': list(results.values()),
+                'failures': sum(r['status'] != 'ok' for r in results.values()),
+                'makespan': makespan,
+                'serial_secs': sum(r['secs'] for r in results.values()),
+                'critical_path': critical_path,
+                'critical_secs': critical_secs}
+
+def run_protocol(zp, file, on_step=None):
+    '''
+    Runs the protocol in `file`, as in `ZeekProtocol`, with up to `workers`
+    steps at once.
+    '''
+    steps = load_protocol(zp, file)
+    return ZeekProtocol(zp, steps, zp._zeek_env.get_workers()).run(on_step)
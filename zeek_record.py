@@ -0,0 +1,248 @@
+try:
+    import json
+    import time
+    import threading
+    from lurk_wrapper import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either json, time, threading or lurk_wrapper is missing.')
+    exit(1)
+
+_VERSION = 1
+# Calls whose results hold elapsed times. Only their first element is
+# compared on replay.
+_TIMED_RESULTS = {'handle_verify_batch', 'handle_prove_batch', 'handle_bulk_hide'}
+
+def _encode(args):
+    # Functions, as progress reporters, can not be recorded.
+    return [{'$callback': True} if callable(a) else a for a in args]
+
+def _decode(args):
+    return [(lambda *_: None) if isinstance(a, dict) and a.get('$callback') else a for a in args]
+
+class ZeekRecorder:
+    '''
+    Records the commands of a session. Each command is recorded with the
+    calls it made to `ZeekPrompt`, their arguments, resolved to hashes,
+    their results, how long they took and the salts drawn for the commits
+    they made. Calls made by other calls are part of them.
+
+    A recording is a JSON Lines file: a header, then a line per command.
+    A command that started a background job, as a proof, is written once
+    the job finishes, so commands are numbered. Calls made between
+    commands, as by a job labeling its proof, are recorded as a command
+    with no text.
+    '''
+    def __init__(self, get_party):
+        self._get_party = get_party
+        self._lock  = threading.Lock()
+        self._local = threading.local()
+        self._fh    = None
+        # The file of a stopped recording, until its commands are written.
+        self._closing = None
+        self._step  = None
+        self._steps = 0
+        # Commands not written yet.
+        self._open  = 0
+
+    def instrument(self, obj, names):
+        for name in names:
+            setattr(obj, name, self.recorded(name, getattr(obj, name)))
+
+    def is_recording(self):
+        return self._fh != None
+
+    def start(self, file, backend):
+        if self._fh != None:
+            raise Exception(f'Already recording.')
+        self._fh = open(file, 'w')
+        self._fh.write(json.dumps({'version': _VERSION, 'backend': backend, 'party': self._get_party()}) + '\n')
+        self._fh.flush()
+        self._steps = 0
+        set_salt_source(self._salt)
+
+    def stop(self):
+        '''
+        Stops recording. The current command, `record stop` itself, is not
+        recorded. Commands waiting for their jobs are written once they
+        finish.
+        '''
+        set_salt_source(None)
+        with self._lock:
+            if self._step != None:
+                self._step   = None
+                self._steps -= 1
+                self._open  -= 1
+            fh, self._fh = self._fh, None
+            if fh != None and self._open == 0:
+                fh.close()
+            elif fh != None:
+                self._closing = fh
+        return self._steps
+
+    def _new_step(self, cmd):
+        with self._lock:
+            step = {'n': self._steps, 'cmd': cmd, 'party': self._get_party(), 'calls': [], '_open': 1}
+            self._steps += 1
+            self._open  += 1
+        return step
+
+    def begin_step(self, cmd):
+        if self._fh != None:
+            self._step = self._new_step(cmd)
+
+    def end_step(self):
+        with self._lock:
+            step, self._step = self._step, None
+        if step != None:
+            self._release(step)
+
+    def _release(self, step):
+        with self._lock:
+            step['_open'] -= 1
+            if step['_open'] > 0:
+                return
+            self._open -= 1
+            fh = self._fh if self._fh != None else self._closing
+            if fh == None:
+                return
+            fh.write(json.dumps({k: v for k, v in step.items() if not k.startswith('_')}, default=list) + '\n')
+            fh.flush()
+            if self._fh == None and self._open == 0:
+                fh.close()
+                self._closing = None
+
+    def _salt(self):
+        salt = random_salt()
+        call = getattr(self._local, 'call', None)
+        if call != None:
+            call['salts'].append(salt)
+        return salt
+
+    def _call(self, step, op, party, args, fn, fn_args):
+        call = {'op': op, 'party': party, 'args': _encode(args), 'salts': []}
+        self._local.call = call
+        start = time.perf_counter()
+        try:
+            result = fn(*fn_args)
+            call['result'] = result
+            return result
+        finally:
+            call['secs'] = time.perf_counter() - start
+            self._local.call = None
+            with self._lock:
+                step['calls'].append(call)
+
+    def recorded(self, op, fn):
+        '''
+        Returns `fn` recording its calls as `op`, as part of the current
+        command.
+        '''
+        def _recorded(*args):
+            step = self._step
+            if self._fh == None or getattr(self._local, 'call', None) != None:
+                return fn(*args)
+            if step != None:
+                return self._call(step, op, self._get_party(), args, fn, args)
+            # Called between commands, as by a job labeling its proof.
+            step = self._new_step(None)
+            try:
+                return self._call(step, op, self._get_party(), args, fn, args)
+            finally:
+                self._release(step)
+        return _recorded
+
+    def recorded_job(self, op, args, job):
+        '''
+        Returns `job`, to be run in the background, recording it as a call
+        `op(*args)` of the current command.
+        '''
+        step  = self._step
+        party = self._get_party()
+        if step == None:
+            return job
+        with self._lock:
+            step['_open'] += 1
+        def _recorded_job(*job_args):
+            try:
+                return self._call(step, op, party, args, job, job_args)
+            finally:
+                self._release(step)
+        return _recorded_job
+
+def _is_done(zp, call):
+    '''
+    Whether what `call` did is there already, as a commit it made.
+    '''
+    env, op, args = zp._zeek_env, call['op'], call['args']
+    out = call['result'][1] if isinstance(call['result'], list) else None
+    match op:
+        case 'handle_hide' | 'handle_load_and_hide' | 'handle_hide_table':
+            return env.is_party(call['party']) and env.is_commited(call['party'], out)
+        case 'handle_new_party':
+            return env.is_party(out)
+        case 'handle_prove':
+            return env.is_party(call['party']) and env.is_proven(call['party'], out)
+        case 'handle_send_commit':
+            return env.is_party(args[0]) and env.is_commited(args[0], args[1])
+        case 'handle_send_proof':
+            return env.is_party(args[0]) and env.is_proven(args[0], args[1])
+        case _:
+            return False
+
+def _same(op, recorded, result):
+    result = json.loads(json.dumps(result, default=list))
+    if not isinstance(recorded, list) or not isinstance(result, list) or len(result) == 0:
+        return recorded == result
+    if op in _TIMED_RESULTS or recorded[0] != 0:
+        # Errors may name temporary files or times.
+        return recorded[0] == result[0]
+    return recorded == result
+
+def replay(zp, file, on_step=None):
+    '''
+    Runs the calls recorded in `file` again, with the salts drawn when
+    recording, so commits have the same hashes. Calls whose commits are
+    there already are skipped. Returns a report of each command with
+    calls, passed to `on_step` as well, and the totals.
+    '''
+    with open(file) as fh:
+        header = json.loads(fh.readline())
+        steps  = sorted((json.loads(line) for line in fh if line.strip() != ''), key=lambda s: s['n'])
+    if header.get('version') != _VERSION:
+        raise Exception(f'{file} is not a Zeek recording.')
+    pinned = []
+    set_salt_source(lambda: pinned.pop(0) if pinned != [] else random_salt())
+    reports = []
+    try:
+        for step in steps:
+            if step['calls'] == []:
+                continue
+            report = {'n': step['n'], 'cmd': step['cmd'], 'recorded_secs': 0, 'secs': 0,
+                      'skipped': 0, 'cached': 0, 'mismatches': []}
+            for call in step['calls']:
+                report['recorded_secs'] += call['secs']
+                if zp._zeek_env.is_party(call['party']):
+                    zp._zeek_env.set_party(call['party'])
+                if 'result' in call and _is_done(zp, call):
+                    report['skipped'] += 1
+                    continue
+                hits = sum(hits for hits, _, _ in zp.get_cache_stats().values())
+                pinned[:] = call['salts']
+                start = time.perf_counter()
+                result = getattr(zp, call['op'])(*_decode(call['args']))
+                report['secs'] += time.perf_counter() - start
+                if sum(hits for hits, _, _ in zp.get_cache_stats().values()) > hits:
+                    report['cached'] += 1
+                if 'result' in call and not _same(call['op'], call['result'], result):
+                    report['mismatches'].append({'op': call['op'], 'recorded': call['result'], 'replayed': result})
+            reports.append(report)
+            if on_step != None:
+                on_step(report)
+    finally:
+        set_salt_source(None)
+    return {'steps': reports,
+            'recorded_secs': sum(r['recorded_secs'] for r in reports),
+            'secs': sum(r['secs'] for r in reports),
+            'mismatches': sum(len(r['mismatches']) for r in reports)}
@@ -0,0 +1,50 @@
+try:
+    import prompt_toolkit as pt
+    from zeek_env import *
+    from zeek_completer import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either prompt_toolkit, zeek_env or zeek_completer is missing.')
+    exit(1)
+
+class ZeekRepl:
+    '''
+    The prompt of the REPL, with its history and completion, for a
+    `ZeekPrompt` or a `ZeekClient`. It is kept apart from them so that
+    one-shot commands do not import prompt_toolkit.
+    '''
+    def __init__(self, zeek_prompt):
+        self._zeek_prompt = zeek_prompt
+        self.session      = pt.PromptSession(history=pt.history.FileHistory(zeek_prompt._zeek_env.get_hist()))
+        self._completer   = ZeekCompleter(zeek_prompt)
+
+    def _right_prompt(self, party):
+        if party != None and ZeekEnv.is_hash(party):
+            label = self._zeek_prompt.find_label_for_value(party)
+            if label != None:
+                return f'<ansiyellow>{label}</ansiyellow>:<ansigreen>{party[:4]}...{party[len(party) - 4:]}</ansigreen>'
+            else:
+                return f'<ansigreen>{party[:4]}...{party[len(party) - 4:]}</ansigreen>'
+        elif party == 'public':
+            return '<ansiyellow>public</ansiyellow>'
+        else:
+            return ''
+
+    async def prompt(self, bottom_toolbar=None):
+        style = pt.styles.Style.from_dict({
+            # User input (default text).
+            # '':              '#ff0066',
+            # Prompt.
+            'tool':          'ansigreen',
+            'prompt_symbol': 'ansiyellow'
+        })
+
+        message = [
+            ('class:tool',          'zeek '),
+            ('class:prompt_symbol', '❯ '),
+        ]
+
+        return await self.session.prompt_async(message, style=style, completer=self._completer,
+                                               rprompt=pt.HTML(self._right_prompt(self._zeek_prompt.get_party())),
+                                               bottom_toolbar=bottom_toolbar, refresh_interval=0.5 if bottom_toolbar != None else 0)
@@ -0,0 +1,147 @@
+try:
+    import os
+    import random
+    import threading
+    from zeek_bulk import *
+    from zeek_metrics import *
+    from zeek_protocol import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, random, threading, zeek_bulk, zeek_metrics or zeek_protocol is missing.')
+    exit(1)
+
+_DATA_DIR = f'{os.path.dirname(os.path.abspath(__file__))}/data'
+_CR_CHECK = ('cr-check-function.lurk', 'credit_score_OK?')
+
+def credit_report(rng):
+    '''
+    Returns a credit report drawn from `rng`, shaped as the one in
+    `data/credit-score-table.lurk`. Some reports use too much credit to
+    pass `credit_score_OK?`.
+    '''
+    accounts = []
+    for n in range(rng.randint(1, 4)):
+        account = {'number': f'{rng.randint(10000, 99999)}-{n}',
+                   'type':   rng.choice(['savings', 'debit', 'credit']),
+                   'balance': rng.randint(0, 5000)}
+        if account['type'] == 'credit':
+            account['card_num'] = ' '.join(f'{rng.randint(0, 9999):04}' for _ in range(4))
+        account['birthday'] = [rng.randint(1990, 2020), rng.randint(1, 12), rng.randint(1, 28)]
+        accounts.append(account)
+    return {'accounts': accounts, 'pending_bills': None, 'credit_in_use': rng.randint(0, 9),
+            'collection_actions': None, 'outstanding_debt': None}
+
+def _steps(provers, seed):
+    '''
+    The protocol of `provers` applicants proving their credit score to a
+    bank, with the steps of each prover together, so that provers finish
+    one after the other rather than all at the end.
+    '''
+    rng   = random.Random(seed)
+    steps = [ZeekStep('bank', 'public', 'new party', ['bank'], [], None),
+             ZeekStep('cr-check', 'bank', 'hide function', [f'{_DATA_DIR}/{_CR_CHECK[0]}', _CR_CHECK[1]], ['bank'], None)]
+    for n in range(1, provers + 1):
+        p = f'prover-{n}'
+        steps += [ZeekStep(p, 'public', 'new party', [f'{n}'], [], None),
+                  ZeekStep(f'{p}-report', p, 'hide', [to_lurk(credit_report(rng))], [p], None),
+                  ZeekStep(f'{p}-cr-check', 'bank', 'send', ['cr-check', p], ['bank', 'cr-check', p], None),
+                  ZeekStep(f'{p}-proof', p, 'prove', [f'{p}-cr-check', f'{p}-report'], [p, f'{p}-cr-check', f'{p}-report'], None),
+                  ZeekStep(f'{p}-proof-sent', p, 'send', [f'{p}-proof', 'bank'], [p, f'{p}-proof', 'bank'], None)]
+    return steps
+
+def disk_usage(path):
+    '''
+    Returns the bytes of the files under `path`. Files linked from the
+    object store are counted once.
+    '''
+    seen, total = set(), 0
+    for dir, _, files in os.walk(path):
+        for f in files:
+            try:
+                st = os.lstat(f'{dir}/{f}')
+            except FileNotFoundError:
+                continue
+            if (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_size
+    return total
+
+def _percentiles(values):
+    values = sorted(values)
+    if values == []:
+        return {'count': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+    at = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {'count': len(values), 'p50': at(0.5), 'p95': at(0.95), 'p99': at(0.99), 'max': values[-1]}
+
+def _as_party(zp, party, fn, *args):
+    '''
+    Runs `fn(*args)` with `party` as the current party, in a thread of its
+    own, so that the party of the calling thread is left as it is.
+    '''
+    result = []
+    def _run():
+        zp.bind_party(party)
+        result.append(fn(*args))
+    thread = threading.Thread(target=bound(_run))
+    thread.start()
+    thread.join()
+    return result[0]
+
+def simulate(zp, provers, concurrency, on_progress=None, seed=0):
+    '''
+    Simulates `provers` applicants proving their credit score to a bank,
+    as in `data/credit-score.json`. Each applicant is a new party that
+    hides a credit report, drawn by `credit_report`, receives the bank's
+    `credit_score_OK?`, proves it holds for its report and sends the proof
+    to the bank, with up to `concurrency` steps at once. The bank then
+    verifies all the proofs, as `verify all`, with `workers` Lurk
+    processes. `on_progress(phase, done, total)` is called as provers
+    finish, in phase `prove`, and as proofs are verified, in `verify`.
+
+    Returns the throughput and latency percentiles of provers, from their
+    creation to their proof being sent, and of each step, the throughput
+    of verification and the bytes used under `.zeek` before and after.
+    '''
+    path   = zp._zeek_env.get_path()
+    before = disk_usage(path)
+    proofs, latencies, done = [], [], [0]
+    first_start = {}
+    def _on_step(step):
+        if step['id'].endswith('-proof-sent'):
+            done[0] += 1
+            if step['status'] == 'ok':
+                proofs.append(step['out'])
+                first = step['id'][:-len('-proof-sent')]
+                latencies.append(step['start'] + step['secs'] - first_start[first])
+            if on_progress != None:
+                on_progress('prove', done[0], provers)
+        elif step['op'] == 'new party' and step['start'] != None:
+            first_start[step['id']] = step['start']
+    report = ZeekProtocol(zp, _steps(provers, seed), concurrency).run(_on_step)
+    by_op  = {}
+    for step in report['steps']:
+        if step['status'] == 'ok':
+            by_op.setdefault(step['op'], []).append(step['secs'])
+    verified = [0]
+    def _on_verified(proof_key, rc, out):
+        verified[0] += 1
+        if on_progress != None:
+            on_progress('verify', verified[0], len(proofs))
+    bank = next((s['out'] for s in report['steps'] if s['id'] == 'bank' and s['status'] == 'ok'), None)
+    if bank != None and proofs != []:
+        verify_failures, verify_secs = _as_party(zp, bank, zp.handle_verify_batch, proofs, _on_verified)
+    else:
+        verify_failures, verify_secs = 0, 0
+    after = disk_usage(path)
+    return {'provers':       provers,
+            'concurrency':   concurrency,
+            'failures':      provers - len(proofs),
+            'prove_secs':    report['makespan'],
+            'provers_per_sec': len(proofs) / max(report['makespan'], 1e-6),
+            'latency':       _percentiles(latencies),
+            'steps':         {op: _percentiles(secs) for op, secs in by_op.items()},
+            'verify':        {'proofs': len(proofs), 'failures': verify_failures, 'secs': verify_secs,
+                              'proofs_per_sec': len(proofs) / max(verify_secs, 1e-6)},
+            'disk':          {'before': before, 'after': after,
+                              'per_prover': (after - before) / provers if provers > 0 else 0}}
@@ -0,0 +1,129 @@
+try:
+    import os
+    import re
+    import json
+    import time
+    import cProfile
+    import itertools
+    import threading
+    from contextlib import contextmanager
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, re, json, time, cProfile, itertools, threading or contextlib is missing.')
+    exit(1)
+
+_tracer = None
+
+_HEX = re.compile(r'[0-9a-fA-F]{16,}')
+
+def _flat(value):
+    if isinstance(value, (list, tuple)):
+        return ' '.join(_flat(v) for v in value if not callable(v))
+    return f'{value}'
+
+def short(value):
+    '''
+    `value` as a short string for a trace: hashes are cut to their first
+    8 digits and long strings to 80 characters.
+    '''
+    value = _flat(value)
+    value = _HEX.sub(lambda m: m.group(0)[:8] + '…', f'{value}')
+    return value if len(value) <= 80 else value[:79] + '…'
+
+class ZeekTracer:
+    '''
+    Spans of commands, Lurk runs and their phases, written to `file` in
+    Chrome's trace event format, as shown by `chrome://tracing` or
+    Perfetto. Spans of a thread nest by time.
+    '''
+    def __init__(self, file):
+        self._file   = file
+        self._events = []
+        self._lock   = threading.Lock()
+        self._start  = time.perf_counter()
+        self._pid    = os.getpid()
+        self._tids   = {}
+
+    def add(self, name, cat, start, end, attrs):
+        thread = threading.current_thread()
+        event  = {'name': name, 'cat': cat, 'ph': 'X', 'pid': self._pid, 'tid': thread.ident,
+                  'ts': (start - self._start) * 1e6, 'dur': (end - start) * 1e6,
+                  'args': {k: short(v) if isinstance(v, (str, list, tuple)) else v for k, v in attrs.items()}}
+        with self._lock:
+            self._tids.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    def write(self):
+        with self._lock:
+            names  = [{'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': name}}
+                      for tid, name in self._tids.items()]
+            events = names + self._events
+        with open(self._file, 'w') as fh:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, fh, default=str)
+        return len(events) - len(names)
+
+def start_trace(file):
+    global _tracer
+    _tracer = ZeekTracer(file)
+
+def stop_trace():
+    '''
+    Writes the trace, if tracing, and returns the number of spans in it.
+    '''
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer.write() if tracer != None else 0
+
+@contextmanager
+def span(name, cat, **attrs):
+    '''
+    Traces the block as span `name` of category `cat`, if tracing. The
+    block may add attributes to the dictionary it is given.
+    '''
+    tracer = _tracer
+    if tracer == None:
+        yield attrs
+        return
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs['error'] = type(e).__name__
+        raise
+    finally:
+        tracer.add(name, cat, start, time.perf_counter(), attrs)
+
+class ZeekProfiler:
+    '''
+    Runs each command under cProfile and dumps its statistics to
+    `<dir>/<n>-<command>.prof`, to be read with `pstats`. Commands run by
+    another command, or while another command is being profiled, as a
+    background proof, are part of it or not profiled.
+    '''
+    def __init__(self, dir):
+        os.makedirs(dir, exist_ok=True)
+        self._dir   = dir
+        self._count = itertools.count(1)
+        self._lock  = threading.Lock()
+
+    def instrument(self, obj, prefix):
+        '''
+        Profiles the methods of `obj` named `<prefix><command>` as `<command>`.
+        '''
+        for name in dir(type(obj)):
+            if name.startswith(prefix):
+                setattr(obj, name, self.profiled(name[len(prefix):].replace('_', ' '), getattr(obj, name)))
+
+    def profiled(self, command, fn):
+        def _profiled(*args, **kwargs):
+            # One profiler may be active at a time.
+            if not self._lock.acquire(blocking=False):
+                return fn(*args, **kwargs)
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(fn, *args, **kwargs)
+            finally:
+                self._lock.release()
+                profile.dump_stats(f'{self._dir}/{next(self._count):04d}-{command.replace(" ", "-")}.prof')
+        return _profiled
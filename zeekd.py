@@ -0,0 +1,230 @@
+#!/usr/bin/python3
+'''
+`zeekd` serves a `.zeek` directory to `zeek.py --connect` clients over a
+Unix socket, `<zeek_dir>/.zeek/zeekd.sock`. It owns the Lurk sessions,
+the indexes of the directory and the caches, so they are shared by all
+clients and Lurk's cold start is paid once. Each client has its own
+current party.
+
+Usage: zeekd.py [--backend lurk|sim] [--socket <path>]
+'''
+try:
+    import os
+    import sys
+    import json
+    import signal
+    import socket
+    import argparse
+    import threading
+    from collections import OrderedDict, deque
+    from zeek_prompt import *
+    from zeek_client import *
+except Exception as e:
+    print(e)
+    print('Check your Python 3 installation.')
+    print('Either os, sys, json, signal, socket, argparse, threading, collections, zeek_prompt or zeek_client is missing.')
+    exit(1)
+
+class ZeekFairQueue:
+    '''
+    The requests of each client are queued apart and clients are served
+    in turns, so a client sending many requests, as a batch, does not
+    hold back the others.
+    '''
+    def __init__(self):
+        self._queues = OrderedDict()
+        self._cond   = threading.Condition()
+        self._closed = False
+
+    def put(self, client, item):
+        with self._cond:
+            self._queues.setdefault(client, deque()).append(item)
+            self._cond.notify()
+
+    def get(self):
+        '''
+        Returns the next `(client, item)`, or `None` once closed.
+        '''
+        with self._cond:
+            while self._queues == {} and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            client, items = next(iter(self._queues.items()))
+            item = items.popleft()
+            # The client goes to the back of the line.
+            del self._queues[client]
+            if items:
+                self._queues[client] = items
+            return client, item
+
+    def drop(self, client):
+        with self._cond:
+            self._queues.pop(client, None)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class _ZeekdClient:
+    def __init__(self, conn):
+        self.conn    = conn
+        self.party   = 'public'
+        self.cancels = {}
+        self._wfile  = conn.makefile('w', encoding='utf-8')
+        self._lock   = threading.Lock()
+
+    def send(self, msg):
+        try:
+            line = json.dumps(msg, default=list)
+        except TypeError as e:
+            line = json.dumps({'id': msg['id'], 'error': f'{e}'})
+        with self._lock:
+            try:
+                self._wfile.write(line + '\n')
+                self._wfile.flush()
+            except (OSError, ValueError):
+                # The client is gone.
+                pass
+
+class ZeekDaemon:
+    '''
+    Requests that run Lurk, the `handle_*` methods of `ZeekPrompt` and
+    prove jobs, are queued fairly and run by `workers` threads. The
+    others, as label lookups made while completing a command, are
+    answered at once.
+    '''
+    # Methods of `ZeekPrompt` that clients may call, besides `handle_*`
+    # but `handle_replay`.
+    _PROMPT_OPS = {'empty_labels', 'get_labels', 'get_values', 'get_items', 'get_value', 'get_kind',
+                   'set_label', 'set_labels', 'get_labels_generation', 'find_label_for_value',
+                   'save_labels', 'is_public', 'get_party', 'get_cache_stats', 'get_stats', 'get_backend',
+                   'match_proofs', 'match_commits'}
+    # Methods of `ZeekEnv` that clients may call.
+    _ENV_OPS    = {'get_workers', 'get_hist', 'get_party', 'get_generation', 'get_commits', 'get_proofs',
+                   'get_parties', 'is_party', 'is_commited', 'is_commited_by_current_party', 'is_proven'}
+
+    def __init__(self, path, socket_path, backend='lurk'):
+        self._zp          = ZeekPrompt(path, backend)
+        self._socket_path = socket_path
+        self._queue       = ZeekFairQueue()
+        self._workers     = [threading.Thread(target=self._work, daemon=True)
+                             for _ in range(self._zp._zeek_env.get_workers())]
+
+    def _listen(self):
+        if os.path.exists(self._socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self._socket_path)
+                probe.close()
+                raise ZeekClientException(f'zeekd is already running on {self._socket_path}.')
+            except ConnectionRefusedError:
+                # Left behind by a zeekd that did not exit cleanly.
+                os.remove(self._socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self._socket_path)
+        os.chmod(self._socket_path, 0o600)
+        server.listen()
+        return server
+
+    def serve(self):
+        server = self._listen()
+        print(f'zeekd serving {self._socket_path} with {len(self._workers)} workers.')
+        for w in self._workers:
+            w.start()
+        try:
+            while True:
+                conn, _ = server.accept()
+                threading.Thread(target=self._serve_client, args=(_ZeekdClient(conn),), daemon=True).start()
+        finally:
+            server.close()
+            os.remove(self._socket_path)
+            self._queue.close()
+            self._zp.good_bye()
+
+    def _serve_client(self, client):
+        try:
+            for line in client.conn.makefile('r', encoding='utf-8'):
+                try:
+                    request = json.loads(line)
+                    id, op, args = request['id'], request['op'], request['args']
+                except (ValueError, KeyError, TypeError):
+                    client.send({'id': None, 'error': 'Malformed request.'})
+                    continue
+                args = [self._callback(client, id, a['$callback']) if isinstance(a, dict) and '$callback' in a else a
+                        for a in args]
+                if op == 'cancel':
+                    cancel = client.cancels.get(args[0])
+                    if cancel != None:
+                        cancel()
+                    client.send({'id': id, 'result': None})
+                elif op.startswith('handle_') or op == 'prove_job':
+                    self._queue.put(client, (id, op, args))
+                else:
+                    self._run(client, id, op, args)
+        except OSError:
+            pass
+        finally:
+            # Jobs of a client that left are of no use.
+            self._queue.drop(client)
+            for cancel in list(client.cancels.values()):
+                cancel()
+            client.conn.close()
+
+    def _callback(self, client, id, n):
+        return lambda *args: client.send({'id': id, 'event': n, 'args': args})
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job == None:
+                return
+            client, (id, op, args) = job
+            self._run(client, id, op, args)
+
+    def _method(self, op):
+        if op.startswith('env.') and op[len('env.'):] in ZeekDaemon._ENV_OPS:
+            return getattr(self._zp._zeek_env, op[len('env.'):])
+        # Salts are drawn from one source for the whole process, so replaying
+        # the commands of a client would take in the commits of the others.
+        # Clients do not record nor replay.
+        if (op.startswith('handle_') and op != 'handle_replay') or op in ZeekDaemon._PROMPT_OPS:
+            return getattr(self._zp, op, None)
+        return None
+
+    def _run(self, client, id, op, args):
+        self._zp.bind_party(client.party)
+        try:
+            if op == 'prove_job':
+                job, client.cancels[id] = self._zp.new_prove_job(*args[:2])
+                result = job(*args[2:])
+            else:
+                method = self._method(op)
+                if method == None:
+                    client.send({'id': id, 'error': f'Unknown request {op}.'})
+                    return
+                result = method(*args)
+            client.party = self._zp.get_party()
+            client.send({'id': id, 'result': result})
+        except Exception as e:
+            client.send({'id': id, 'error': f'{e}\nUnexpected error while executing {op}.'})
+        finally:
+            client.cancels.pop(id, None)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='zeekd: serves a .zeek directory to Zeek clients')
+    parser.add_argument('--backend', choices=LurkSessionManager.BACKENDS, default='lurk',
+                        help='run commands in the lurk binary or in the in-process sim')
+    parser.add_argument('--socket', help=f'socket to listen on, <zeek_dir>/.zeek/{SOCKET_NAME} by default')
+    args = parser.parse_args()
+    path = f'{os.getcwd()}/.zeek'
+    # Exits cleanly, removing the socket, when stopped.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        ZeekDaemon(path, args.socket or f'{path}/{SOCKET_NAME}', args.backend).serve()
+    except KeyboardInterrupt:
+        pass
+    except ZeekClientException as e:
+        print(e)
+        exit(1)